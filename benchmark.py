@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+#Benchmarks for nhtohtml.py.
+#Generates synthetic NetHack 3.6-style source trees (monst.c, the headers and data.base)
+#at several sizes, times each stage of the conversion on them, and writes the timings
+#as JSON so they can be compared between versions of the script.
+#
+#   python benchmark.py --sizes 100,1000,10000 --output bench.json
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import nhtohtml
+
+#The attack and damage types the synthetic monsters use, in the same order (and so the
+#same relative values) as vanilla monattk.h.
+ATTACKS = ['AT_NONE', 'AT_CLAW', 'AT_BITE', 'AT_KICK', 'AT_BUTT', 'AT_TUCH', 'AT_STNG', 'AT_HUGS',
+           'AT_SPIT', 'AT_ENGL', 'AT_BREA', 'AT_EXPL', 'AT_BOOM', 'AT_GAZE', 'AT_TENT']
+DAMAGE = ['AD_PHYS', 'AD_MAGM', 'AD_FIRE', 'AD_COLD', 'AD_SLEE', 'AD_DISN', 'AD_ELEC', 'AD_DRST',
+          'AD_ACID', 'AD_SPC1', 'AD_SPC2', 'AD_BLND', 'AD_STUN', 'AD_SLOW', 'AD_PLYS', 'AD_DRLI',
+          'AD_DREN', 'AD_LEGS', 'AD_STON', 'AD_STCK', 'AD_SGLD', 'AD_SITM', 'AD_SDUC', 'AD_TLPT',
+          'AD_RUST', 'AD_CONF', 'AD_DGST', 'AD_HEAL', 'AD_WRAP', 'AD_WERE', 'AD_DRDX', 'AD_DRCO',
+          'AD_DRIN', 'AD_DISE', 'AD_DCAY', 'AD_SSEX', 'AD_HALU', 'AD_DETH', 'AD_PEST', 'AD_FAMN',
+          'AD_SLIM', 'AD_ENCH', 'AD_CORR']
+
+#Flags for monflag.h, one bit each in order.
+FLAGS = {
+    'M1': ['M1_FLY', 'M1_SWIM', 'M1_AMORPHOUS', 'M1_WALLWALK', 'M1_CLING', 'M1_TUNNEL', 'M1_NEEDPICK',
+           'M1_CONCEAL', 'M1_HIDE', 'M1_AMPHIBIOUS', 'M1_BREATHLESS', 'M1_NOTAKE', 'M1_NOEYES',
+           'M1_NOHANDS', 'M1_NOLIMBS', 'M1_NOHEAD', 'M1_MINDLESS', 'M1_HUMANOID', 'M1_ANIMAL',
+           'M1_SLITHY', 'M1_UNSOLID', 'M1_THICK_HIDE', 'M1_OVIPAROUS', 'M1_REGEN', 'M1_SEE_INVIS',
+           'M1_TPORT', 'M1_TPORT_CNTRL', 'M1_ACID', 'M1_POIS', 'M1_CARNIVORE', 'M1_HERBIVORE',
+           'M1_METALLIVORE'],
+    'M2': ['M2_NOPOLY', 'M2_UNDEAD', 'M2_WERE', 'M2_HUMAN', 'M2_ELF', 'M2_DWARF', 'M2_GNOME', 'M2_ORC',
+           'M2_DEMON', 'M2_MERC', 'M2_LORD', 'M2_PRINCE', 'M2_MINION', 'M2_GIANT', 'M2_SHAPESHIFTER',
+           'M2_MALE', 'M2_FEMALE', 'M2_NEUTER', 'M2_PNAME', 'M2_HOSTILE', 'M2_PEACEFUL', 'M2_DOMESTIC',
+           'M2_WANDER', 'M2_STALK', 'M2_NASTY', 'M2_STRONG', 'M2_ROCKTHROW', 'M2_GREEDY', 'M2_JEWELS',
+           'M2_COLLECT', 'M2_MAGIC'],
+    'M3': ['M3_WANTSAMUL', 'M3_WANTSBELL', 'M3_WANTSBOOK', 'M3_WANTSCAND', 'M3_WANTSARTI', 'M3_WAITFORU',
+           'M3_CLOSE', 'M3_INFRAVISION', 'M3_INFRAVISIBLE', 'M3_DISPLACES'],
+    'MR': ['MR_FIRE', 'MR_COLD', 'MR_SLEEP', 'MR_DISINT', 'MR_ELEC', 'MR_POISON', 'MR_ACID', 'MR_STONE'],
+}
+
+#Monsters to copy, with {n} for the copy number. Between them they cover groups, several
+#attacks, conveyances, the WT_ defines and a multi-line #define of attacks.
+MON_TEMPLATES = [
+    '''    MON("giant ant {n}", S_ANT, LVL(2, 18, 3, 0, 0), (G_GENO | G_SGROUP | 3),
+        A(ATTK(AT_BITE, AD_PHYS, 1, 4), NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK,
+          NO_ATTK),
+        SIZ(10, 10, MS_SILENT, MZ_TINY), 0, 0,
+        M1_ANIMAL | M1_NOHANDS | M1_OVIPAROUS | M1_CARNIVORE, M2_HOSTILE, 0,
+        4, CLR_BROWN),
+''',
+    '''    MON("killer bee {n}", S_ANT, LVL(1, 18, -1, 0, 0), (G_GENO | G_LGROUP | 2),
+        A(ATTK(AT_STNG, AD_DRST, 1, 3), NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK,
+          NO_ATTK),
+        SIZ(1, 5, MS_BUZZ, MZ_TINY), MR_POISON, MR_POISON,
+        M1_ANIMAL | M1_FLY | M1_NOHANDS | M1_POIS, M2_HOSTILE | M2_FEMALE, 0,
+        5, CLR_YELLOW),
+''',
+    '''    MON("hill giant {n}", S_GIANT, LVL(8, 10, 6, 0, -2), (G_GENO | G_SGROUP | 1),
+        A(ATTK(AT_WEAP, AD_PHYS, 2, 8), NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK,
+          NO_ATTK),
+        SIZ(2200, 700, MS_BOAST, MZ_HUGE), 0, 0, M1_HUMANOID | M1_CARNIVORE,
+        M2_GIANT | M2_STRONG | M2_ROCKTHROW | M2_NASTY | M2_COLLECT
+            | M2_JEWELS,
+        M3_INFRAVISIBLE | M3_INFRAVISION, 10, CLR_CYAN),
+''',
+    '''    MON("succubus {n}", S_DEMON, LVL(6, 12, 0, 70, -9), (G_NOCORPSE | 1),
+        BENCH_ATTACKS_{d}, SIZ(WT_HUMAN, 400, MS_SEDUCE, MZ_HUMAN),
+        MR_FIRE | MR_POISON, 0, M1_HUMANOID | M1_FLY | M1_POIS,
+        M2_DEMON | M2_STALK | M2_HOSTILE | M2_NASTY | M2_FEMALE,
+        M3_INFRAVISIBLE | M3_INFRAVISION, 8, CLR_GRAY),
+''',
+    '''    MON("red dragon {n}", S_DRAGON, LVL(15, 9, -1, 20, -4), (G_GENO | 1),
+        A(ATTK(AT_BREA, AD_FIRE, 6, 6), ATTK(AT_BITE, AD_PHYS, 3, 8),
+          ATTK(AT_CLAW, AD_PHYS, 1, 4), ATTK(AT_CLAW, AD_PHYS, 1, 4), NO_ATTK,
+          NO_ATTK),
+        SIZ(WT_DRAGON, 1500, MS_ROAR, MZ_GIGANTIC), MR_FIRE, MR_FIRE,
+        M1_FLY | M1_THICK_HIDE | M1_NOHANDS | M1_SEE_INVIS | M1_OVIPAROUS
+            | M1_CARNIVORE,
+        M2_HOSTILE | M2_STRONG | M2_NASTY | M2_GREEDY | M2_JEWELS | M2_MAGIC,
+        0, 20, CLR_RED),
+''',
+]
+
+#data.base entries. Tags use the same numbering as the monsters, plus some wildcards.
+ENTRY_TEMPLATES = [
+    ('giant ant {n}\n*ant {n}\n', '\tAnts are social insects, number {n}.\n\tThey come in several kinds.\n'),
+    ('killer bee {n}\n', '\tKiller bees are nasty.\n'),
+    ('~hill giant {n}\n*giant {n}\n', '\tGiants are big.\n\tVery big.\n\tNumber {n}.\n'),
+    ('succubus {n}\n', '\tThe succubus is a demon.\n'),
+    ('*dragon {n}\n', '\tDragons hoard treasure.\n'),
+]
+
+def write_file(filename, text):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+#Write a synthetic source tree to path, with the given number of MON declarations,
+#data.base entries and #defines after the first MON.
+def write_tree(path, monsters, entries, defines):
+    #The script checks for monst.h to tell that it's a source tree.
+    write_file(os.path.join(path, 'include', 'monst.h'), '/* synthetic monst.h */\n')
+    write_file(os.path.join(path, 'include', 'permonst.h'),
+               '#define NATTK 6\n#define WT_HUMAN 1450\n')
+
+    attk = [f'#define {a} {i}\n' for (i, a) in enumerate(ATTACKS)]
+    attk += ['#define AT_WEAP 254\n', '#define AT_MAGC 255\n']
+    attk += [f'#define {a} {i}\n' for (i, a) in enumerate(DAMAGE)]
+    attk += ['#define AD_CLRC 240\n', '#define AD_SPEL 241\n', '#define AD_RBRE 242\n',
+             '#define AD_SAMU 252\n', '#define AD_CURS 253\n']
+    write_file(os.path.join(path, 'include', 'monattk.h'), ''.join(attk))
+
+    flags = []
+    for (prefix, names) in FLAGS.items():
+        flags += [f'#define {name} 0x{1 << i:08x}L\n' for (i, name) in enumerate(names)]
+    flags += ['#define M1_OMNIVORE (M1_CARNIVORE | M1_HERBIVORE)\n',
+              '#define G_UNIQ 0x1000\n', '#define G_NOHELL 0x0800\n', '#define G_HELL 0x0400\n',
+              '#define G_NOGEN 0x0200\n', '#define G_SGROUP 0x0080\n', '#define G_LGROUP 0x0040\n',
+              '#define G_GENO 0x0020\n', '#define G_NOCORPSE 0x0010\n', '#define G_FREQ 0x0007\n']
+    write_file(os.path.join(path, 'include', 'monflag.h'), ''.join(flags))
+
+    monst = ['/* synthetic monst.c */\n',
+             '#define NO_ATTK \\\n    {                   \\\n        0, 0, 0, 0      \\\n    }\n',
+             '#define WT_ELF 800\n#define WT_DRAGON 4500\n',
+             'struct permonst mons[] = {\n']
+    #The defines go in after the first MON, one every step monsters. Each one is used by
+    #the succubi that come after it, until the next.
+    step = max(1, monsters // defines) if defines else monsters + 1
+    for i in range(monsters):
+        d = min(i // step, defines)
+        if i > 0 and i % step == 0 and i // step <= defines:
+            monst.append(f'#define BENCH_ATTACKS_{d}                                     \\\n'
+                         f'    A(ATTK(AT_BITE, AD_SSEX, 0, 0), ATTK(AT_CLAW, AD_PHYS, 1, 3), \\\n'
+                         f'      ATTK(AT_CLAW, AD_PHYS, 1, {3 + d % 5}), NO_ATTK, NO_ATTK, NO_ATTK)\n')
+        template = MON_TEMPLATES[i % len(MON_TEMPLATES)]
+        if d == 0:
+            template = template.replace('BENCH_ATTACKS_{d}', 'A(ATTK(AT_CLAW, AD_PHYS, 1, 3), NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK)')
+        monst.append(template.format(n=i // len(MON_TEMPLATES), d=d))
+        if i == 0:
+            #Disabled copies of the first monster, which mustn't count as a second one.
+            monst.append('#if 0\n' + monst[-1] + '#endif\n/*\n' + monst[-1] + ' */\n')
+    monst.append('    MON("", 0, LVL(0, 0, 0, 0, 0), (0),\n'
+                 '        A(NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK),\n'
+                 '        SIZ(0, 0, 0, 0), 0, 0, 0L, 0L, 0, 0, 0)\n};\n')
+    write_file(os.path.join(path, 'src', 'monst.c'), ''.join(monst))
+
+    dbase = ['# synthetic data.base\n']
+    for i in range(entries):
+        (tags, text) = ENTRY_TEMPLATES[i % len(ENTRY_TEMPLATES)]
+        n = i // len(ENTRY_TEMPLATES)
+        dbase.append(tags.format(n=n) + text.format(n=n))
+    #data.base's last entry is never used, so end with a throwaway one.
+    dbase.append('end\n\tEnd.\n')
+    write_file(os.path.join(path, 'dat', 'data.base'), ''.join(dbase))
+
+#Time each stage of converting the tree at path, in seconds.
+#Stages run in order on the same Conversion, so each one has what it needs from the last.
+def time_stages(path, outdir):
+    times = {}
+    def timed(stage, f):
+        start = time.perf_counter()
+        result = f()
+        times[stage] = time.perf_counter() - start
+        return result
+
+    #The script prints as it goes (HTML: ...); that's not what's being measured.
+    with contextlib.redirect_stdout(io.StringIO()):
+        ctx = nhtohtml.Conversion(path, '3.6.6', outdir)
+        timed('headers', lambda: nhtohtml.parse_headers(ctx))
+        timed('defines', lambda: sum(1 for _ in nhtohtml.read_monst_lines(nhtohtml.read_source_lines(nhtohtml.monst_filename(ctx)))))
+        ctx.mon_count = timed('names', lambda: nhtohtml.count_monster_names(ctx))
+        only = nhtohtml.Conversion(path, '3.6.6', outdir, 'giant ant 0')
+        check_names(ctx.mon_count, timed('only_names', lambda: nhtohtml.count_monster_names(only)))
+        monsters = timed('parse', lambda: list(nhtohtml.iter_monsters(ctx)))
+        def load():
+            ctx.entries = nhtohtml.load_encyclopedia(ctx)
+            ctx.encyclopedia = nhtohtml.index_encyclopedia(ctx.entries, nhtohtml.encyclopedia_filename(ctx))
+        timed('encyclopedia_load', load)
+        timed('encyclopedia_lookup', lambda: [nhtohtml.lookup_entry(ctx, m.name) for m in monsters])
+        timed('calc', lambda: [(nhtohtml.calc_exp(ctx, m), nhtohtml.calc_difficulty(ctx, m)) for m in monsters])
+        timed('calc_table', lambda: nhtohtml.calc_table(ctx, monsters))
+        timed('conveyance', lambda: [nhtohtml.gen_conveyance(ctx, m) for m in monsters])
+        pages = timed('render', lambda: [nhtohtml.render_monster(ctx, m) for m in monsters])
+        ctx.sink = nhtohtml.DirectorySink(outdir)
+        timed('output', lambda: [nhtohtml.write_output(ctx, name, text) for (name, text) in pages])
+        #And the whole thing, as the command line does it.
+        shutil.rmtree(outdir)
+        timed('convert', lambda: nhtohtml.convert(path, '3.6.6', outdir, cache_dir=None))
+    return times
+
+#The --only count of a name has to match the full one, or its page gets the wrong name.
+def check_names(mon_count, only_count):
+    for (name, n) in only_count.items():
+        if mon_count.get(name) != n:
+            raise Exception(f"--only counts {n} of {name}, the full count has {mon_count.get(name)}")
+
+#Run the benchmark for one tree size. Each stage's time is the best of repeat runs.
+def run(workdir, monsters, entries, defines, repeat):
+    path = os.path.join(workdir, f'NetHack-bench-{monsters}')
+    outdir = os.path.join(workdir, f'out-{monsters}')
+    write_tree(path, monsters, entries, defines)
+    best = {}
+    for _ in range(repeat):
+        if os.path.isdir(outdir):
+            shutil.rmtree(outdir)
+        for (stage, t) in time_stages(path, outdir).items():
+            best[stage] = min(t, best.get(stage, t))
+    return {
+        'MONSTERS' : monsters,
+        'ENTRIES'  : entries,
+        'DEFINES'  : defines,
+        'SOURCE_BYTES' : sum(os.path.getsize(os.path.join(d, f)) for (d, _, files) in os.walk(path) for f in files),
+        'SECONDS'  : best,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time each stage of nhtohtml.py on generated source trees.')
+    parser.add_argument('--sizes', default='100,1000,10000', help='Comma separated numbers of MON declarations, one tree each (default: %(default)s).')
+    parser.add_argument('--entries', type=int, help='data.base entries per tree. Defaults to the number of monsters.')
+    parser.add_argument('--defines', type=int, default=100, help='#defines after the first MON (default: %(default)s).')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per tree; the best time for each stage is kept (default: %(default)s).')
+    parser.add_argument('--output', help='Write the results here as JSON. Otherwise they go to stdout.')
+    parser.add_argument('--workdir', help='Where to generate the trees. Defaults to a temporary folder that is removed afterwards.')
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    workdir = args.workdir or tempfile.mkdtemp(prefix='nhtohtml-bench-')
+    try:
+        runs = []
+        for size in sizes:
+            print(f'{size} monsters...', file=sys.stderr)
+            result = run(workdir, size, size if args.entries is None else args.entries, args.defines, args.repeat)
+            for (stage, t) in result['SECONDS'].items():
+                print(f'\t{stage:20} {t:9.4f}s', file=sys.stderr)
+            runs.append(result)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        'SCRIPT_VERSION' : nhtohtml.version,
+        'PYTHON'         : platform.python_version(),
+        'PLATFORM'       : platform.platform(),
+        'NUMPY'          : nhtohtml.numpy is not None,
+        'TIME'           : time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'RUNS'           : runs,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+    else:
+        json.dump(results, sys.stdout, indent=4)
+        print()
+
+if __name__ == '__main__':
+    main()
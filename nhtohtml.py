@@ -1,1422 +1,3575 @@
-
-#python nhtohtml.py E:\qazmlpok\NetHack\NetHack3.6.6\NetHack-NetHack-3.6.6_Released --output=../../py_html
-
-import argparse
-import re
-import os
-import json
-
-#Functions
-
-#Load in data.json and parse it as JSON.
-#This file includes comments using # (since it used to be embedded in the script). This is invalid.
-#Fortunately, none of the const data uses #, so this is trivial to remove by regex.
-def load_json_data():
-    filename = 'data.json'
-    with open(filename, 'r') as f:
-        filedata = f.read()
-        #The Perl regex of s/#.*$//m doesn't work. I don't understand why.
-        filedata = re.sub(r'#.*', '', filedata)
-    data = json.loads(filedata)
-    return data
-
-def format_num(num):
-    #Turn number to string; if it's negative, replace - with HTML entity.
-    return str(num).replace('-', '&minus;')
-
-def mon_opening_template(m, print_name, difficulty, exp, ac, align, frequency, genocidable):
-    return '{{' + f""" monster
- |name={print_name}
- |difficulty={difficulty}
- |level={m['LEVEL']['LVL']}
- |experience={exp}
- |speed={m['LEVEL']['MOV']}
- |AC={ac}
- |MR={m['LEVEL']['MR']}
- |align={align}
- |frequency={frequency}
- |genocidable={genocidable}
-"""
-#Putting this here so it doesn't mess with the indentation. It's a bigger issue with Python.
-
-def parse_permonst(filename):
-    if not os.path.isfile(filename):
-        print(filename)
-        raise Exception("Can't find permonst.h")
-    with open(filename, 'r') as fh:
-        defs = {}
-        for l in fh.readlines():
-            #Assumption: no multi-line defines.
-            m = re.search(r'^#define\s+(\S+)\s+(.*)', l)
-            if not m:
-                continue
-            key = m.group(1)
-            val = m.group(2)
-            
-            #I doubt this will happen but if it does, it will break things elsewhere.
-            if key == 'NATTK' and val != '6':
-                raise Exception(f'NATTK value changed! ({val})')
-            #All we care about for now.
-            #There are other defines like "VERY_SLOW" but they don't appear to be used.
-            m2 = re.search(r'^WT_|^CN_', key)
-            if not m2:
-                continue
-            #Usually no comments, but make certain
-            val = re.sub(r'/\*.*?\*/', '', val)
-            val = re.sub(r'//.*$', '', val)
-            val = re.sub(r'^\s+|\s+$', '', val)    #Trim spaces.
-            
-            #defined to an early value. Example:
-            # #define WT_DIMINUTIVE 10
-            # #define WT_ANT        WT_DIMINUTIVE
-            if val in defs:
-                val = defs[val]
-            defs[key] = val
-            
-        #Hack - Vanilla NetHack stores WT_HUMAN in permonst,
-        #but ELF and DRAGON are on monst.c. Just hardcode those two...
-        if 'WT_HUMAN' not in defs:
-            defs['WT_HUMAN'] = '1450'
-        if 'WT_ELF' not in defs:
-            defs['WT_ELF'] = '800'
-        if 'WT_DRAGON' not in defs:
-            defs['WT_DRAGON'] = '4500'
-        
-        return defs
-
-#This is just a copy of parse_permonst
-#TODO: make a generic "parse this file and return the #defs as a dict" sub.
-def parse_monattk(filename):
-    if not os.path.isfile(filename):
-        print(filename)
-        raise Exception("Can't find monattk.h")
-    with open(filename, 'r') as fh:
-        defs = {}
-        ordered_keys = []
-        for l in fh.readlines():
-            #Assumption: no multi-line defines.
-            m = re.search(r'^#define\s+(\S+)\s+(.*)', l)
-            if not m:
-                continue
-            key = m.group(1)
-            val = m.group(2)
-            
-            #All we care about.
-            m2 = re.search(r'^AT_|^AD_', key)
-            if not m2:
-                continue
-            #Attacks typically have a comment saying what makes them special
-            #or who uses the attack/damage. This could be worth keeping...
-            #but for now, just cut it out.
-            
-            val = re.sub(r'/\*.*?\*/', '', val)
-            val = re.sub(r'//.*$', '', val)
-            val = re.sub(r'^\s+|\s+$', '', val)    #Trim spaces.
-            #defined to an early value. Example:
-            #   #define WT_DIMINUTIVE 10
-            #   #define WT_ANT        WT_DIMINUTIVE
-            #dNetHack does this with attack types, plus eval:
-            #   #define AD_DUNSTAN	120
-            #   #define AD_IRIS		AD_DUNSTAN+1
-            if val in defs:
-                val = defs[val]
-            defs[key] = val
-            ordered_keys.append(key)
-        #Loop over all of the defines, in order
-        #Look for references to an earlier definition, and do subtitution
-        #This is easy because all references _should_ contain AD_/AT_
-        for key in ordered_keys:
-            val = defs[key]
-            m = re.match(r'^[\d()-]+$', val)
-            if m:
-                #Just digits.
-                continue
-            for innerkey in ordered_keys:
-                if key == innerkey:
-                    break
-                innerval = defs[innerkey]
-                #Any point keeping the if?    if ($val =~ m/\Q$innerkey\E/)
-                val = val.replace(innerkey, innerval)
-        m = re.match(r'^[\d\s()-]+$', val)
-        if not m:
-            #Evaluate + or whatever. Die if it looks scary.
-            m = re.match(r'^[\d()+*\/-]+$', val)
-            if not m:
-                raise Exception(f"'{val}' doesn't look like an expression")
-            if len(val) > 30:
-                raise Exception(f"'{val}' is too long")
-            val = eval(val)
-        
-        #Update.
-        defs[key] = val
-        
-        #split into attacks and damages
-        attacks = {k:defs[k] for k in ordered_keys if k.startswith('AT_')}
-        damages = {k:defs[k] for k in ordered_keys if k.startswith('AD_')}
-        
-        #Placeholder. 0 is used sometimes. Other ints usually aren't.
-        attacks[0] = 0
-        damages[0] = 0
-        
-        return (attacks, damages)
-
-#Handle #define statements in monst.c
-#Specifically, replacing SEDUCTION_ATTACKS (or whatever) with the found definitions
-def do_define_substitutions(line, definitions):
-    keys = list(definitions.keys())
-    #Need to loop over them longest-first...
-    keys = sorted(keys, key=lambda x: len(x), reverse=True)
-    for item in keys:
-        if item in line:
-            #Perform replacement.
-            #print(f"SUB: '{item}' TO {definitions[item]}")
-            line = line.replace(item, definitions[item])
-    return line
- 
-
-#Main body
-
-version = '2.10w'
-rev = f"$Revision: {version} $ "
-
-parser = argparse.ArgumentParser(description='')
-parser.add_argument('path', help='Filepath of a NetHack source distribution.')
-parser.add_argument('--version', required=False, help='Base version of vanilla NetHack to use')
-parser.add_argument('--output', required=False, default='html', help='Output folder for the generated files. Will be created.')
-parser.add_argument('--only', required=False, default='', help='If specified, only process the given monster.')
-args = parser.parse_args()
-print(args)
-
-force_version = args.version
-nethome = args.path
-output_path = args.output
-only_mon = args.only
-
-if force_version is not None:
-    m = re.match(r'^\d+\.\d+\.\d+$', force_version)
-    if not m:
-        raise Exception(f"--version argument should be in the form 'x.x.x', corresponding to the base NetHack version (got {force_version})")
-
-#for consistency; replace all \ with /.
-nethome = nethome.replace('\\', '/')
-
-#Strip "src" off if included.
-nethome = nethome.replace('/src', '')
-
-if not os.path.isdir(nethome):
-    raise Exception(f'Path does not exist: {nethome}')
-if not os.path.isfile(os.path.join(nethome, 'include', 'monst.h')):
-    raise Exception(f'Path does not appear to be a NetHack source folder: {nethome}')
-    
-#die "SLASHEM-Extended is not supported." if $nethome =~ /SLASHEM[-_ ]Extended/i;
-
-slashem          = re.search(r'slashem'             , nethome, re.I) is not None;  #Modify the src reference
-dnethack         = re.search(r'dnethack'            , nethome, re.I) is not None;
-unnethack        = re.search(r'unnethack'           , nethome, re.I) is not None;
-slashthem        = re.search(r'SlashTHEM'           , nethome, re.I) is not None;
-slashem_extended = re.search(r'SLASHEM[-_ ]Extended', nethome, re.I) is not None;
-
-if dnethack:
-    print("====")
-    print("Consider using printMons() in $nethome/src/allmain.c instead.")
-    print("====")
-    
-#Try to calculate the version. There's a handful of changes
-# - there's a bug in xp calculation for non-attacks that was fixed in 3.6.0
-# - in 3.6.0, Giants give strength as an instrinsic, meaning it reduces the chance of getting other intrinsics
-# - SLASH'EM just flat reduces the chance to 25%
-# - 3.7.0 changes the file that contains all monst data and adds a variant to the MON define.
-base_nhver = '3.4.3'    #Assume 3.4.3, since most variants are based off that.
-
-m = re.search(r'nethack-(\d+\.\d+\.\d+)', nethome, re.I)
-if m:
-    base_nhver = m.group(1)
-
-if slashem or dnethack or unnethack:
-    base_nhver = '3.4.3'
-
-if force_version:
-    base_nhver = force_version
-    
-if slashem:
-    print("Using SLASH'EM. Only 0.0.7E7F3 is really supported.")
-else:
-    print(f"Using NetHack version {base_nhver}")
-print()
-
-
-consts = load_json_data();
-
-permonst_flags = parse_permonst(os.path.join(nethome, 'include', 'permonst.h'))
-(atk_ints, dmg_ints) = parse_monattk(os.path.join(nethome, 'include', 'monattk.h'))
-
-attacks = consts['attacks']
-damage = consts['damage']
-if slashem:
-    attacks = attacks + consts['slashem_attacks']
-    damage = damage + consts['slashem_damage']
-if dnethack:
-    attacks = attacks + consts['dnethack_attacks']
-    damage = damage + consts['dnethack_damage']
-if unnethack:
-    attacks = attacks + consts['unnethack_attacks']
-    damage = damage + consts['unnethack_damage']
-if slashthem or slashem_extended:
-    attacks = attacks + consts['slashem_attacks'] + consts['unnethack_attacks'] + consts['slashthem_attacks']
-    damage = damage + consts['slashem_damage'] + consts['unnethack_damage'] + consts['slashthem_damage']
-
-# Some monster names appear twice (were-creatures).  We use the
-# mon_count hash to keep track of them and flag cases where we need to
-# specify.
-mon_count = {}
-
-monsters = []
-
-#Dumping place for flags that need to be manually set.
-#Variants will likely add new damage types, attack types, resistances...
-#If these aren't found it will print a "undefined value" warning somewhere.
-unknowns = {}
-
-
-
-#Get the regex to use for the MON structure.
-#This is to avoid optional capture groups.
-def get_regex(func_name):
-    #dNetHack uses its own thing; this function won't be called.
-    if (base_nhver <= '3.6.2'):
-        return re.compile(r'''
-            MON \(          #Monster definition
-                "(?P<NAME>.*)",         #Monster name, quoted string
-                S_(?P<SYM>.*?),         #Symbol (always starts with S_)
-                (?:LVL|SIZ)\(          #Open LVL - Shelob's definition in SLASH'EM 0.0.7E7F3 incorrectly uses SIZ, so catch that too.
-                    (?P<LVL>.*?)               #This will be parsed by parse_level
-                \),                    #Close LVL
-                \(?                    #Open generation flags
-                    (?P<GEN>.*?)               #Combination of G_ flags (genocide, no_hell or hell, and an int for frequency)
-                \)?,                   #Close generation
-                A\(                    #Open attacks
-                    (?P<ATK>.*)                #Parsed by parse_attack
-                \),                    #Close attacks
-                SIZ\(                  #SIZ structure
-                    (?P<SIZ>.*)                #Parsed by parse_size
-                \),                    #Close SIZ
-                (?P<MR1>.*?),           #Resistances OR'd together, or 0
-                (?P<MR2>.*?),           #Granted resistances
-                (?P<FLG1>.*?),          #Flags 1 (M1_, OR'd together)
-                (?P<FLG2>.*?),          #Flags 2 (M2_, OR'd together)
-                (?P<FLG3>.*?),          #Flags 3
-                (?P<COL>.*?)            #Color
-            \),$            #Close MON, anchor to end of string
-        ''', re.X)
-    if (base_nhver <= '3.7.0'):
-        #3.7.0 adds the define name (e.g. "FOX") near the end.
-        return re.compile(r'''
-            MON \(          #Monster definition
-                "(?P<NAME>.*)",         #Monster name, quoted string
-                S_(?P<SYM>.*?),         #Symbol (always starts with S_)
-                (?:LVL|SIZ)\(          #Open LVL - Shelob's definition in SLASH'EM 0.0.7E7F3 incorrectly uses SIZ, so catch that too.
-                    (?P<LVL>.*?)               #This will be parsed by parse_level
-                \),                    #Close LVL
-                \(?                    #Open generation flags
-                    (?P<GEN>.*?)               #Combination of G_ flags (genocide, no_hell or hell, and an int for frequency)
-                \)?,                   #Close generation
-                A\(                    #Open attacks
-                    (?P<ATK>.*)                #Parsed by parse_attack
-                \),                    #Close attacks
-                SIZ\(                  #SIZ structure
-                    (?P<SIZ>.*)                #Parsed by parse_size
-                \),                    #Close SIZ
-                (?P<MR1>.*?),           #Resistances OR'd together, or 0
-                (?P<MR2>.*?),           #Granted resistances
-                (?P<FLG1>.*?),          #Flags 1 (M1_, OR'd together)
-                (?P<FLG2>.*?),          #Flags 2 (M2_, OR'd together)
-                (?P<FLG3>.*?),          #Flags 3
-                (?P<DIFF>\d+),          #Difficulty (3.6.2+)
-                (?P<COL>.*?)           #Color
-            \),$            #Close MON, anchor to end of string
-        ''', re.X)
-    
-    #3.7.0+ (using the current git code; not final)
-    #MON3 is a new variant that includes gender names for certain monsters.
-    if func_name == 'MON3':
-        return re.compile(r'''
-            MON3 \(          #Monster definition
-                "(?P<MALE_NAME>.*)",    #Male Monster name, quoted string
-                "(?P<FEMALE_NAME>.*)",  #Female Monster name, quoted string
-                "(?P<NAME>.*)",         #Monster name, quoted string
-                S_(?P<SYM>.*?),         #Symbol (always starts with S_)
-                (?:LVL|SIZ)\(          #Open LVL - Shelob's definition in SLASH'EM 0.0.7E7F3 incorrectly uses SIZ, so catch that too.
-                    (?P<LVL>.*?)               #This will be parsed by parse_level
-                \),                    #Close LVL
-                \(?                    #Open generation flags
-                    (?P<GEN>.*?)               #Combination of G_ flags (genocide, no_hell or hell, and an int for frequency)
-                \)?,                   #Close generation
-                A\(                    #Open attacks
-                    (?P<ATK>.*)                #Parsed by parse_attack
-                \),                    #Close attacks
-                SIZ\(                  #SIZ structure
-                    (?P<SIZ>.*)                #Parsed by parse_size
-                \),                    #Close SIZ
-                (?P<MR1>.*?),           #Resistances OR'd together, or 0
-                (?P<MR2>.*?),           #Granted resistances
-                (?P<FLG1>.*?),          #Flags 1 (M1_, OR'd together)
-                (?P<FLG2>.*?),          #Flags 2 (M2_, OR'd together)
-                (?P<FLG3>.*?),          #Flags 3
-                (?P<DIFF>\d+),          #Difficulty (3.6.2+)
-                (?P<COL>.*?),           #Color
-                (?P<INDEXNUM>.*?)       #Monster define symbol.
-            \),$            #Close MON, anchor to end of string
-        ''', re.X)
-    
-    return re.compile(r'''
-        MON \(          #Monster definition
-            "(?P<NAME>.*)",         #Monster name, quoted string
-            S_(?P<SYM>.*?),         #Symbol (always starts with S_)
-            (?:LVL|SIZ)\(          #Open LVL - Shelob's definition in SLASH'EM 0.0.7E7F3 incorrectly uses SIZ, so catch that too.
-                (?P<LVL>.*?)               #This will be parsed by parse_level
-            \),                    #Close LVL
-            \(?                    #Open generation flags
-                (?P<GEN>.*?)               #Combination of G_ flags (genocide, no_hell or hell, and an int for frequency)
-            \)?,                   #Close generation
-            A\(                    #Open attacks
-                (?P<ATK>.*)                #Parsed by parse_attack
-            \),                    #Close attacks
-            SIZ\(                  #SIZ structure
-                (?P<SIZ>.*)                #Parsed by parse_size
-            \),                    #Close SIZ
-            (?P<MR1>.*?),           #Resistances OR'd together, or 0
-            (?P<MR2>.*?),           #Granted resistances
-            (?P<FLG1>.*?),          #Flags 1 (M1_, OR'd together)
-            (?P<FLG2>.*?),          #Flags 2 (M2_, OR'd together)
-            (?P<FLG3>.*?),          #Flags 3
-            (?P<DIFF>\d+),          #Difficulty (3.6.2+)
-            (?P<COL>.*?),            #Color
-            (?P<INDEXNUM>.*?)       #Monster define symbol.
-        \),$            #Close MON, anchor to end of string
-    ''', re.X)
-
-def get_vanilla_ref(lineno):
-    #These are still on the wiki
-    if (base_nhver == '3.4.3'):
-        return f"[[Source:NetHack_3.4.3/src/monst.c#line{lineno}|monst.c#line{lineno}]]"
-    #return f"[[Source:NetHack_3.6.0/src/monst.c#line{lineno}|monst.c#line{lineno}]]" if ($base_nhver eq '3.6.0');
-    #return f"[[Source:NetHack_3.6.1/src/monst.c#line{lineno}|monst.c#line{lineno}]]" if ($base_nhver eq '3.6.1');
-    
-    #github
-    if base_nhver in ('3.6.0', '3.6.1', '3.6.2', '3.6.3', '3.6.4', '3.6.5', '3.6.6'):
-        return f"[https://github.com/NetHack/NetHack/blob/NetHack-{base_nhver}_Released/src/monst.c#L{lineno} monst.c#line{lineno}]"
-    
-    #3.7.0 doesn't have a release tag yet
-    if (base_nhver == '3.7.0'):
-        return f"[https://github.com/NetHack/NetHack/blob/NetHack-3.7/include/monsters.h#L{lineno} monsters.h#line{lineno}]"
-    
-    
-    raise Exception(f"Unknown version {base_nhver}")
-
-# The main monster parser.  Takes a MON() construct from monst.c and
-# breaks it down into its components.
-def process_monster(the_mon, line):
-    #Remove all unquoted spaces. From https://stackoverflow.com/questions/9577930/regular-expression-to-select-all-whitespace-that-isnt-in-quotes
-    the_mon = re.sub(r'(\s+)(?=([^"]*"[^"]*")*[^"]*$)', '', the_mon)
-    
-    #Comments.
-    the_mon = re.sub(r'/\*.*?\*/', '', the_mon)
-    
-    m = re.search(r'MARM\(-?\d+,\s*(-?\d+)\)', the_mon)
-    target_ac = None
-    if m:
-        target_ac = m.group(1)
-        the_mon = re.sub(r'MARM\((-?\d+),\s*-?\d+\)', '\\1', the_mon)
-    if the_mon.startswith('MON(""'):
-        return
-    #
-    #   #MON("fox", S_DOG, LVL(0, 15, 7, 0, 0), (G_GENO | 1),
-    #       #A(ATTK(AT_BITE, AD_PHYS, 1, 3), NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK),
-    #       #SIZ(300, 250, MS_BARK, MZ_SMALL), 0, 0,     #SIZ, mresists, mconveys
-    #       #M1_ANIMAL | M1_NOHANDS | M1_CARNIVORE,      #mflags1
-    #       #M2_HOSTILE,                                 #mflags2
-    #       #M3_INFRAVISIBLE,                            #mflags3
-    #       #CLR_RED),                                   #mcolor
-    #3.6.2 adds difficulty to the end, right before color
-    #   #MON("fox", S_DOG, LVL(0, 15, 7, 0, 0), (G_GENO | 1),
-    #       #A(ATTK(AT_BITE, AD_PHYS, 1, 3), NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK),
-    #       #SIZ(300, 250, MS_BARK, MZ_SMALL), 0, 0,
-    #       #M1_ANIMAL | M1_NOHANDS | M1_CARNIVORE, M2_HOSTILE, M3_INFRAVISIBLE,
-    #       #1,                                          #Difficulty
-    #       #CLR_RED),                                   #mcolor
-    #3.7.0 Adds MON3 for gendered names. Before, all dwarf kings were male; now queens can exist as well.
-    #The actual monster name is now "dwarf ruler"
-    #Standard MON is also altered to include the defined name as the last parameter
-    #   #MON("fox", S_DOG, LVL(0, 15, 7, 0, 0), (G_GENO | 1),
-    #       #A(ATTK(AT_BITE, AD_PHYS, 1, 3), NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK),
-    #       #SIZ(300, 250, MS_BARK, MZ_SMALL), 0, 0,
-    #       #M1_ANIMAL | M1_NOHANDS | M1_CARNIVORE, M2_HOSTILE, M3_INFRAVISIBLE,
-    #       #1, CLR_RED, FOX),
-    #   #MON3("dwarf king", "dwarf queen", "dwarf ruler",
-    #       #S_HUMANOID, LVL(6, 6, 10, 20, 6), (G_GENO | 1),
-    #       #A(ATTK(AT_WEAP, AD_PHYS, 2, 6), ATTK(AT_WEAP, AD_PHYS, 2, 6), NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK),
-    #       #SIZ(900, 300, MS_HUMANOID, MZ_HUMAN), 0, 0,
-    #       #M1_TUNNEL | M1_NEEDPICK | M1_HUMANOID | M1_OMNIVORE,
-    #       #M2_DWARF | M2_STRONG | M2_PRINCE | M2_GREEDY | M2_JEWELS | M2_COLLECT,
-    #       #M3_INFRAVISIBLE | M3_INFRAVISION, 8, HI_LORD, DWARF_RULER),
-
-    #...
-    m = re.search(r'(MON.?)\(', the_mon)
-    if not m:
-        raise Exception("Couldn't identify MON function.")
-    func = m.group(1)
-    mon_regex = get_regex(func);
-    
-    m = mon_regex.search(the_mon)
-    if not m:
-        print()
-        print(mon_regex)
-        print()
-        raise Exception(f"Monster parse error\n\n{the_mon}")
-    matches = m.groupdict()
-    name = m.group('NAME')
-    col = m.group('COL')
-    if only_mon != '' and name.lower() != only_mon.lower():
-        return
-    
-    if name == 'ghost' or name == 'shade':
-        col = 'NO_COLOR'
-    mon_struct = {
-        'NAME'        : name,
-        'MALE_NAME'   : m.group('MALE_NAME') if 'MALE_NAME' in matches else None,
-        'FEMALE_NAME' : m.group('FEMALE_NAME') if 'FEMALE_NAME' in matches else None,
-        'SYMBOL'      : m.group('SYM'),
-        'LEVEL'       : parse_level(m.group('LVL')),
-        'TARGET'      : target_ac,        #'Target' AC; monsters that typically start with armor have 10 base AC but lower target AC
-        'GEN'         : m.group('GEN'),
-        'ATK'         : parse_attack(m.group('ATK')),
-        'SIZE'        : parse_size(m.group('SIZ')),
-        'MR1'         : m.group('MR1'),
-        'MR2'         : m.group('MR2'),
-        'FLGS'        : f"{m.group('FLG1')}|{m.group('FLG2')}|{m.group('FLG3')}",
-        'COLOR'       : col,
-        'REF'         : line,
-        'MONS_DIFF'   : m.group('DIFF') if 'DIFF' in matches else None,     #3.6.2 only
-    }
-    
-    # TODO: Automate this from the headers too.
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('HI_DOMESTIC', 'CLR_WHITE')
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('HI_LORD', 'CLR_MAGENTA')
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('HI_OBJ', 'CLR_MAGENTA')
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('HI_METAL', 'CLR_CYAN')
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('HI_COPPER', 'CLR_YELLOW')
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('HI_SILVER', 'CLR_GRAY')
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('HI_GOLD', 'CLR_YELLOW')
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('HI_LEATHER', 'CLR_BROWN')
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('HI_CLOTH', 'CLR_BROWN')
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('HI_ORGANIC', 'CLR_BROWN')
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('HI_WOOD', 'CLR_BROWN')
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('HI_PAPER', 'CLR_WHITE')
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('HI_GLASS', 'CLR_BRIGHT_CYAN')
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('HI_MINERAL', 'CLR_GRAY')
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('DRAGON_SILVER', 'CLR_BRIGHT_CYAN')
-    mon_struct['COLOR'] = mon_struct['COLOR'].replace('HI_ZAP', 'CLR_BRIGHT_BLUE')
-    
-    monsters.append(mon_struct)
-    if name in mon_count:
-        mon_count[name] += 1
-    else:
-        mon_count[name] = 1
-
-
-def process_monster_dnethack():
-    raise Exception('Implement later.')
-
-# Parse a LVL() construct.
-def parse_level(lvl):
-    
-    lvl = re.sub(r'MARM\((-?\d+),\s*-?\d+\)', '\\1', lvl)
-    m = re.search(r'(.*),(.*),(.*),(.*),(.*)', lvl)
-    (lv,mov,ac,mr,aln) = m.groups()
-    
-    base_lv = lv
-    lv = int(lv)
-    mov = int(mov)
-    ac = int(ac)
-    mr = int(mr)
-    aln = aln
-    
-    #Special monsters with fixed level and hitdice.
-    #dNetHack, as far as I can tell from source, does not do the level adjustment
-    #(All other variants I looked at appear unchanged)
-    if lv > 49 and not dnethack:
-        #mtmp->mhpmax = mtmp->mhp = 2*(ptr->mlevel - 6);
-	    #mtmp->m_lev = mtmp->mhp / 4;	/* approximation */
-        lv = int((2*(lv - 6)) / 4);
-    
-    return {
-        'LVL' : lv,
-        'BASE_LVL' : base_lv,
-        'MOV' : mov,
-        'AC'  : ac,
-        'MR'  : mr,
-        'ALN' : aln,
-    }
-    
-# Parse an A(ATTK(),...) construct
-def parse_attack(atk):
-    astr = []
-    
-    matches = re.findall(r'ATTK\((.*?),(.*?),(.*?),(.*?)\)', atk)
-    for match in matches:
-        a = {
-            'AT' : match[0],
-            'AD' : match[1],
-            'N'  : match[2],
-            'D'  : match[3],
-        }
-        astr.append(a)
-    
-    return astr
-
-def parse_size(siz):
-    #The SIZ macro differs in 3.4.3 and 3.6.0. 3.4.3 includes "pxl",
-    #which may be SIZEOF(struct), e.g. "sizeof(struct epri)" (Aligned Priest)
-    #It's not relevant to this program, so skip it. Make it optional in the regex.
-    
-    m = re.search(r'([^,]*),([^,]*),(?:[^,]*,)?([^,]*),([^,]*)', siz)
-    if not m:
-        raise Exception(f"Failed to parse SIZ string: {siz}")
-    wt = m.group(1)
-    nut = m.group(2)
-    snd = m.group(3)
-    sz = m.group(4)
-    
-    if wt in permonst_flags:
-        wt = permonst_flags[wt]
-    if nut in permonst_flags:
-        nut = permonst_flags[nut]
-        
-    if not wt.isdigit():
-        wt = eval_wt_nut(wt)
-    if not nut.isdigit():
-        nut = eval_wt_nut(nut)
-    
-    return {
-        'WT' : wt,
-        'NUT' : nut,
-        'SND' : snd,
-        'SIZ' : consts['sizes'][sz]
-    }
-    
-def eval_wt_nut(size):
-    defined_constants = {
-        'MZ_TINY'     : '0',
-        'MZ_SMALL'    : '1',
-        'MZ_MEDIUM'   : '2',
-        'MZ_HUMAN'    : '2',
-        'MZ_LARGE'    : '3',
-        'MZ_HUGE'     : '4',
-        'MZ_GIGANTIC' : '7',
-    } | permonst_flags      #(Python 3.9 or greater)
-    
-    for (k,v) in defined_constants:
-        size = size.replace(k, v)
-        
-    m = re.match(r'^[\d()+*\/-]+$', size)
-    if not m:
-        raise Exception(f"'{size}' SIZ() doesn't look like numbers")
-    if len(size) > 30:
-        raise Exception(f"SIZ() looks unusually long")
-    val = int(eval(val))
-
-#----DBASE
-
-def load_encyclopedia():
-    filename = os.path.join(nethome, 'dat', 'data.base')
-    entries = []
-    
-    entry = ''
-    tags = []
-    
-    with open(filename, 'r') as dbase:
-        for l in dbase.readlines():
-            if l.startswith('#'):
-                # Ignore comments
-                continue
-                
-            # Lines beginning with non-whitespace are tags
-            m = re.search(r'^\S', l)
-            if m:
-                # If $entry is non-empty, then the last entry is done, push it.
-                if len(entry) > 0:
-                    entries.append({
-                        'TAGS': tags,
-                        'ENTRY': entry,
-                    })
-                    # Reset for the next entry.
-                    entry = ''
-                    tags = []
-                l = l.strip('\r\n')     #Chomp
-                # Set up the tag for future pattern matches.
-                l = l.replace('*', '.*').replace('~', '\~')
-                # There can be multiple tags per entry.
-                tags.append(l)
-            else:
-                entry += l
-    return entries
-
-entries = load_encyclopedia()
-#Monsters are declared in monst.c. In 3.7.0, this was moved to be in monsters.h (#included from monst.c)
-if base_nhver >= '3.7.0':
-    src_filename = os.path.join(nethome, 'include', 'monsters.h')
-else:
-    src_filename = os.path.join(nethome, 'src', 'monst.c')
-    
-#--Should be a function...
-with open(src_filename, 'r') as MONST:
-    sex_attack = ""
-    having_sex = 0
-    curr_mon = False
-    ref = None
-    seen_a_mon = False
-    is_deferred = False        #Track '#if 0'
-    
-    # #define statements after the first MON.
-    #Typically SEDUCTION_ATTACKs
-    #Note: Explicitly skip "#define M1_MARSUPIAL 0" or any other M*/G* flags
-    #Skip anything that's already defined (i.e. SEDUCTION_ATTACKS). Use the first one seen.
-    seen_defines = {}
-    in_define = ''
-    skip_this_define = False
-    
-    l_brack = r_brack = 0
-    
-    #read lines
-    for (i, l) in enumerate(MONST, 1):
-        if not ref:
-            #Get the first line the monster is declared on
-            ref = i
-        l = l.strip('\r\n')     #Chomp
-        
-        #Remove comments.
-        if seen_a_mon:
-            l = re.sub(r'/\*.*?\*/', '', l)
-        l = re.sub(r'//.*$', '', l)
-        
-        if l.startswith('#if 0'):
-            is_deferred = True
-        if is_deferred and l.startswith('#endif'):
-            is_deferred = False
-        
-        if is_deferred:
-            continue
-        
-        m = re.match(r'^#\s*define\s+(\S+)(.*)$', l)
-        if m and seen_a_mon:
-            #print(f"define: {l}")
-            in_define = m.group(1)
-            l = m.group(2)
-            if in_define.startswith('M_') or in_define.startswith('G_') or in_define in seen_defines:
-                skip_this_define = True
-            if not skip_this_define:
-                seen_defines[in_define] = ''
-        if in_define != '':
-            if not skip_this_define:
-                seen_defines[in_define] += l
-            if not l.endswith('\\'):
-                #End of definition (no trailing backslash)
-                in_define = ''
-                skip_this_define = False
-            else:
-                #Remove that trailing backslash
-                seen_defines[in_define] = seen_defines[in_define][0:-1]
-            
-            #No matter what, skip to the next line.
-            continue
-        #This definition stuff is getting unwieldy.
-        l = do_define_substitutions(l, seen_defines)
-        
-        # Monsters are defined with MON() declarations
-        m = re.search(r'^\s+MON', l)
-        if m:
-            curr_mon = True
-            the_mon = ''
-            seen_a_mon = True
-        
-        # Not re-setting r,l to 0 here seems to work better. Not sure why.
-        if (curr_mon):
-            the_mon += l
-            
-            #Count instances of ( and ) in line. When equal, we've finished a mon statement.
-            #This will break if there is an opening MON on the same line as a closing ) for the last mon.
-            #This was using tr//, but nothing else referenced l, so I think it was just using the side effects.
-            l_brack += l.count('(')
-            r_brack += l.count(')')
-
-            # If left and right brackets balance, we're done reading a MON()
-            # declaration. Process it.
-            if (l_brack == r_brack):
-                curr_mon = False
-                #FIXME this should be a class or something to avoid these if chains
-                if dnethack:
-                    process_monster_dnethack(the_mon, ref)
-                else:
-                    process_monster(the_mon, ref)
-                ref = None
-
-#No parameters; just uses globals.
-def output_monster_html():
-    if not os.path.isdir(output_path):
-        os.mkdir(output_path)
-    
-    last_html = ''
-    for m in monsters:
-        htmlname, print_name = gen_names(m)
-        print(f"HTML: {htmlname}")
-        
-        outfilename = os.path.join(output_path, htmlname)
-        with open(outfilename, 'w') as HTML:
-            genocidable = 'Yes' if ('G_GENO' in m['GEN']) else 'No'
-            m2 = re.search(r'([0-7])', m['GEN'])
-            if m2:
-                frequency = m2.group(1)
-            else:
-                frequency = '0'
-            if ('G_NOGEN' in m['GEN']):
-                frequency = '0'
-            
-            #Apply the 'appears in x sized groups'. SGROUP, LGROUP, VLGROUP. VL is new to SLASH'EM.
-            #This is not done "normally", i.e. in the template. But I think this part is important.
-            if ('G_SGROUP' in m['GEN']):
-                frequency += ", appears in small groups"
-            if ('G_LGROUP' in m['GEN']):
-                frequency += ", appears in large groups"
-            if ('G_VLGROUP' in m['GEN']):
-                frequency += ", appears in very large groups"
-            #I was doing this instead of |hell or |nohell. Many vanilla articles don't have this.
-            #Should it be included?
-            #(If so, need to add "sheol" logic for UnNetHack)
-            #$frequency .= ", appears only outside of [[Gehennom]]" if ($m->{GEN} =~ /G_NOHELL/);
-            #$frequency .= ", appears only in [[Gehennom]]" if ($m->{GEN} =~ /G_HELL/);
-            if ('G_UNIQ' in m['GEN']):
-                frequency = "Unique"
-            
-            difficulty = calc_difficulty(m)
-            if base_nhver >= '3.6.2':
-                #Difficulty is now part of the monst array. However, continue to calculate the "old" difficulty.
-                #Print a message if there are any discrepancies.
-                #mstrength no longer exists, so the "computed" difficulty uses 3.6.1 rules.
-                comp_diff = difficulty
-                difficulty = m['MONS_DIFF']
-                
-                if int(comp_diff) != int(difficulty):
-                    print(f"\tDifficulty change: {print_name} set to {difficulty}, calculated {comp_diff}")
-                
-            exp = calc_exp(m)
-            
-            ac = m['LEVEL']['AC']
-            align = m['LEVEL']['ALN']
-            if align == 'A_NONE':
-                #Special case for the wizard. Might break on some variants.
-                align = "unaligned{{refsrc|monst.c|" + str(m['REF']) + "|comment=The Wizard is the only always-unaligned monster in NetHack (though some other monsters can be set to unaligned if generated under special conditions)}}"
-            ac = format_num(ac)
-            align = format_num(align)
-            
-            #Moved the heredoc to a function. I don't want to deal with that indentation in Python.
-            HTML.write(mon_opening_template(m, print_name, difficulty, exp, ac, align, frequency, genocidable))
-            
-            # If the monster has any attacks, produce an attack section.
-            atks = ""
-            if len(m['ATK']) > 0:
-                atks = " |attacks="
-                for a in m['ATK']:
-                
-                    #Track unknown attack types and damage types.
-                    #Need to also avoid key errors in Python.
-                    if a['AT'] not in attacks:
-                        unknowns[a['AT']] = print_name
-                        attacks[a['AT']] = ''
-                    if a['AD'] not in damage:
-                        unknowns[a['AD']] = print_name
-                        damage[a['AD']] = ''
-
-                    if (int(a['D']) > 0):
-                        atks += f"{attacks[a['AT']]} {a['N']}d{a['D']}{damage[a['AD']]}, "
-                    else:
-                        #Omit nd0 damage (not the same as 0dn)
-                        atks += f"{attacks[a['AT']]}{damage[a['AD']]}, "
-                
-                #Quick fix for commas.
-                if atks.endswith(', '):
-                    atks = atks[0:-2]
-            HTML.write(atks + "\n")
-            
-            # If the monster has any conveyances from ingestion, produce a
-            # conveyances section.
-            
-            if ('G_NOCORPSE' in m['GEN']) and not IsPudding(print_name):
-                HTML.write(" |resistances conveyed=None\n")
-            else:
-                HTML.write(" |resistances conveyed=")
-                HTML.write(gen_conveyance(m))
-                HTML.write("\n")
-            #Look for a magic attack. If found, add magic resistance.
-            #Baby gray dragons also explicitly have magic resistance.
-            #For variants, consult mondata.c, resists_magm
-            hasmagic = print_name == "baby gray dragon"
-            for a in m['ATK']:
-                if a['AD'] == 'AD_MAGM' or a['AD'] == 'AD_RBRE':
-                    hasmagic = True
-                if dnethack:
-                    #Large list of explicitly immune mons
-                    #Shimmering dragons have AD_RBRE but are NOT resistant
-                    raise Exception("Implement later.")
-            
-            #Replace MR_ALL with each resistance.
-            #$m->{MR1} =~ s/MR_ALL/MR_STONE\|MR_ACID\|MR_POISON\|MR_ELEC\|MR_DISINT\|MR_SLEEP\|MR_COLD\|MR_FIRE\|MR_DRAIN\|MR_SICK/ 
-            #        if $dnethack;
-            
-            # Rename "see_invis" to "seeinvis" to match template
-            m['FLGS'] = m['FLGS'].replace('SEE_INVIS', 'SEEINVIS')
-            
-            # Same for resistances.
-            resistancesStr = ''
-            resistances = []
-            if m['MR1'] or hasmagic:
-                if m['MR1']:
-                    for mr in m['MR1'].split('|'):
-                        if ('MR_PLUS' in mr) or ('MR_HITAS' in mr):
-                            #SLASH'EM Hit As x/Need x to hit. They're not resistances.
-                            continue
-                        if mr == 0 or mr == '0':
-                            continue
-                        resistances.append(consts['flags'][mr])
-                        #$unknowns{$mr} = $print_name if !defined $flags{$mr};
-
-                #Death, Demons, Were-creatures, and the undead automatically have level drain resistance
-                #Add it, unless they have an explicit MR_DRAIN tag (SLASH'EM only)
-                if (m['NAME'] == 'Death' or m['FLGS'].find('M2_DEMON') != -1 or \
-                        m['FLGS'].find('M2_UNDEAD') != -1 or m['FLGS'].find('M2_WERE') != -1) and \
-                        not m['MR1'].find('MR_DRAIN') != -1:
-                    resistances.append("level drain")
-                if dnethack:
-                    raise Exception("Implement later.")
-                    #dNetHack - angel and keter have explicit death resistance
-            if hasmagic:
-                resistances.append('magic')
-            if len(resistances) == 0:
-                resistancesStr = 'None'
-            else:
-                #TODO: Capitalize words.
-                resistancesStr = ', '.join(resistances)
-            HTML.write(f' |resistances={resistancesStr}\n')
-            
-            # Now output all the other flags of interest.
-            # Nethackwiki nicely supports templates that are equivalent.
-            # So all that's necessary is to strip and reformat the flags.
-            
-            attr_name = m['NAME']
-            if m['FEMALE_NAME']:
-                #The wiki does not currently have a "template" for fe/male name. This is what the Foocubus article does.
-                #$attr_name = "$m->{FEMALE_NAME} or $m->{MALE_NAME}";
-                #TODO: I believe the |tile= parameter is also needed. Again, wait until the templates support these names.
-                pass
-            article = 'A '
-            if m['FLGS'].find('M2_PNAME') != -1:
-                article = ''
-            elif m['GEN'].find('G_UNIQ') != -1:
-                article = 'The '
-            else:
-                article = 'A '
-                #There are exceptions to this (see just_an, objnam.c), but I don't think any of them apply.
-                if (re.search(r'^[aeiou]', attr_name)):
-                    article = "An "
-            HTML.write(" |attributes={{attributes|" + f"{article}{attr_name}")
-            
-            m2 = re.search(r'MR_(HITAS[A-Z]+)', m['MR1'])
-            if m2:
-                m['FLGS'] += '|' + m2.group(1)
-            m2 = re.search(r'MR_(PLUS[A-Z]+)', m['MR1'])
-            if m2:
-                m['FLGS'] += '|' + m2.group(1)
-            if m['GEN'].find('G_NOCORPSE') != -1:
-                m['FLGS'] += '|nocorpse'
-                
-            #I was putting this in frequency. Which is better?
-            if m['GEN'].find('G_HELL') != -1:
-                m['FLGS'] += '|hell'
-            if m['GEN'].find('G_NOHELL') != -1:
-                m['FLGS'] += '|nohell'
-            #UnNetHack
-            if m['GEN'].find('G_SHEOL') != -1:
-                m['FLGS'] += '|sheol'
-            if m['GEN'].find('G_NOSHEOL') != -1:
-                m['FLGS'] += '|nosheol'
-                
-            #TODO: Special flags for dNetHack?
-            #dNetHack specific attributes need to be added to the wiki templates.
-            
-            for mr in m['FLGS'].split('|'):
-                if mr == 0 or mr == '0':
-                    continue
-                #Add MTBGAV for dNetHack. Restricting this at all is unnecessary...
-                mr = re.sub(r'M[1-3MTBGAV]_(.*)', '\\1', mr)
-                HTML.write(f"|{mr.lower()}=1")
-            
-            HTML.write("}}\n")
-                
-            #I think $entry will always be defined. Everything seems to have one.
-            #Could use a better stub message...
-            HTML.write(f" |size={m['SIZE']['SIZ']}\n")
-            HTML.write(f" |nutr={m['SIZE']['NUT']}\n")
-            HTML.write(f" |weight={m['SIZE']['WT']}\n")
-            if slashem:
-                HTML.write(f" |reference=[[SLASH'EM_0.0.7E7F2/monst.c#line{m['REF']}]]")
-            elif dnethack:
-                #dnethack source code isn't on wiki.
-                #Link to github?
-                HTML.write(f" |reference=monst.c, line {m['REF']}")
-            elif unnethack:
-                #There's a template that links to sourceforge, but only as a <ref>, which I don't want.
-                #print $HTML " |reference=https://github.com/UnNetHack/UnNetHack/blob/master/src/monst.c#$m->{REF}";
-                #print $HTML " |reference=http://sourceforge.net/p/unnethack/code/1986/tree/trunk/src/monst.c#$m->{REF}";
-                #ok I just need a {{src}} template...
-                HTML.write(f" |reference=monst.c, line {m['REF']}")
-            #TODO: SLASHTHEM
-            else:
-                ref = get_vanilla_ref(m['REF'])
-                HTML.write(f" |reference={ref}")
-                
-            entry = lookup_entry(m['NAME'])
-            HTML.write("\n}}\n\n\n\n\n\n")
-            if entry:
-                HTML.write("\n==Encyclopedia Entry==\n\n\n{{encyclopedia|" + entry + "}}\n");
-            HTML.write("\n{{stub|This page was automatically generated by a modified version of nhtohtml version " + version + "}}\n");
-            
-            last_html = htmlname
-            #End main processing while loop.
-    #End output_monster_html
-
-#Used to determine if a monster leaves a glob instead of a corpse.
-#This is hardcoded into the code, with 4 entries in a switch statement (mon.c, line 413 in 3.6.1, function make_corpse)
-#There's also a #define for "is this object a pudding?" 
-def IsPudding(name):
-    return name in ['gray ooze', 'brown pudding', 'green slime', 'black pudding']
-
-#No parameters; just uses globals.
-def output_monsters_by_exp():
-    header = '''{| class="prettytable sortable striped" style="border:none; margin:0; padding:0; width: 22em;"
-|-
-! Name !! Experience !! Difficulty
-'''
-    footer = '|}'
-    print('Writing: monsters_by_exp.txt')
-    sorted_mons = sorted(monsters, key=lambda x: (x['EXP'], x['DIFF']), reverse=True)
-    
-    outfilename = os.path.join(output_path, 'monsters_by_exp.txt')
-    with open(outfilename, 'w') as HTML:
-        HTML.write(header)
-        for m in sorted_mons:
-            row = f"|-\n| [[{m['NAME']}]] || {m['EXP']} || {m['DIFF']}\n"
-            HTML.write(row)
-        HTML.write(footer)
-  
-
-    
-# Handy subs follow...
-
-
-# Calculate the chance of getting each resistance
-# Each individual chance uses the lookup table to get the chance;
-# the monster has a level-in-chance chance to grant the intrinsic,
-# (Killer bees and Scorpions add 25% to this value for poison)
-# this value is then divided by the total number of intrinsics.
-# There are a large number of special circumstances. They either completely
-# change which intrinsics are granted (e.g. lycanthopy; not a MR_ ) or
-# modify probabilities of existing intrinsics, (e.g. Mind flayers).
-def gen_conveyance(m):
-    level = m['LEVEL']['LVL']
-    resistances = {}
-    stoning = ('ACID' in m['FLGS']) or ('lizard' in m['NAME'].lower()) or m['NAME'] == 'mandrake'
-    #mandrake is dNetHack. Which also adds many new types of lizards
-    
-    for mr in m['MR2'].split('|'):
-        if mr == "0" or mr == 0:
-            break
-        if mr == 'MR_STONE':
-            #Interesting. MR_STONE actually seems to have no effect. Petrification curing is an acidic or lizard check and not MR_STONE check.
-            #Additionally, the chromatic dragon, which has MR_STONE, does NOT cure petrification!
-            continue
-        r = consts['flags'][mr]
-        #print(m)
-        resistances[r] = (level * 100) / 15
-        
-        if (m['NAME'] == 'killer bee' or m['NAME'] == 'scorpion') and mr == 'MR_POISON':
-            #These two monsters have a hardcoded "bonus" chance to grant poison resistance.
-            #25% of the time, they always grant it. 75% of the time, they follow regular rules.
-            #(I wrote a quick program to verify this gets added correctly. The expected values are 30% for killer bee and 50% for scorpion)
-            resistances[r] = (resistances[r] * 0.75) + 25;
-        
-        resistances[r] = min(int(resistances[r]), 100)
-        #Comment was "Round down", but pretty sure this was always using ints
-    
-    if ('M1_TPORT' in m['FLGS']):
-        chance = int(level * 100) / 10
-        chance = min(chance, 100)
-        resistances['causes [[teleportitis]]'] = chance
-    if ('M1_TPORT_CNTRL' in m['FLGS']):
-        chance = int(level * 100) / 12
-        chance = min(chance, 100)
-        resistances['[[teleport control]]'] = chance
-    
-    if dnethack and m['NAME'] == 'shimmering dragon':
-        resistances['displacement'] = 100
-    
-    #Level 0 monsters cannot give intrinsics (0% chance). There don't seem to be any that affect this though, and no other way to get 0%
-    
-    #Insert a bunch of special cases. Some will clear %resistances.
-    #50% chance of +1 intelligence
-    if ('mind flayer' in m['NAME']):
-        resistances["+1 [[Intelligence]]"] = 100
-    if ('mind flayer' in m['NAME']) or m['NAME'] == "floating eye":
-        resistances["[[Telepathy]]"] = 100
-    
-    #"Hey, eating Death will give me teleport control!"
-    if m['NAME'] == "Death" or m['NAME'] == "Famine" or m['NAME'] == "Pestilence":
-        resistances = {}
-    
-    count = len(resistances)
-    
-    #Strength from giants:
-    #in 3.6.0+, the +strength is considered a proper resistance, and thus reduces the chance of other resistances (storm, fire, ice)
-    #but at most 50%:   "if strength is the only candidate, give it 50% chance"
-    #in SLASH'EM, it's only 25%
-    
-    gives_str = False
-    gain_level = ('wraith' in m['NAME'])
-    if slashthem and m['NAME'] == 'turbo chicken' or m['NAME'] == 'centaurtrice':
-        gain_level = True
-    
-    #avoid "giant ant". Giants always end with "giant"
-    #Might not hold true for variants...
-    if m['NAME'].endswith('giant'):
-        gives_str = True
-    if m['NAME'] == 'Lord Surtur' or m['NAME'] == 'Cyclops':
-        gives_str = True
-    if dnethack and ('gug' in m['NAME']):
-        gives_str = True
-    #Special case
-    if (slashthem or slashem_extended) and re.search(r'olog[_ -]hai[_ -]gorgon', m['NAME'], re.I):
-        gives_str = True
-    
-    if gives_str and base_nhver >= '3.6.0':
-        #NetHack 3.4.3: 100% chance
-        #NetHack 3.6.0: 100% base, scales with other resistances, 50% maximum
-        resistances['Increase strength'] = 100
-        count += 1
-        if count == 1:
-            resistances['Increase strength'] = 50
-    
-    ret = ''
-    if dnethack:
-        raise Exception("Implement later.")
-        #lines 1265-1301 or so
-    else:
-        for key in sorted(resistances):
-            resistances[key] = int(resistances[key] / count)
-            ret += f'{key} ({resistances[key]}%), '
-    
-    #NetHack 3.4.3 base - strength gain is guaranteed
-    if gives_str and base_nhver < '3.6.0':
-        chance = 100
-        if slashem or slashthem or slashem_extended:
-            chance = 25
-        #This is unconditional.
-        if (slashthem or slashem_extended) and re.search(r'olog[_ -]hai[_ -]gorgon', m['NAME'], re.I):
-            chance = 100
-        
-        ret += f'Increase strength ({chance}%), '
-    
-    if (gain_level):
-        #SLASH'EM changes the mechanics (which slashthem inherits)
-        #But I don't think it's worth changing the description
-        #It's covered in the article.
-        ret += '[[Gain level]], '
-    
-    #Add resistances that are not affected by chance, e.g. Lycanthopy. Actually, all of these do not allow normal intrinsic gaining.
-    if ('were' in m['NAME']):
-        ret = 'Lycanthropy'
-    if m['NAME'] == 'stalker':
-        ret = "[[Invisibility]], [[see invisible]] (if [[invisible]] when corpse is eaten), "
-    
-    if stoning:
-        ret += "Cures [[stoning]], "
-    
-    #UnNetHack
-    if unnethack and m['NAME'] == 'evil eye':
-        ret += "Alters luck, "      #BUC dependent.
-    
-    #SLASHTHEM adds charisma bonus
-    #nymph and gorgon are handled separately but appear to be identical.
-    #Hard coding in the 10%...
-    if slashthem and (m['NAME'] == 'gorgon' or m['SYMBOL'] == 'NYMPH'):
-        ret += "Increase charisma (10%), "
-    
-    #Polymorph. Sandestins do not leave a corpse so I'm not mentioning it, although it does apply to digesters.
-    if m['NAME'] == 'chameleon' or m['NAME'] == 'doppelganger' or m['NAME'] == 'genetic engineer':
-        ret += "Causes [[polymorph]], "
-        
-    if ret == '':
-        return 'None'
-    
-    if ret.endswith(', '):
-        ret = ret[0:-2]
-     
-    return ret
-
-# Generate html filenames, and the monster's name.
-def gen_names(m):
-    htmlname = f"{m['NAME']}.txt"
-    htmlname = re.sub(r'[:!\s\\\/]', '_', htmlname)
-    print_name = m['NAME']
-    if mon_count[m['NAME']] > 1:
-        symbol = m['SYMBOL'].lower()
-        htmlname = htmlname.replace('.txt', f"_{symbol}.txt")
-        print_name += f" ({symbol})"
-    
-    return (htmlname, print_name)
-
-# Lookup a monster's entry in the help database.
-def lookup_entry(name):
-    for e in entries:
-        for pat in e['TAGS']:
-            #print(pat, name)
-            if re.match(f'^{pat}$', name, re.I):
-                #But if the pattern starts with ~, wouldn't it just never match in the first place?
-                #next ENTRY_LOOP if ($pat=~/^\\\~/); 
-                # Tags starting with ~ say "don't match this entry."
-                if (re.search(r'^\\\~', pat)):
-                    print("SKIP:", name, pat)
-                    break
-                return e['ENTRY']
-
-#May have changes in exper.c
-#experience(mtmp, nk)
-def calc_exp(m):
-    lvl = m['LEVEL']['LVL']
-    
-    #Attack types used in inequality comparisons
-    #The comparisons are the same between variants (that I've noticed),
-    #but the attack types/values differ.
-    AT_BUTT = int(atk_ints['AT_BUTT'])
-    AD_BLND = int(dmg_ints['AD_BLND'])
-    AD_PHYS = int(dmg_ints['AD_PHYS'])
-    
-    tmp = lvl * lvl + 1
-    
-    #AC bonus
-    #Note - this uses find_mac, which takes armor into account
-    #and dNetHack does a ton of other stuff, e.g. fleeing giant turtles have -15 AC
-    #not all armor can be accounted for, but monsters should have a "target" AC
-    #e.g. Yendorian army has 10 base AC but gets assorted armor.
-    #Can I account for that?
-    ac = int(m['LEVEL']['AC'])
-    if ac < 3:
-        tmp += (7 - ac)
-    if ac < 0:
-        tmp += (7 - ac)
-    mov = int(m['LEVEL']['MOV'])
-    
-    if mov > 12:
-        tmp += 5 if mov > 18 else 3
-    atks = 0
-    #Attack bonuses
-    if m['ATK']:
-        for a in m['ATK']:
-            atks += 1
-            
-            #For each "special" attack type give extra experience
-            atk_int = int(atk_ints[a['AT']])
-            dmg_int = int(dmg_ints[a['AD']])
-            if atk_int > AT_BUTT:
-                if a['AT'] == 'AT_MAGC':
-                    tmp += 10
-                elif dnethack and a['AT'] == 'AT_MMGC':
-                    tmp += 10
-                elif a['AT'] == 'AT_WEAP':
-                    tmp += 5
-                else:
-                    tmp += 3
-            #Attack damage types; 'temp2 > AD_PHYS and < AD_BLND' means MAGM, FIRE, COLD, SLEE, DISN, ELEC, DRST, ACID (i.e. the dragon types)
-            #Actually this probably doesn't change in variants. Oh well.
-            
-            if dmg_int > AD_PHYS and dmg_int < AD_BLND:
-                tmp += lvl * 2
-            elif a['AD'] in ['AD_STON', 'AD_SLIM', 'AD_DRLI']:
-                tmp += 50
-            elif base_nhver < '3.6.0' and tmp != 0:
-                #Bug in the original code; uses 'tmp' instead of 'tmp2'.
-                #I haven't noticed any variants fix this.
-                tmp += lvl
-            elif base_nhver >= '3.6.0' and a['AD'] != 'AD_PHYS':
-                #NetHack 3.6.0 fixes this bug.
-                tmp += lvl
-            
-            #Heavy damage bonus
-            if int(a['N']) * int(a['D']) > 23:
-                tmp += lvl
-                
-            #This is for base experience, so assume drownable.
-            if a['AD'] == 'AD_WRAP' and m['SYMBOL'] == 'EEL':
-                tmp += 1000
-    #Additional correction for the bug; No attack is still treated as an attack.
-    #This was fixed in 3.6.0
-    if base_nhver < '3.6.0':
-        tmp += (6 - atks) * lvl
-        
-    #nasty
-    if (re.search(r'M._NASTY', m['FLGS'])):
-        tmp += 7 * lvl
-    if lvl > 8:
-        tmp += 50
-    
-    if m['NAME'] == "mail daemon":
-        tmp = 1
-    
-    #dNetHack, UnNetHack - Dungeon fern spores give no experience
-    if re.search(r'dungeon fern spore|swamp fern spore|burning fern spore', m['NAME']):
-        tmp = 0
-    if re.search(r'tentacles?$', m['NAME']) or m['NAME'] == 'dancing blade':
-        tmp = 0
-    
-    #Store in hash
-    m['EXP'] = tmp
-    return tmp
-    
-#makedefs.c, mstrength(ptr)
-#No longer used as of 3.6.2, but still calculated.
-def calc_difficulty(m):
-    lvl = m['LEVEL']['LVL']
-    n = 0
-    
-    #This is done in parse_level, but not in dnethack, but is still needed for the calculation here.
-    if dnethack and lvl > 49:
-        lvl = (2*(lvl - 6) / 4)
-        
-    if ('G_SGROUP' in m['GEN']):
-        n += 1
-    if ('G_LGROUP' in m['GEN']):
-        n += 2
-    if ('G_VLGROUP' in m['GEN']):
-        n += 4      #SLASH'EM
-        
-    has_ranged_atk = False
-    
-    #For higher ac values
-    ac = int(m['LEVEL']['AC'])
-    if ac < 4:
-        n += 1
-    if ac < 0:
-        n += 1
-    if dnethack:
-        #dnethack adds more ifs:
-        if ac < -5:
-            n += 1
-        if ac < -10:
-            n += 1
-        if ac < -20:
-            n += 1
-
-    #For very fast monsters
-    mov = int(m['LEVEL']['MOV'])
-    if mov >= 18:
-        n += 1
-    #for each attack and "Special" attack
-    #Combining the two sections, plus determine if it has a ranged attack.
-
-    if m['ATK']:
-        for a in m['ATK']:
-            #Add one for each: Not passive attack, magic attack, Weapon attack if strong
-            if a['AT'] != 'AT_NONE':
-                n += 1
-            if a['AT'] == 'AT_MAGC':
-                n += 1
-            if a['AT'] == 'AT_WEAP' and ('M2_STRONG' in m['FLGS']):
-                n += 1
-            #dNetHack extends the "magc" if with the following:
-            if dnethack and a['AT'] in ['AT_MMGC','AT_TUCH','AT_SHDW','AT_TNKR']:
-                n += 1
-            #Add: +2 for poisonous, were, stoning, drain life attacks
-            #    +1 for all other non-pure-physical attacks (except grid bugs)
-            #    +1 if the attack can potentially do at least 24 damage
-            if a['AD'] in ['AD_DRLI','AD_STON','AD_WERE','AD_DRST','AD_DRDX','AD_DRCO']:
-                n += 2
-            elif dnethack and a['AD'] in ['AD_SHDW','AD_STAR','AD_BLUD']:
-                #dnethack extends this '+= 2' block with these types.
-                n += 2
-            else:
-                if a['AD'] != 'AD_PHYS' and m['NAME'] != "grid bug":
-                    n += 1
-            if int(a['N']) * int(a['D']) > 23:
-                n += 1
-            
-            #Set ranged attack  (defined in ranged_attk)
-            #Automatically includes anything > AT_WEAP
-            if is_ranged_attk(a['AT']):
-                has_ranged_atk = True
-    #For ranged attacks
-    if has_ranged_atk:
-        n += 1
-        
-    #Exact string comparison (so, not leprechaun wizards)
-    if m['NAME'] == "leprechaun":
-        n -= 2
-        
-    #dNetHack: "Hooloovoo spawn many dangerous enemies."
-    if dnethack and m['NAME'] == "hooloovoo":
-        n += 10
-    
-    #"tom's nasties"
-    if ('M2_NASTY' in m['FLGS']) and (slashem or slashthem or slashem_extended):
-        n += 5
-
-    if n == 0:
-        lvl -= 1
-    elif n >= 6:
-        lvl += n//2
-    else:
-        lvl += n//3 + 1
-    
-    final = int(lvl) if lvl >= 0 else 0
-    #Store in hash
-    m['DIFF'] = final
-    return final
-    
-#I'm not seeing any differences between variants.
-#Actually, dNetHack uses a different version... in mondata.c
-#This governs behavior (monmove.c), but there's also a copy of mstrength that
-#uses this modified function, not the unmodified version in makedefs
-#I suspect that's not intentional...
-def is_ranged_attk(atk):
-    if atk in ['AT_BREA', 'AT_SPIT', 'AT_GAZE']:
-        return True
-    
-    if atk not in atk_ints:
-        raise Exception(f'Unknown atk type {atk}')
-    if 'AT_WEAP' not in atk_ints:
-        raise Exception(f'Unknown atk type AT_WEAP')
-    atk_int = int(atk_ints[atk])
-    wep_int = int(atk_ints['AT_WEAP'])
-
-    return atk_int >= wep_int
- 
-
-    
-#######
-#process_monster('''
-#MON("hobbit", S_HUMANOID, LVL(1, 9, 10, 0, 6), (G_GENO | 2),        A(ATTK(AT_WEAP, AD_PHYS, 1, 6), NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK,          NO_ATTK),        SIZ(500, 200, MS_HUMANOID, MZ_SMALL), 0, 0, M1_HUMANOID | M1_OMNIVORE,        M2_COLLECT, M3_INFRAVISIBLE | M3_INFRAVISION, 2, CLR_GREEN),
-#''', 'etc')
-#print(monsters)
-
-output_monster_html();
-output_monsters_by_exp();
-    
-if unknowns:
-    print("Flags and other constants that couldn't be resolved:")
-    print(unknowns)
+
+#python nhtohtml.py E:\qazmlpok\NetHack\NetHack3.6.6\NetHack-NetHack-3.6.6_Released --output=../../py_html
+
+import argparse
+import re
+import os
+import sys
+import io
+import json
+import pickle
+import hashlib
+import csv
+import sqlite3
+import contextlib
+import copy
+import itertools
+import mmap
+import traceback
+import tarfile
+import time
+import zipfile
+import concurrent.futures
+import cProfile
+import functools
+import inspect
+import http.client
+import threading
+import urllib.parse
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#Functions
+
+#Load in data.json and parse it as JSON.
+#This file includes comments using # (since it used to be embedded in the script). This is invalid.
+#Fortunately, none of the const data uses #, so this is trivial to remove by regex.
+DATA_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data.json')
+
+def load_json_data():
+    filename = DATA_JSON
+    with open(filename, 'r', encoding='utf-8') as f:
+        filedata = f.read()
+        #The Perl regex of s/#.*$//m doesn't work. I don't understand why.
+        filedata = re.sub(r'#.*', '', filedata)
+    data = json.loads(filedata)
+    return data
+
+def format_num(num):
+    #Turn number to string; if it's negative, replace - with HTML entity.
+    return str(num).replace('-', '&minus;')
+
+#The wiki page for a monster. Each "#---- name" line starts a section, and a section is
+#the lines up to the next one, joined with newlines (so end it with an empty line to end
+#it with a newline). The page is the "page" section; the others are pasted into it:
+#   attacks       as $attacks, if the monster has any attacks
+#   flag          as $flags, once for each attribute flag
+#   encyclopedia  as $encyclopedia, if data.base has an entry for the monster
+#$field or ${field} is replaced by the field's value (see TEMPLATE_FIELDS), and $$ is a $.
+#--template reads a file in the same format instead. Sections it leaves out come from here.
+DEFAULT_TEMPLATE = '''#---- page
+{{ monster
+ |name=$name
+ |difficulty=$difficulty
+ |level=$level
+ |experience=$experience
+ |speed=$speed
+ |AC=$AC
+ |MR=$MR
+ |align=$align
+ |frequency=$frequency
+ |genocidable=$genocidable
+$attacks
+ |resistances conveyed=$conveyances
+ |resistances=$resistances
+ |attributes={{attributes|$article$monster$flags}}
+ |size=$size
+ |nutr=$nutrition
+ |weight=$weight
+ |reference=$reference
+}}
+
+
+
+
+
+$encyclopedia
+{{stub|This page was automatically generated by a modified version of nhtohtml version $version}}
+
+#---- attacks
+ |attacks=$list
+#---- flag
+|$flag=1
+#---- encyclopedia
+
+==Encyclopedia Entry==
+
+
+{{encyclopedia|$entry}}
+
+'''
+
+#The fields each template section can use.
+TEMPLATE_FIELDS = {
+    'page'         : ('name', 'monster', 'symbol', 'difficulty', 'level', 'experience', 'speed', 'AC', 'MR',
+                      'align', 'frequency', 'genocidable', 'attacks', 'conveyances', 'resistances', 'article',
+                      'flags', 'size', 'nutrition', 'weight', 'reference', 'encyclopedia', 'version'),
+    'attacks'      : ('list',),
+    'flag'         : ('flag',),
+    'encyclopedia' : ('entry',),
+}
+
+#Split a template into its sections: {name: (text, line number of the first line)}.
+def template_sections(text, filename):
+    sections = {}
+    name = None
+    #The newline at the end of the file just ends the last line.
+    if text.endswith('\n'):
+        text = text[:-1]
+    for (i, line) in enumerate(text.split('\n'), 1):
+        m = re.match(r'^#----\s*(\w+)\s*$', line)
+        if m:
+            name = m.group(1)
+            if name not in TEMPLATE_FIELDS:
+                raise Exception(f"{filename}, line {i}: unknown template section '{name}' (should be one of {', '.join(TEMPLATE_FIELDS)})")
+            sections[name] = ([], i + 1)
+        elif name is not None:
+            sections[name][0].append(line)
+    return {k: ('\n'.join(lines), start) for (k, (lines, start)) in sections.items()}
+
+#Turn one section into a function that takes a dict of the fields and returns the text.
+#The $fields become a str.format string, so rendering is a single format_map call.
+def compile_template_section(name, text, filename, start):
+    def field(m):
+        if m.group(1):
+            return '$'
+        key = m.group(2) or m.group(3)
+        if key not in TEMPLATE_FIELDS[name]:
+            line = start + text.count('\n', 0, m.start())
+            raise Exception(f"{filename}, line {line}: unknown field ${key} in template section '{name}' (should be one of {', '.join(TEMPLATE_FIELDS[name])})")
+        return '{' + key + '}'
+    escaped = text.replace('{', '{{').replace('}', '}}')
+    return re.sub(r'\$(?:(\$)|([A-Za-z_]\w*)|\{\{([A-Za-z_]\w*)\}\})', field, escaped).format_map
+
+#Compile a template (the text of a template file) into {section name: render function}.
+def compile_template(text, filename='template'):
+    sections = template_sections(DEFAULT_TEMPLATE, 'DEFAULT_TEMPLATE')
+    sections.update(template_sections(text, filename))
+    return {name: compile_template_section(name, section, filename, start) for (name, (section, start)) in sections.items()}
+
+def load_template(filename):
+    with open(filename, 'r', encoding='utf-8') as f:
+        return compile_template(f.read(), filename)
+
+PAGE_TEMPLATE = compile_template(DEFAULT_TEMPLATE, 'DEFAULT_TEMPLATE')
+
+#Read a source file one line at a time, yielding (line number, start, end, line) with the
+#line still as bytes, and start/end its byte offsets in the file.
+#The file is memory-mapped rather than read in.
+def read_source_spans(filename):
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            start = 0
+            lineno = 0
+            while start < size:
+                end = data.find(b'\n', start)
+                end = size if end < 0 else end + 1
+                lineno += 1
+                yield (lineno, start, end, data[start:end])
+                start = end
+
+#Decode a line from a source file: as UTF-8 if it is, otherwise as Latin-1 (which some
+#variants' data.base files use), so the locale's encoding doesn't matter.
+#Line endings are kept, with \r\n turned into \n.
+def decode_source_line(line):
+    if line.endswith(b'\r\n'):
+        line = line[:-2] + b'\n'
+    try:
+        return line.decode('utf-8')
+    except UnicodeDecodeError:
+        return line.decode('latin-1')
+
+#Read a source file one line at a time, yielding (line number, line).
+#Each line is decoded as it's reached.
+def read_source_lines(filename):
+    for (lineno, start, end, line) in read_source_spans(filename):
+        yield (lineno, decode_source_line(line))
+
+#Every #define in a set of C headers (permonst.h, monflag.h, monattk.h, color.h), worked out
+#to numbers only when asked for. read() records the text of each #define (comments and
+#continuation lines dealt with; function-like macros are skipped, and a later definition
+#replaces an earlier one). value() resolves a name from the names it refers to, with each
+#result memoized, so a name is resolved once per tree however often it's looked up.
+#Aliases to earlier names and arithmetic are handled, e.g.
+#   #define WT_ANT        WT_DIMINUTIVE
+#   #define AD_IRIS       AD_DUNSTAN+1
+#   #define G_GONE        (G_GENOD|G_EXTINCT)
+#Preprocessor conditions aren't evaluated, except that #if 0 blocks are skipped (up to a
+#matching #else or #elif), like read_monst_lines does. Anything under #ifdef, #ifndef or
+#another #if is read whichever way it would go, so a name defined under both branches of
+#one gets the later definition.
+class HeaderDefines:
+    def __init__(self):
+        self.text = {}
+        self.values = {}
+    
+    def read(self, filename):
+        pending = ''
+        skipping = 0        #Inside an #if 0 block: 1, plus one for each #if nested in it
+        for (_, l) in read_source_lines(filename):
+            l = pending + l.rstrip('\r\n')
+            if l.endswith('\\'):
+                pending = l[:-1] + ' '
+                continue
+            pending = ''
+            if skipping:
+                if re.match(r'^\s*#\s*if', l):
+                    skipping += 1
+                elif re.match(r'^\s*#\s*endif', l):
+                    skipping -= 1
+                elif skipping == 1 and re.match(r'^\s*#\s*(else|elif)\b', l):
+                    skipping = 0
+                continue
+            if re.match(r'^\s*#\s*if\s+0\b', l):
+                skipping = 1
+                continue
+            m = re.match(r'^\s*#\s*define\s+([A-Za-z_]\w*)(\(?)(.*)$', l)
+            if not m or m.group(2):
+                continue
+            val = re.sub(r'/\*.*?\*/', ' ', m.group(3))
+            val = re.sub(r'/\*.*$|//.*$', '', val).strip()
+            self.text[m.group(1)] = val
+        self.values = {}
+    
+    #The value of a defined name as an int, or None if it isn't defined or isn't a number.
+    def value(self, name):
+        if name in self.values:
+            return self.values[name]
+        if name not in self.text:
+            return None
+        self.values[name] = None    #So a definition that refers to itself comes out as None.
+        self.values[name] = self.expression(self.text[name])
+        return self.values[name]
+    
+    #Work out a C constant expression made of numbers, defined names and operators.
+    #Returns None if anything in it isn't one of those (a cast, a string, an unknown name...).
+    def expression(self, text):
+        out = []
+        for tok in re.findall(r'0[xX][0-9a-fA-F]+[uUlL]*|\d+[uUlL]*|[A-Za-z_]\w*|<<|>>|\S', text):
+            if tok[0].isdigit():
+                tok = tok.rstrip('uUlL')
+                out.append(str(int(tok, 16 if tok[1:2] in ('x', 'X') else 8 if tok.startswith('0') and len(tok) > 1 else 10)))
+            elif tok[0].isalpha() or tok[0] == '_':
+                value = self.value(tok)
+                if value is None:
+                    return None
+                out.append(f'({value})')
+            elif tok == '/':
+                out.append('//')
+            elif tok in ('(', ')', '+', '-', '*', '%', '|', '&', '^', '~', '<<', '>>'):
+                out.append(tok)
+            else:
+                return None
+        if not out:
+            return None
+        try:
+            return int(eval(' '.join(out), {'__builtins__': {}}))
+        except Exception:
+            return None
+    
+    #Follow a chain of defines that are just another name, until one starting with prefix.
+    #Returns that name, or None if the chain doesn't get there.
+    def alias(self, name, prefix):
+        seen = set()
+        while not name.startswith(prefix):
+            if name in seen or not re.match(r'^\w+$', self.text.get(name, '')):
+                return None
+            seen.add(name)
+            name = self.text[name].strip()
+        return name
+    
+    #{name: value} for every defined name matching the regex that works out to a number.
+    def resolved(self, pattern):
+        values = {}
+        for name in self.text:
+            if re.match(pattern, name):
+                v = self.value(name)
+                if v is not None:
+                    values[name] = v
+        return values
+
+#Read the headers of a source tree. color.h is optional.
+def read_header_defines(ctx):
+    defines = HeaderDefines()
+    for header in ('permonst.h', 'monflag.h', 'monattk.h', 'color.h'):
+        filename = os.path.join(ctx.nethome, 'include', header)
+        if not os.path.isfile(filename):
+            if header == 'color.h':
+                continue
+            print(filename)
+            raise Exception(f"Can't find {header}")
+        defines.read(filename)
+    return defines
+
+#Colors from vanilla color.h, for trees that don't have one.
+DEFAULT_COLORS = {
+    'HI_DOMESTIC'   : 'CLR_WHITE',
+    'HI_LORD'       : 'CLR_MAGENTA',
+    'HI_OBJ'        : 'CLR_MAGENTA',
+    'HI_METAL'      : 'CLR_CYAN',
+    'HI_COPPER'     : 'CLR_YELLOW',
+    'HI_SILVER'     : 'CLR_GRAY',
+    'HI_GOLD'       : 'CLR_YELLOW',
+    'HI_LEATHER'    : 'CLR_BROWN',
+    'HI_CLOTH'      : 'CLR_BROWN',
+    'HI_ORGANIC'    : 'CLR_BROWN',
+    'HI_WOOD'       : 'CLR_BROWN',
+    'HI_PAPER'      : 'CLR_WHITE',
+    'HI_GLASS'      : 'CLR_BRIGHT_CYAN',
+    'HI_MINERAL'    : 'CLR_GRAY',
+    'DRAGON_SILVER' : 'CLR_BRIGHT_CYAN',
+    'HI_ZAP'        : 'CLR_BRIGHT_BLUE',
+}
+
+#Handle #define statements in monst.c
+#Specifically, replacing SEDUCTION_ATTACKS (or whatever) with the found definitions
+#Build this once each time the definitions change, then pass the result to do_define_substitutions.
+#Returns None if there's nothing to substitute.
+def compile_define_substitutions(definitions):
+    if not definitions:
+        return None
+    #Need to try them longest-first...
+    keys = sorted(definitions.keys(), key=lambda x: len(x), reverse=True)
+    #Only match whole identifiers, so FOO doesn't rewrite FOOBAR.
+    pattern = re.compile(r'(?<![A-Za-z0-9_])(?:' + '|'.join(re.escape(k) for k in keys) + r')(?![A-Za-z0-9_])')
+    
+    #Expand definitions that refer to other definitions up front, like the C preprocessor would.
+    #A definition is never expanded inside itself.
+    expanded = {}
+    def expand(key, active):
+        active = active | {key}
+        return pattern.sub(lambda m: m.group(0) if m.group(0) in active else expand(m.group(0), active), definitions[key])
+    for key in keys:
+        expanded[key] = expand(key, frozenset())
+    return (pattern, expanded)
+
+#Replace every defined name in the line, in a single pass.
+def do_define_substitutions(line, substitutions):
+    if substitutions is None:
+        return line
+    (pattern, expanded) = substitutions
+    if PROFILE is None:
+        return pattern.sub(lambda m: expanded[m.group(0)], line)
+    (line, n) = pattern.subn(lambda m: expanded[m.group(0)], line)
+    PROFILE.count('define substitutions', n)
+    return line
+ 
+
+#Main body
+
+version = '2.10w'
+rev = f"$Revision: {version} $ "
+
+#Everything about converting one source tree: the options, what was detected
+#about the tree, the constants parsed out of its headers, and the monsters.
+#These used to be globals. convert() returns this once it's done.
+class Conversion:
+    def __init__(self, nethome, force_version=None, output_path='html', only_mon='', incremental=False, delete_stale=False, cache_dir=None, bundle=None):
+        if force_version is not None:
+            m = re.match(r'^\d+\.\d+\.\d+$', force_version)
+            if not m:
+                raise Exception(f"--version argument should be in the form 'x.x.x', corresponding to the base NetHack version (got {force_version})")
+        
+        #for consistency; replace all \ with /.
+        nethome = nethome.replace('\\', '/')
+        
+        #Strip "src" off if included.
+        nethome = nethome.replace('/src', '')
+        
+        if not os.path.isdir(nethome):
+            raise Exception(f'Path does not exist: {nethome}')
+        if not os.path.isfile(os.path.join(nethome, 'include', 'monst.h')):
+            raise Exception(f'Path does not appear to be a NetHack source folder: {nethome}')
+        
+        #--bundle writes a single file, named after --output.
+        if bundle is not None and output_path != '-' and bundle_format(output_path) != bundle:
+            output_path += f'.{bundle}'
+        
+        self.nethome = nethome
+        self.force_version = force_version
+        self.output_path = output_path
+        self.bundle = bundle
+        self.only_mon = only_mon
+        #--only can name several monsters, separated by commas.
+        self.only_names = {name.strip().lower() for name in only_mon.split(',') if name.strip()}
+        self.incremental = incremental
+        self.delete_stale = delete_stale
+        self.cache_dir = cache_dir
+        
+        #die "SLASHEM-Extended is not supported." if $nethome =~ /SLASHEM[-_ ]Extended/i;
+        
+        self.slashem          = re.search(r'slashem'             , nethome, re.I) is not None;  #Modify the src reference
+        self.dnethack         = re.search(r'dnethack'            , nethome, re.I) is not None;
+        self.unnethack        = re.search(r'unnethack'           , nethome, re.I) is not None;
+        self.slashthem        = re.search(r'SlashTHEM'           , nethome, re.I) is not None;
+        self.slashem_extended = re.search(r'SLASHEM[-_ ]Extended', nethome, re.I) is not None;
+        
+        if self.dnethack:
+            print("====")
+            print("Consider using printMons() in $nethome/src/allmain.c instead.")
+            print("====")
+        
+        #Try to calculate the version. There's a handful of changes
+        # - there's a bug in xp calculation for non-attacks that was fixed in 3.6.0
+        # - in 3.6.0, Giants give strength as an instrinsic, meaning it reduces the chance of getting other intrinsics
+        # - SLASH'EM just flat reduces the chance to 25%
+        # - 3.7.0 changes the file that contains all monst data and adds a variant to the MON define.
+        base_nhver = '3.4.3'    #Assume 3.4.3, since most variants are based off that.
+        
+        m = re.search(r'nethack-(\d+\.\d+\.\d+)', nethome, re.I)
+        if m:
+            base_nhver = m.group(1)
+        
+        if self.slashem or self.dnethack or self.unnethack:
+            base_nhver = '3.4.3'
+        
+        if force_version:
+            base_nhver = force_version
+        self.base_nhver = base_nhver
+        
+        if self.slashem:
+            print("Using SLASH'EM. Only 0.0.7E7F3 is really supported.")
+        else:
+            print(f"Using NetHack version {base_nhver}")
+        print()
+        
+        self.consts = load_json_data()
+        
+        #Filled in by parse_headers (or load_parse_cache)
+        self.defines = None
+        self.colors = None
+        self.permonst_flags = None
+        self.monflags = None
+        self.atk_ints = None
+        self.dmg_ints = None
+        
+        #Copies, since unknown attacks and damage types get added to these.
+        consts = self.consts
+        attacks = dict(consts['attacks'])
+        damage = dict(consts['damage'])
+        if self.slashem:
+            attacks.update(consts['slashem_attacks'])
+            damage.update(consts['slashem_damage'])
+        if self.dnethack:
+            attacks.update(consts['dnethack_attacks'])
+            damage.update(consts['dnethack_damage'])
+        if self.unnethack:
+            attacks.update(consts['unnethack_attacks'])
+            damage.update(consts['unnethack_damage'])
+        if self.slashthem or self.slashem_extended:
+            for variant in ('slashem', 'unnethack', 'slashthem'):
+                attacks.update(consts[f'{variant}_attacks'])
+                damage.update(consts[f'{variant}_damage'])
+        self.attacks = attacks
+        self.damage = damage
+        
+        self.mon_grammar = mon_grammar_name(self)
+        
+        #--diff: another Conversion whose header constants can be shared; see parse_headers.
+        self.headers_from = None
+        
+        #Filled in by load_encyclopedia and index_encyclopedia
+        self.entries = None
+        self.encyclopedia = None
+        
+        # Some monster names appear twice (were-creatures).  We use the
+        # mon_count hash to keep track of them and flag cases where we need to
+        # specify.
+        self.mon_count = {}
+        
+        self.monsters = []
+        
+        #Dumping place for flags that need to be manually set.
+        #Variants will likely add new damage types, attack types, resistances...
+        #If these aren't found it will print a "undefined value" warning somewhere.
+        self.unknowns = {}
+        
+        #SHA-1 of each input file; see input_hashes.
+        self.input_hashes = None
+        #--watch: the encyclopedia entry each monster's page used last time.
+        self.page_entries = None
+        
+        #The compiled page template (--template); see compile_template.
+        self.template = PAGE_TEMPLATE
+        
+        #Output bookkeeping; see write_output.
+        self.sink = None
+        self.manifest = None
+        self.file_hashes = {}
+        self.written = []
+        self.unchanged = []
+        self.stale = []
+
+
+
+#MON() grammars, keyed on (grammar name, MON function name).
+#A grammar is the list of MON arguments, in order. parse_mon_declarations does
+#the actual parsing; the grammar just names the arguments.
+#A variant with its own MON layout should register its grammar and have
+#mon_grammar_name return its name.
+#The flag fields (FLG*) are joined together, in order, to make FLGS.
+mon_grammars = {}
+
+def register_mon_grammar(grammar, func_name, fields):
+    mon_grammars[(grammar, func_name)] = tuple(fields)
+
+#NetHack 3.4.3 through 3.6.1, and most variants.
+register_mon_grammar('3.4.3', 'MON', [
+    'NAME',         #Monster name, quoted string
+    'SYM',          #Symbol (always starts with S_)
+    'LVL',          #LVL(), parsed by parse_level. Shelob's definition in SLASH'EM 0.0.7E7F3 incorrectly uses SIZ, so that's accepted too.
+    'GEN',          #Combination of G_ flags (genocide, no_hell or hell, and an int for frequency). Usually in parens.
+    'ATK',          #A(), parsed by parse_attack
+    'SIZ',          #SIZ(), parsed by parse_size
+    'MR1',          #Resistances OR'd together, or 0
+    'MR2',          #Granted resistances
+    'FLG1',         #Flags 1 (M1_, OR'd together)
+    'FLG2',         #Flags 2 (M2_, OR'd together)
+    'FLG3',         #Flags 3
+    'COL',          #Color
+])
+
+#3.6.2 adds difficulty to the end, right before color.
+register_mon_grammar('3.6.2', 'MON', [
+    'NAME', 'SYM', 'LVL', 'GEN', 'ATK', 'SIZ', 'MR1', 'MR2', 'FLG1', 'FLG2', 'FLG3',
+    'DIFF',         #Difficulty (3.6.2+)
+    'COL',
+])
+
+#3.7.0+ (using the current git code; not final)
+#3.7.0 adds the define name (e.g. "FOX") at the end.
+register_mon_grammar('3.7.0', 'MON', [
+    'NAME', 'SYM', 'LVL', 'GEN', 'ATK', 'SIZ', 'MR1', 'MR2', 'FLG1', 'FLG2', 'FLG3', 'DIFF', 'COL',
+    'INDEXNUM',     #Monster define symbol.
+])
+
+#MON3 is a new variant that includes gender names for certain monsters.
+register_mon_grammar('3.7.0', 'MON3', [
+    'MALE_NAME',    #Male Monster name, quoted string
+    'FEMALE_NAME',  #Female Monster name, quoted string
+    'NAME', 'SYM', 'LVL', 'GEN', 'ATK', 'SIZ', 'MR1', 'MR2', 'FLG1', 'FLG2', 'FLG3', 'DIFF', 'COL', 'INDEXNUM',
+])
+
+#dNetHack replaces the three M1_/M2_/M3_ flag fields with six:
+#MM_ (movement), MT_ (thought), MB_ (body), MG_ (game), MA_ (race), MV_ (vision)
+register_mon_grammar('dnethack', 'MON', [
+    'NAME', 'SYM', 'LVL', 'GEN', 'ATK', 'SIZ', 'MR1', 'MR2',
+    'FLGM', 'FLGT', 'FLGB', 'FLGG', 'FLGA', 'FLGV',
+    'COL',
+])
+
+#Pick the grammar for the source tree being processed.
+def mon_grammar_name(ctx):
+    if ctx.dnethack:
+        return 'dnethack'
+    if ctx.base_nhver < '3.6.2':
+        return '3.4.3'
+    if ctx.base_nhver < '3.7.0':
+        return '3.6.2'
+    return '3.7.0'
+
+#Get the argument names for a MON-type function.
+def get_grammar(ctx, func_name):
+    if (ctx.mon_grammar, func_name) not in mon_grammars:
+        raise Exception(f"No {func_name} grammar for {ctx.mon_grammar}")
+    return mon_grammars[(ctx.mon_grammar, func_name)]
+
+def get_vanilla_ref(ctx, lineno):
+    #These are still on the wiki
+    if (ctx.base_nhver == '3.4.3'):
+        return f"[[Source:NetHack_3.4.3/src/monst.c#line{lineno}|monst.c#line{lineno}]]"
+    #return f"[[Source:NetHack_3.6.0/src/monst.c#line{lineno}|monst.c#line{lineno}]]" if ($base_nhver eq '3.6.0');
+    #return f"[[Source:NetHack_3.6.1/src/monst.c#line{lineno}|monst.c#line{lineno}]]" if ($base_nhver eq '3.6.1');
+    
+    #github
+    if ctx.base_nhver in ('3.6.0', '3.6.1', '3.6.2', '3.6.3', '3.6.4', '3.6.5', '3.6.6'):
+        return f"[https://github.com/NetHack/NetHack/blob/NetHack-{ctx.base_nhver}_Released/src/monst.c#L{lineno} monst.c#line{lineno}]"
+    
+    #3.7.0 doesn't have a release tag yet
+    if (ctx.base_nhver == '3.7.0'):
+        return f"[https://github.com/NetHack/NetHack/blob/NetHack-3.7/include/monsters.h#L{lineno} monsters.h#line{lineno}]"
+    
+    
+    raise Exception(f"Unknown version {ctx.base_nhver}")
+
+#Parsed monster data. Numbers are converted once, when the MON() is parsed, and flags
+#are kept as tuples of names in source order (the wiki attributes are written in that order).
+#Every field defaults to None.
+class Record:
+    __slots__ = ()
+    
+    def __init__(self, **fields):
+        for k in self.__slots__:
+            setattr(self, k, None)
+        for (k, v) in fields.items():
+            setattr(self, k, v)
+    
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{k}={getattr(self, k)!r}' for k in self.__slots__)})"
+
+#mflags1-3, mresists, mconveys and geno are the flags as bitmasks (see has_flag).
+#exp and diff are filled in by calc_exp and calc_difficulty, or calc_table.
+class Monster(Record):
+    __slots__ = ('name', 'male_name', 'female_name', 'symbol', 'level', 'target', 'gen', 'freq', 'atk', 'size',
+                 'mr1', 'mr2', 'flgs', 'color', 'ref', 'mons_diff',
+                 'mflags1', 'mflags2', 'mflags3', 'mresists', 'mconveys', 'geno', 'exp', 'diff')
+
+#lvl is adjusted for the fixed-level monsters; base_lvl is as written.
+class Level(Record):
+    __slots__ = ('lvl', 'base_lvl', 'mov', 'ac', 'mr', 'aln')
+
+class Attack(Record):
+    __slots__ = ('at', 'ad', 'n', 'd')
+
+class Size(Record):
+    __slots__ = ('wt', 'nut', 'snd', 'siz')
+
+#Split a flag expression like M1_FLY|M1_NOHANDS into a tuple of names. 0 means none.
+def flag_names(text):
+    if text is None:
+        return ()
+    return tuple(f for f in text.split('|') if f not in ('', '0'))
+
+#OR together the values (from monflag.h) of the flags with the given prefix.
+#Flags monflag.h doesn't define are left out, and noted in ctx.unknowns.
+def flag_bits(ctx, flags, prefix, print_name):
+    bits = 0
+    for f in flags:
+        if not f.startswith(prefix):
+            continue
+        if f in ctx.monflags:
+            bits |= ctx.monflags[f]
+        else:
+            ctx.unknowns[f] = print_name
+    return bits
+
+#Is a flag set in one of a monster's bitmasks? e.g. has_flag(ctx, m.mflags2, 'M2_DEMON')
+#A flag that monflag.h doesn't define is never set.
+def has_flag(ctx, bits, flag):
+    value = ctx.monflags.get(flag, 0)
+    return value != 0 and (bits & value) == value
+
+#Numbers from the source are strings; convert the ones that are plain integers.
+def source_number(s):
+    if isinstance(s, str) and re.match(r'^-?\d+$', s):
+        return int(s)
+    return s
+
+# The main monster parser.  Takes a MON() node from parse_mon_declarations and
+# breaks it down into its components.  Returns the monster record, or None if
+# it's skipped (the empty MON at the end of the array, or not the --only monster).
+def process_monster(ctx, mon):
+    func = mon['FUNC']
+    if func == 'MON' and mon['ARGS'][0]['TEXT'] == '""':
+        return
+    #
+    #   #MON("fox", S_DOG, LVL(0, 15, 7, 0, 0), (G_GENO | 1),
+    #       #A(ATTK(AT_BITE, AD_PHYS, 1, 3), NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK),
+    #       #SIZ(300, 250, MS_BARK, MZ_SMALL), 0, 0,     #SIZ, mresists, mconveys
+    #       #M1_ANIMAL | M1_NOHANDS | M1_CARNIVORE,      #mflags1
+    #       #M2_HOSTILE,                                 #mflags2
+    #       #M3_INFRAVISIBLE,                            #mflags3
+    #       #CLR_RED),                                   #mcolor
+    #3.6.2 adds difficulty to the end, right before color
+    #   #MON("fox", S_DOG, LVL(0, 15, 7, 0, 0), (G_GENO | 1),
+    #       #A(ATTK(AT_BITE, AD_PHYS, 1, 3), NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK),
+    #       #SIZ(300, 250, MS_BARK, MZ_SMALL), 0, 0,
+    #       #M1_ANIMAL | M1_NOHANDS | M1_CARNIVORE, M2_HOSTILE, M3_INFRAVISIBLE,
+    #       #1,                                          #Difficulty
+    #       #CLR_RED),                                   #mcolor
+    #3.7.0 Adds MON3 for gendered names. Before, all dwarf kings were male; now queens can exist as well.
+    #The actual monster name is now "dwarf ruler"
+    #Standard MON is also altered to include the defined name as the last parameter
+    #   #MON("fox", S_DOG, LVL(0, 15, 7, 0, 0), (G_GENO | 1),
+    #       #A(ATTK(AT_BITE, AD_PHYS, 1, 3), NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK),
+    #       #SIZ(300, 250, MS_BARK, MZ_SMALL), 0, 0,
+    #       #M1_ANIMAL | M1_NOHANDS | M1_CARNIVORE, M2_HOSTILE, M3_INFRAVISIBLE,
+    #       #1, CLR_RED, FOX),
+    #   #MON3("dwarf king", "dwarf queen", "dwarf ruler",
+    #       #S_HUMANOID, LVL(6, 6, 10, 20, 6), (G_GENO | 1),
+    #       #A(ATTK(AT_WEAP, AD_PHYS, 2, 6), ATTK(AT_WEAP, AD_PHYS, 2, 6), NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK),
+    #       #SIZ(900, 300, MS_HUMANOID, MZ_HUMAN), 0, 0,
+    #       #M1_TUNNEL | M1_NEEDPICK | M1_HUMANOID | M1_OMNIVORE,
+    #       #M2_DWARF | M2_STRONG | M2_PRINCE | M2_GREEDY | M2_JEWELS | M2_COLLECT,
+    #       #M3_INFRAVISIBLE | M3_INFRAVISION, 8, HI_LORD, DWARF_RULER),
+
+    #...
+    grammar = get_grammar(ctx, func)
+    if len(mon['ARGS']) != len(grammar):
+        print()
+        print(grammar)
+        print()
+        raise Exception(f"Monster parse error (line {mon['LINE']})\n\n{mon['TEXT']}")
+    args = dict(zip(grammar, mon['ARGS']))
+    
+    def text(field):
+        return args[field]['TEXT'] if field in args else None
+    def string(field):
+        s = text(field)
+        if s is None:
+            return None
+        if not (s.startswith('"') and s.endswith('"')):
+            raise Exception(f"Monster parse error (line {mon['LINE']}): {field} should be a string\n\n{mon['TEXT']}")
+        return s[1:-1]
+    def call(field, names):
+        node = arg_call(args[field], names)
+        if not node:
+            raise Exception(f"Monster parse error (line {mon['LINE']}): expected {'/'.join(names)}() for {field}\n\n{mon['TEXT']}")
+        return node
+    
+    name = string('NAME')
+    if ctx.only_names and name.lower() not in ctx.only_names:
+        return
+    
+    sym = text('SYM')
+    if not sym.startswith('S_'):
+        raise Exception(f"Monster parse error (line {mon['LINE']}): symbol should start with S_\n\n{mon['TEXT']}")
+    
+    #LVL - Shelob's definition in SLASH'EM 0.0.7E7F3 incorrectly uses SIZ, so catch that too.
+    lvl = call('LVL', ('LVL', 'SIZ'))
+    #'Target' AC; monsters that typically start with armor have 10 base AC but lower target AC
+    #Written as MARM(base, target)
+    target_ac = None
+    lvl_args = [a['TEXT'] for a in lvl['ARGS']]
+    for (i, a) in enumerate(lvl['ARGS']):
+        marm = arg_call(a, ('MARM',))
+        if marm:
+            lvl_args[i] = marm['ARGS'][0]['TEXT']
+            target_ac = marm['ARGS'][1]['TEXT']
+    
+    #Generation flags are usually in parens. Drop them.
+    gen = args['GEN']
+    paren = arg_call(gen, ('',))
+    if paren:
+        gen = paren['ARGS'][0]
+    
+    col = text('COL')
+    if name == 'ghost' or name == 'shade':
+        col = 'NO_COLOR'
+    #HI_LORD and the like, from color.h.
+    col = ctx.colors.get(col, col)
+    
+    gen_text = gen['TEXT']
+    freq = re.search(r'([0-7])', gen_text)
+    freq = int(freq.group(1)) if freq else 0
+    gen_flags = tuple(g for g in flag_names(gen_text) if not g.isdigit())
+    mr1 = flag_names(text('MR1'))
+    mr2 = flag_names(text('MR2'))
+    flgs = flag_names('|'.join(a['TEXT'] for (k, a) in args.items() if k.startswith('FLG')))
+    diff = text('DIFF')     #3.6.2 only
+    return Monster(
+        name        = name,
+        male_name   = string('MALE_NAME'),
+        female_name = string('FEMALE_NAME'),
+        symbol      = sym[2:],
+        level       = parse_level(ctx, lvl_args),
+        target      = source_number(target_ac),
+        gen         = gen_flags,
+        freq        = freq,
+        atk         = parse_attack(call('ATK', ('A',))),
+        size        = parse_size(ctx, [a['TEXT'] for a in call('SIZ', ('SIZ',))['ARGS']]),
+        mr1         = mr1,
+        mr2         = mr2,
+        flgs        = flgs,
+        color       = col,
+        ref         = mon['LINE'],
+        mons_diff   = None if diff is None else int(diff),
+        mflags1     = flag_bits(ctx, flgs, 'M1_', name),
+        mflags2     = flag_bits(ctx, flgs, 'M2_', name),
+        mflags3     = flag_bits(ctx, flgs, 'M3_', name),
+        mresists    = flag_bits(ctx, mr1, 'MR_', name),
+        mconveys    = flag_bits(ctx, mr2, 'MR_', name),
+        geno        = flag_bits(ctx, gen_flags, 'G_', name) | freq,
+    )
+
+
+#dNetHack has its own MON layout; mon_grammar_name already picked the grammar for it.
+def process_monster_dnethack(ctx, mon):
+    return process_monster(ctx, mon)
+
+# Parse the arguments of a LVL() construct. MARM() has already been dealt with.
+def parse_level(ctx, lvl):
+    if len(lvl) != 5:
+        raise Exception(f"Failed to parse LVL: {lvl}")
+    (lv,mov,ac,mr,aln) = lvl
+    
+    lv = int(lv)
+    base_lv = lv
+    mov = int(mov)
+    ac = int(ac)
+    mr = int(mr)
+    aln = source_number(aln)
+    
+    #Special monsters with fixed level and hitdice.
+    #dNetHack, as far as I can tell from source, does not do the level adjustment
+    #(All other variants I looked at appear unchanged)
+    if lv > 49 and not ctx.dnethack:
+        #mtmp->mhpmax = mtmp->mhp = 2*(ptr->mlevel - 6);
+	    #mtmp->m_lev = mtmp->mhp / 4;	/* approximation */
+        lv = int((2*(lv - 6)) / 4);
+    
+    return Level(lvl=lv, base_lvl=base_lv, mov=mov, ac=ac, mr=mr, aln=aln)
+    
+# Parse an A(ATTK(),...) construct. NO_ATTK is skipped.
+def parse_attack(atk):
+    astr = []
+    
+    for arg in atk['ARGS']:
+        attk = arg_call(arg, ('ATTK',))
+        if not attk:
+            continue
+        if len(attk['ARGS']) != 4:
+            raise Exception(f"Failed to parse attack: {attk['TEXT']}")
+        (at, ad, n, d) = [a['TEXT'] for a in attk['ARGS']]
+        if not (n.isdigit() and d.isdigit()):
+            raise Exception(f"Failed to parse attack dice: {attk['TEXT']}")
+        astr.append(Attack(at=at, ad=ad, n=int(n), d=int(d)))
+    
+    return tuple(astr)
+
+def parse_size(ctx, siz):
+    #The SIZ macro differs in 3.4.3 and 3.6.0. 3.4.3 includes "pxl",
+    #which may be SIZEOF(struct), e.g. "sizeof(struct epri)" (Aligned Priest)
+    #It's not relevant to this program, so skip it.
+    if len(siz) == 5:
+        siz = siz[0:2] + siz[3:]
+    if len(siz) != 4:
+        raise Exception(f"Failed to parse SIZ string: {','.join(siz)}")
+    (wt, nut, snd, sz) = siz
+    
+    wt = size_value(ctx, wt)
+    nut = size_value(ctx, nut)
+    
+    return Size(wt=source_number(wt), nut=source_number(nut), snd=snd, siz=ctx.consts['sizes'][sz])
+    
+#A SIZ() weight or nutrition: a number, a WT_/CN_ constant, or an expression using them.
+def size_value(ctx, text):
+    if text in ctx.permonst_flags:
+        text = ctx.permonst_flags[text]
+    if text.isdigit():
+        return text
+    value = ctx.defines.expression(text)
+    if value is None:
+        raise Exception(f"'{text}' SIZ() doesn't look like numbers")
+    return str(value)
+
+#----DBASE
+
+def encyclopedia_filename(ctx):
+    return os.path.join(ctx.nethome, 'dat', 'data.base')
+
+#Scan data.base for its entries. Only the tags are decoded; the text of each entry is
+#kept as the byte ranges it came from (SPANS), and read by entry_text when it's needed.
+def load_encyclopedia(ctx):
+    filename = encyclopedia_filename(ctx)
+    entries = []
+    
+    spans = []
+    tags = []
+    
+    for (_, start, end, l) in read_source_spans(filename):
+        if l.startswith(b'#'):
+            # Ignore comments
+            continue
+            
+        # Lines beginning with non-whitespace are tags
+        if not l[:1].isspace():
+            # If the entry has any text, then the last entry is done, push it.
+            if spans:
+                entries.append({
+                    'TAGS': tags,
+                    'SPANS': spans,
+                })
+                # Reset for the next entry.
+                spans = []
+                tags = []
+            l = decode_source_line(l).strip('\r\n')     #Chomp
+            # Set up the tag for future pattern matches.
+            # A leading ~ (exclusion) is kept as-is; index_encyclopedia strips it off.
+            l = l.replace('*', '.*')
+            # There can be multiple tags per entry.
+            tags.append(l)
+        elif spans and spans[-1][1] == start:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    return entries
+
+#The text of an encyclopedia entry, read from data.base the first time it's asked for.
+def entry_text(index, i):
+    text = index['TEXT'].get(i)
+    if text is None:
+        parts = []
+        with open(index['FILENAME'], 'rb') as f:
+            for (start, end) in index['ENTRIES'][i]['SPANS']:
+                f.seek(start)
+                parts.extend(decode_source_line(l) for l in io.BytesIO(f.read(end - start)))
+        text = index['TEXT'][i] = ''.join(parts)
+    return text
+
+#Characters that make a tag a pattern instead of a plain name.
+#('*' has already been turned into '.*' by load_encyclopedia)
+ENCYC_META = set('.^$*+?{}[]\\|()')
+
+#Characters that can make the character before them optional or repeated.
+ENCYC_QUANTIFIERS = set('*+?{')
+
+#The literal text a wildcard tag has to start and end with, lowercased: (head, tail).
+#Either is '' if the tag doesn't start or end with plain characters. A tag with
+#alternation, anchors or escapes could match anything, so it gets ('', '').
+def wildcard_affixes(pat):
+    if not set('|^$\\').isdisjoint(pat):
+        return ('', '')
+    first = next(i for (i, c) in enumerate(pat) if c in ENCYC_META)
+    last = max(i for (i, c) in enumerate(pat) if c in ENCYC_META)
+    head = pat[:first]
+    if pat[first] in ENCYC_QUANTIFIERS:
+        head = head[:-1]
+    return (head.lower(), pat[last + 1:].lower())
+
+#Build a lookup index over the encyclopedia entries, so lookup_entry doesn't have
+#to compile and try every tag of every entry for every monster.
+# - Plain tags go in a dict, keyed on the lowercased name. First entry wins.
+# - Wildcard tags are bucketed on the literal text they end with (e.g. "dragon" for
+#   *dragon), or failing that the text they start with (were*). A name can only match
+#   the tags in the buckets for its own endings and beginnings, so a lookup tries those
+#   and the few tags with neither (GENERAL), not every wildcard in the file.
+#   Each bucket is compiled into a single alternation the first time it's needed. Each
+#   alternative is wrapped in a named group so the matching entry can be recovered from
+#   lastgroup, and alternation is tried left to right, so the first entry (in file order)
+#   wins within a bucket; lookup_entry takes the earliest over the buckets.
+# - Tags starting with ~ exclude the entry if they match before a regular tag does.
+#   Entries with any of these are checked tag-by-tag when they come up. The tags are
+#   only compiled for that, when it happens (entry_tags), not for every entry up front.
+#The entry text is read from filename as it's looked up (see entry_text).
+def index_encyclopedia(entries, filename):
+    literal = {}
+    heads = {}
+    tails = {}
+    general = []
+    tags = []           #Per entry: list of (is_exclusion, pattern), in file order; see entry_tags
+    has_exclusions = set()
+    for (i, e) in enumerate(entries):
+        entry_tags = []
+        for pat in e['TAGS']:
+            exclude = pat.startswith('~')
+            if exclude:
+                pat = pat[1:]
+                has_exclusions.add(i)
+            entry_tags.append((exclude, pat))
+            if exclude:
+                continue
+            if ENCYC_META.isdisjoint(pat):
+                literal.setdefault(pat.lower(), i)
+                continue
+            alternative = f'(?P<e{i}_{len(entry_tags)}>{pat})'
+            (head, tail) = wildcard_affixes(pat)
+            if tail:
+                tails.setdefault(tail, []).append(alternative)
+            elif head:
+                heads.setdefault(head, []).append(alternative)
+            else:
+                general.append(alternative)
+        tags.append(entry_tags)
+    return {
+        'ENTRIES'    : entries,
+        'FILENAME'   : filename,
+        'TEXT'       : {},
+        'LITERAL'    : literal,
+        'HEADS'      : heads,
+        'TAILS'      : tails,
+        'GENERAL'    : general,
+        #The lengths of the bucket keys, so a lookup knows which endings to try.
+        'HEAD_LENGTHS' : sorted({len(k) for k in heads}),
+        'TAIL_LENGTHS' : sorted({len(k) for k in tails}),
+        'COMPILED'   : {},
+        'TAGS'       : tags,
+        'COMPILED_TAGS' : {},
+        'EXCLUSIONS' : has_exclusions,
+    }
+
+#An entry's tags as (is_exclusion, compiled pattern), compiled the first time they're needed.
+def entry_tags(index, i):
+    tags = index['COMPILED_TAGS'].get(i)
+    if tags is None:
+        tags = index['COMPILED_TAGS'][i] = [(exclude, re.compile(f'^{pat}$', re.I)) for (exclude, pat) in index['TAGS'][i]]
+    return tags
+
+#The earliest entry with a wildcard tag matching name, or None.
+def match_wildcards(index, name):
+    lname = name.lower()
+    buckets = [('GENERAL', None)]
+    buckets += [('TAILS', lname[-n:]) for n in index['TAIL_LENGTHS'] if n <= len(lname)]
+    buckets += [('HEADS', lname[:n]) for n in index['HEAD_LENGTHS'] if n <= len(lname)]
+    found = None
+    for (kind, key) in buckets:
+        alternatives = index[kind] if key is None else index[kind].get(key)
+        if not alternatives:
+            continue
+        pattern = index['COMPILED'].get((kind, key))
+        if pattern is None:
+            pattern = index['COMPILED'][(kind, key)] = re.compile('^(?:' + '|'.join(alternatives) + ')$', re.I)
+        m = pattern.match(name)
+        if m:
+            i = int(m.lastgroup[1:].split('_')[0])
+            if found is None or i < found:
+                found = i
+    return found
+
+#----MONST
+
+#C-ish tokens. Whitespace and comments are matched so they can be skipped.
+#A /* without its */ runs off the end of the line; tokenize_lines carries it over.
+TOKEN_REGEX = re.compile(r'''
+     (?P<SPACE>\s+)
+    |(?P<COMMENT>/\*.*?\*/)
+    |(?P<OPEN_COMMENT>/\*.*)
+    |(?P<LINE_COMMENT>//.*)
+    |(?P<STRING>"(?:[^"\\]|\\.)*")
+    |(?P<CHAR>'(?:[^'\\]|\\.)*')
+    |(?P<WORD>[A-Za-z0-9_.]+)
+    |(?P<PUNCT>.)
+''', re.X)
+
+#Split (line number, line) pairs into (kind, text, line number) tokens, in a single pass.
+def tokenize_lines(lines):
+    in_comment = False
+    for (lineno, l) in lines:
+        pos = 0
+        if in_comment:
+            pos = l.find('*/')
+            if pos == -1:
+                continue
+            pos += 2
+            in_comment = False
+        for m in TOKEN_REGEX.finditer(l, pos):
+            kind = m.lastgroup
+            if kind == 'OPEN_COMMENT':
+                in_comment = True
+                break
+            if kind in ('SPACE', 'COMMENT', 'LINE_COMMENT'):
+                continue
+            yield (kind, m.group(), lineno)
+
+#Bracket pairs that group arguments.
+CLOSE_BRACKET = {'(' : ')', '{' : '}'}
+
+#Parse a call (or bare bracket group) starting at toks[i], which is the opening bracket.
+#Returns a node and the index just past the closing bracket:
+#    {'FUNC': 'ATTK', 'OPEN': '(', 'ARGS': [arg, ...], 'TEXT': 'ATTK(AT_BITE,AD_PHYS,1,4)', 'LINE': 12, 'END': 12}
+#Each arg is {'ITEMS': [token or node, ...], 'TEXT': ..., 'LINE': ...}
+#TEXT drops all whitespace and comments (but not inside strings).
+#A bare group like (G_GENO | 1) has a FUNC of ''.
+def parse_call(toks, i, func, line):
+    open_bracket = toks[i][1]
+    close_bracket = CLOSE_BRACKET[open_bracket]
+    args = []
+    items = []
+    i += 1
+    while True:
+        if i >= len(toks):
+            raise Exception(f"Unterminated {func}{open_bracket} starting on line {line}")
+        (kind, text, lineno) = toks[i]
+        if kind == 'PUNCT' and text in (',', close_bracket):
+            args.append(make_arg(items, lineno))
+            items = []
+            i += 1
+            if text == close_bracket:
+                break
+            continue
+        if kind == 'PUNCT' and text in CLOSE_BRACKET:
+            #Nested group. Attach it to the preceding word if there is one, e.g. ATTK(...)
+            name = ''
+            if items and not isinstance(items[-1], dict) and items[-1][0] == 'WORD':
+                name = items.pop()[1]
+            (node, i) = parse_call(toks, i, name, lineno)
+            items.append(node)
+            continue
+        if kind == 'PUNCT' and text in (')', '}'):
+            raise Exception(f"Mismatched '{text}' on line {lineno} in {func}{open_bracket} starting on line {line}")
+        items.append(toks[i])
+        i += 1
+    #f(), with no arguments at all.
+    if len(args) == 1 and not args[0]['ITEMS']:
+        args = []
+    return ({
+        'FUNC' : func,
+        'OPEN' : open_bracket,
+        'ARGS' : args,
+        'TEXT' : func + open_bracket + ','.join(a['TEXT'] for a in args) + close_bracket,
+        'LINE' : line,
+        'END'  : toks[i - 1][2],
+    }, i)
+
+def make_arg(items, lineno):
+    if items:
+        first = items[0]
+        lineno = first['LINE'] if isinstance(first, dict) else first[2]
+    return {
+        'ITEMS' : items,
+        'TEXT'  : ''.join(x['TEXT'] if isinstance(x, dict) else x[1] for x in items),
+        'LINE'  : lineno,
+    }
+
+#If an argument is exactly one call to one of the given functions, return that node.
+#'' matches a bare bracket group.
+def arg_call(arg, names):
+    if len(arg['ITEMS']) != 1:
+        return None
+    item = arg['ITEMS'][0]
+    if isinstance(item, dict) and item['FUNC'] in names:
+        return item
+    return None
+
+#Find each top-level MON() or MON3() in a token stream and parse it.
+#Only the tokens of one declaration are held at a time.
+#If wanted is given, it's called with the function name and the declaration's tokens
+#(starting at the opening bracket) first, and declarations it returns False for are
+#skipped without being parsed.
+def parse_mon_declarations(tokens, wanted=None):
+    prev = None
+    tokens = iter(tokens)
+    for tok in tokens:
+        if tok[1] == '(' and prev and prev[0] == 'WORD' and prev[1] in ('MON', 'MON3'):
+            call = [tok]
+            depth = 1
+            for tok in tokens:
+                call.append(tok)
+                if tok[0] != 'PUNCT':
+                    continue
+                if tok[1] in CLOSE_BRACKET:
+                    depth += 1
+                elif tok[1] in (')', '}'):
+                    depth -= 1
+                    if depth == 0:
+                        break
+            if wanted is None or wanted(prev[1], call):
+                (node, i) = parse_call(call, 0, prev[1], prev[2])
+                yield node
+            tok = None
+        prev = tok
+
+#Read monst.c (or monsters.h), handling #if 0 blocks and #define statements.
+#Takes (line number, line) pairs from read_source_lines.
+#Yields (line number, line) for everything else, with defines substituted.
+#Other preprocessor lines aren't yielded; they never contain a MON.
+#With substitute=False the lines are filtered the same way, but defines aren't substituted.
+def read_monst_lines(MONST, substitute=True):
+    seen_a_mon = False
+    is_deferred = False        #Track '#if 0'
+    in_directive = False       #Continuation lines of a # line that isn't being recorded
+    
+    # #define statements after the first MON.
+    #Typically SEDUCTION_ATTACKs
+    #Note: Explicitly skip "#define M1_MARSUPIAL 0" or any other M*/G* flags
+    #Skip anything that's already defined (i.e. SEDUCTION_ATTACKS). Use the first one seen.
+    seen_defines = {}
+    define_substitutions = None
+    in_define = ''
+    skip_this_define = False
+    
+    #read lines
+    for (i, l) in MONST:
+        l = l.strip('\r\n')     #Chomp
+        
+        #Remove comments.
+        if seen_a_mon:
+            l = re.sub(r'/\*.*?\*/', '', l)
+        l = re.sub(r'//.*$', '', l)
+        
+        if l.startswith('#if 0'):
+            is_deferred = True
+        if is_deferred and l.startswith('#endif'):
+            is_deferred = False
+        
+        if is_deferred:
+            continue
+        
+        m = re.match(r'^#\s*define\s+(\S+)(.*)$', l)
+        if m and seen_a_mon:
+            #print(f"define: {l}")
+            in_define = m.group(1)
+            l = m.group(2)
+            if in_define.startswith('M_') or in_define.startswith('G_') or in_define in seen_defines:
+                skip_this_define = True
+            if not skip_this_define:
+                seen_defines[in_define] = ''
+        if in_define != '':
+            if not skip_this_define:
+                seen_defines[in_define] += l
+            if not l.endswith('\\'):
+                #End of definition (no trailing backslash)
+                #Only a newly added name changes the substitutions; skipped defines don't.
+                if not skip_this_define and substitute:
+                    define_substitutions = compile_define_substitutions(seen_defines)
+                in_define = ''
+                skip_this_define = False
+            else:
+                #Remove that trailing backslash
+                seen_defines[in_define] = seen_defines[in_define][0:-1]
+            
+            #No matter what, skip to the next line.
+            continue
+        
+        #Any other preprocessor line, plus its continuations.
+        if in_directive or l.lstrip().startswith('#'):
+            in_directive = l.endswith('\\')
+            continue
+        
+        #This definition stuff is getting unwieldy.
+        l = do_define_substitutions(l, define_substitutions)
+        
+        # Monsters are defined with MON() declarations
+        if not seen_a_mon and l[:1].isspace() and l.lstrip().startswith('MON'):
+            seen_a_mon = True
+        
+        yield (i, l)
+
+#Monsters are declared in monst.c. In 3.7.0, this was moved to be in monsters.h (#included from monst.c)
+def monst_filename(ctx):
+    if ctx.base_nhver >= '3.7.0':
+        return os.path.join(ctx.nethome, 'include', 'monsters.h')
+    return os.path.join(ctx.nethome, 'src', 'monst.c')
+
+#Read and parse every MON in the source tree. This is a generator: each monster is
+#yielded as soon as its MON() has been read, so it can be written out before the
+#rest of the file is parsed. The records are also kept in ctx.monsters, which the parse
+#cache saves, --watch compares against and monsters_by_exp.txt is made from.
+#With --only, the other monsters are skipped by name before they're parsed, and reading
+#stops once every copy of each wanted name has been found. mon_count already has the
+#number of copies (were-creatures have two), from count_monster_names.
+def iter_monsters(ctx):
+    wanted = None
+    remaining = None
+    if ctx.only_names:
+        remaining = dict(ctx.mon_count)
+        wanted = lambda func, toks: mon_name_from_tokens(ctx, func, toks) in remaining
+        if not remaining:
+            return
+    MONST = read_source_lines(monst_filename(ctx))
+    with contextlib.closing(MONST):
+        for mon in parse_mon_declarations(tokenize_lines(read_monst_lines(MONST)), wanted):
+            #FIXME this should be a class or something to avoid these if chains
+            if ctx.dnethack:
+                m = process_monster_dnethack(ctx, mon)
+            else:
+                m = process_monster(ctx, mon)
+            if m is None:
+                continue
+            ctx.monsters.append(m)
+            if remaining is not None:
+                remaining[m.name] -= 1
+            yield m
+            if remaining is not None and not any(n > 0 for n in remaining.values()):
+                break
+
+#The NAME of a MON() or MON3() from its first few tokens (starting at the opening bracket),
+#without parsing the rest. None if there aren't enough, or it isn't a plain string.
+def mon_name_from_tokens(ctx, func, toks):
+    n = get_grammar(ctx, func).index('NAME')
+    if len(toks) <= 2 * n + 1:
+        return None
+    tok = toks[2 * n + 1]
+    if tok[0] == 'STRING' and tok[1] != '""':
+        return tok[1][1:-1]
+    return None
+
+#Count how many monsters use each name, for gen_names. A monster's page can't be named
+#until this is known, so it's done before iter_monsters, as a quick pass that doesn't
+#tokenize or substitute defines: the lines are filtered as read_monst_lines does (so MONs in
+##if 0 blocks and #define bodies don't count), comments are dropped, and one regex finds each
+#MON("name", (or MON3 with the name after the gendered ones). Only names written as a string
+#in the MON itself are found, which is also all that mon_name_from_tokens takes.
+#With --only, just the wanted names are counted. Case is ignored, and the counts are keyed by
+#the name as the source spells it.
+def count_monster_names(ctx):
+    if ctx.only_names:
+        names = '|'.join(re.escape(name) for name in sorted(ctx.only_names))
+    else:
+        names = '[^"\n]+'
+    calls = []
+    for func in ('MON', 'MON3'):
+        if (ctx.mon_grammar, func) not in mon_grammars:
+            continue
+        skip = r'\s*"[^"\n]*"\s*,' * get_grammar(ctx, func).index('NAME')
+        calls.append(r'\b' + func + r'\s*\(' + skip + r'\s*"(' + names + r')"')
+    MONST = read_source_lines(monst_filename(ctx))
+    with contextlib.closing(MONST):
+        text = '\n'.join(l for (i, l) in read_monst_lines(MONST, substitute=False))
+    text = C_COMMENT_REGEX.sub(lambda m: m.group(1) or ' ', text)
+    mon_count = {}
+    for match in re.finditer('|'.join(calls), text, re.I):
+        name = match.group(match.lastindex)
+        mon_count[name] = mon_count.get(name, 0) + 1
+    return mon_count
+
+#A C string (kept, as group 1) or comment, for dropping comments without touching strings.
+C_COMMENT_REGEX = re.compile(r'("(?:\\.|[^"\\\n])*")|/\*.*?\*/|//[^\n]*', re.S)
+
+#Generate the wiki page for one monster. Returns (filename, text).
+#The monster record isn't changed, apart from EXP and DIFF being filled in.
+def render_monster(ctx, m):
+    htmlname, print_name = gen_names(ctx, m)
+    print(f"HTML: {htmlname}")
+    template = ctx.template
+    
+    genocidable = 'Yes' if (has_flag(ctx, m.geno, 'G_GENO')) else 'No'
+    frequency = str(m.freq)
+    if (has_flag(ctx, m.geno, 'G_NOGEN')):
+        frequency = '0'
+    
+    #Apply the 'appears in x sized groups'. SGROUP, LGROUP, VLGROUP. VL is new to SLASH'EM.
+    #This is not done "normally", i.e. in the template. But I think this part is important.
+    if (has_flag(ctx, m.geno, 'G_SGROUP')):
+        frequency += ", appears in small groups"
+    if (has_flag(ctx, m.geno, 'G_LGROUP')):
+        frequency += ", appears in large groups"
+    if (has_flag(ctx, m.geno, 'G_VLGROUP')):
+        frequency += ", appears in very large groups"
+    #I was doing this instead of |hell or |nohell. Many vanilla articles don't have this.
+    #Should it be included?
+    #(If so, need to add "sheol" logic for UnNetHack)
+    #$frequency .= ", appears only outside of [[Gehennom]]" if ($m->{GEN} =~ /G_NOHELL/);
+    #$frequency .= ", appears only in [[Gehennom]]" if ($m->{GEN} =~ /G_HELL/);
+    if (has_flag(ctx, m.geno, 'G_UNIQ')):
+        frequency = "Unique"
+    
+    (exp, difficulty) = exp_and_difficulty(ctx, m)
+    if ctx.base_nhver >= '3.6.2':
+        #Difficulty is now part of the monst array. However, continue to calculate the "old" difficulty.
+        #Print a message if there are any discrepancies.
+        #mstrength no longer exists, so the "computed" difficulty uses 3.6.1 rules.
+        comp_diff = difficulty
+        difficulty = m.mons_diff
+        
+        if int(comp_diff) != int(difficulty):
+            print(f"\tDifficulty change: {print_name} set to {difficulty}, calculated {comp_diff}")
+        
+    ac = m.level.ac
+    align = m.level.aln
+    if align == 'A_NONE':
+        #Special case for the wizard. Might break on some variants.
+        align = "unaligned{{refsrc|monst.c|" + str(m.ref) + "|comment=The Wizard is the only always-unaligned monster in NetHack (though some other monsters can be set to unaligned if generated under special conditions)}}"
+    ac = format_num(ac)
+    align = format_num(align)
+    
+    # If the monster has any attacks, produce an attack section.
+    atks = []
+    if len(m.atk) > 0:
+        for a in m.atk:
+        
+            #Track unknown attack types and damage types.
+            #Need to also avoid key errors in Python.
+            if a.at not in ctx.attacks:
+                ctx.unknowns[a.at] = print_name
+                ctx.attacks[a.at] = ''
+            if a.ad not in ctx.damage:
+                ctx.unknowns[a.ad] = print_name
+                ctx.damage[a.ad] = ''
+
+            if (a.d > 0):
+                atks.append(f"{ctx.attacks[a.at]} {a.n}d{a.d}{ctx.damage[a.ad]}")
+            else:
+                #Omit nd0 damage (not the same as 0dn)
+                atks.append(f"{ctx.attacks[a.at]}{ctx.damage[a.ad]}")
+    
+    # If the monster has any conveyances from ingestion, produce a
+    # conveyances section.
+    
+    if (has_flag(ctx, m.geno, 'G_NOCORPSE')) and not IsPudding(print_name):
+        conveyances = 'None'
+    else:
+        conveyances = gen_conveyance(ctx, m)
+    # Rename "see_invis" to "seeinvis" to match template
+    flgs = [f.replace('SEE_INVIS', 'SEEINVIS') for f in m.flgs]
+    
+    resistances = calc_resistances(ctx, m, print_name)
+    resistancesStr = ''
+    if len(resistances) == 0:
+        resistancesStr = 'None'
+    else:
+        #TODO: Capitalize words.
+        resistancesStr = ', '.join(resistances)
+    
+    # Now output all the other flags of interest.
+    # Nethackwiki nicely supports templates that are equivalent.
+    # So all that's necessary is to strip and reformat the flags.
+    
+    attr_name = m.name
+    if m.female_name:
+        #The wiki does not currently have a "template" for fe/male name. This is what the Foocubus article does.
+        #$attr_name = "$m->{FEMALE_NAME} or $m->{MALE_NAME}";
+        #TODO: I believe the |tile= parameter is also needed. Again, wait until the templates support these names.
+        pass
+    article = 'A '
+    if has_flag(ctx, m.mflags2, 'M2_PNAME'):
+        article = ''
+    elif has_flag(ctx, m.geno, 'G_UNIQ'):
+        article = 'The '
+    else:
+        article = 'A '
+        #There are exceptions to this (see just_an, objnam.c), but I don't think any of them apply.
+        if (re.search(r'^[aeiou]', attr_name)):
+            article = "An "
+    
+    for prefix in ('HITAS', 'PLUS'):
+        for mr in m.mr1:
+            m2 = re.match(f'MR_({prefix}[A-Z]+)', mr)
+            if m2:
+                flgs.append(m2.group(1))
+                break
+    if has_flag(ctx, m.geno, 'G_NOCORPSE'):
+        flgs.append('nocorpse')
+        
+    #I was putting this in frequency. Which is better?
+    if has_flag(ctx, m.geno, 'G_HELL'):
+        flgs.append('hell')
+    if has_flag(ctx, m.geno, 'G_NOHELL'):
+        flgs.append('nohell')
+    #UnNetHack
+    if has_flag(ctx, m.geno, 'G_SHEOL'):
+        flgs.append('sheol')
+    if has_flag(ctx, m.geno, 'G_NOSHEOL'):
+        flgs.append('nosheol')
+        
+    #TODO: Special flags for dNetHack?
+    #dNetHack specific attributes need to be added to the wiki templates.
+    
+    flag = template['flag']
+    #Add MTBGAV for dNetHack. Restricting this at all is unnecessary...
+    flags = ''.join([flag({'flag': re.sub(r'M[1-3MTBGAV]_(.*)', '\\1', mr).lower()}) for mr in flgs])
+    
+    if ctx.slashem:
+        ref = f"[[SLASH'EM_0.0.7E7F2/monst.c#line{m.ref}]]"
+    elif ctx.dnethack:
+        #dnethack source code isn't on wiki.
+        #Link to github?
+        ref = f"monst.c, line {m.ref}"
+    elif ctx.unnethack:
+        #There's a template that links to sourceforge, but only as a <ref>, which I don't want.
+        #print $HTML " |reference=https://github.com/UnNetHack/UnNetHack/blob/master/src/monst.c#$m->{REF}";
+        #print $HTML " |reference=http://sourceforge.net/p/unnethack/code/1986/tree/trunk/src/monst.c#$m->{REF}";
+        #ok I just need a {{src}} template...
+        ref = f"monst.c, line {m.ref}"
+    #TODO: SLASHTHEM
+    else:
+        ref = get_vanilla_ref(ctx, m.ref)
+        
+    #I think $entry will always be defined. Everything seems to have one.
+    #Could use a better stub message...
+    entry = lookup_entry(ctx, m.name)
+    
+    #The whole page in one go.
+    text = template['page']({
+        'name'         : print_name,
+        'monster'      : attr_name,
+        'symbol'       : m.symbol,
+        'difficulty'   : difficulty,
+        'level'        : m.level.lvl,
+        'experience'   : exp,
+        'speed'        : m.level.mov,
+        'AC'           : ac,
+        'MR'           : m.level.mr,
+        'align'        : align,
+        'frequency'    : frequency,
+        'genocidable'  : genocidable,
+        'attacks'      : template['attacks']({'list': ', '.join(atks)}) if atks else '',
+        'conveyances'  : conveyances,
+        'resistances'  : resistancesStr,
+        'article'      : article,
+        'flags'        : flags,
+        'size'         : m.size.siz,
+        'nutrition'    : m.size.nut,
+        'weight'       : m.size.wt,
+        'reference'    : ref,
+        'encyclopedia' : template['encyclopedia']({'entry': entry}) if entry else '',
+        'version'      : version,
+    })
+    return (htmlname, text)
+#End render_monster
+
+#Resistances the monster has, as a list of names. print_name is from gen_names.
+def calc_resistances(ctx, m, print_name):
+    #Look for a magic attack. If found, add magic resistance.
+    #Baby gray dragons also explicitly have magic resistance.
+    #For variants, consult mondata.c, resists_magm
+    hasmagic = print_name == "baby gray dragon"
+    for a in m.atk:
+        if a.ad == 'AD_MAGM' or a.ad == 'AD_RBRE':
+            hasmagic = True
+        if ctx.dnethack:
+            #Large list of explicitly immune mons
+            #Shimmering dragons have AD_RBRE but are NOT resistant
+            raise Exception("Implement later.")
+    
+    #Replace MR_ALL with each resistance.
+    #$m->{MR1} =~ s/MR_ALL/MR_STONE\|MR_ACID\|MR_POISON\|MR_ELEC\|MR_DISINT\|MR_SLEEP\|MR_COLD\|MR_FIRE\|MR_DRAIN\|MR_SICK/ 
+    #        if $dnethack;
+    
+    resistances = []
+    for mr in m.mr1:
+        if ('MR_PLUS' in mr) or ('MR_HITAS' in mr):
+            #SLASH'EM Hit As x/Need x to hit. They're not resistances.
+            continue
+        resistances.append(ctx.consts['flags'][mr])
+        #$unknowns{$mr} = $print_name if !defined $flags{$mr};
+
+    #Death, Demons, Were-creatures, and the undead automatically have level drain resistance
+    #Add it, unless they have an explicit MR_DRAIN tag (SLASH'EM only)
+    if (m.name == 'Death' or has_flag(ctx, m.mflags2, 'M2_DEMON') or has_flag(ctx, m.mflags2, 'M2_UNDEAD') or \
+            has_flag(ctx, m.mflags2, 'M2_WERE')) and not has_flag(ctx, m.mresists, 'MR_DRAIN'):
+        resistances.append("level drain")
+    if ctx.dnethack:
+        raise Exception("Implement later.")
+        #dNetHack - angel and keter have explicit death resistance
+    if hasmagic:
+        resistances.append('magic')
+    return resistances
+
+#Render one monster and send it to the sink.
+def output_monster_html(ctx, m):
+    (htmlname, text) = render_monster(ctx, m)
+    write_output(ctx, htmlname, text)
+
+#----OUTPUT
+
+#Kept in the output folder for --incremental.
+MANIFEST_NAME = '.nhtohtml-manifest.json'
+
+def hash_text(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def hash_file(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+#Sinks are where the generated files go. Each has write(filename, text), called once per
+#file as soon as it's generated, and close(), called at the end of the run.
+
+#One file per page in the output folder. This is the default.
+class DirectorySink:
+    def __init__(self, path):
+        if not os.path.isdir(path):
+            os.mkdir(path)
+        self.path = path
+    
+    def write(self, filename, text):
+        with open(os.path.join(self.path, filename), 'w', encoding='utf-8') as OUT:
+            OUT.write(text)
+    
+    def close(self):
+        pass
+
+#Bundles put every page in a single file (--bundle), keyed on the page's file name.
+#They write to a binary file opened with a large buffer, so the data goes out in big
+#chunks rather than a small write per page, and close it when they're done.
+BUNDLE_BUFFER = 1 << 20
+
+#One JSON object per line: {"name": "giant_ant.txt", "text": "..."}
+class JsonlSink:
+    def __init__(self, f):
+        self.f = f
+    
+    def write(self, filename, text):
+        self.f.write(json.dumps({'name': filename, 'text': text}).encode('utf-8'))
+        self.f.write(b'\n')
+    
+    def close(self):
+        self.f.close()
+
+class TarSink:
+    def __init__(self, f):
+        self.f = f
+        #Stream mode, so it also works on stdout.
+        self.tar = tarfile.open(fileobj=f, mode='w|')
+        self.mtime = time.time()
+    
+    def write(self, filename, text):
+        data = text.encode('utf-8')
+        info = tarfile.TarInfo(filename)
+        info.size = len(data)
+        info.mtime = self.mtime
+        self.tar.addfile(info, io.BytesIO(data))
+    
+    def close(self):
+        self.tar.close()
+        self.f.close()
+
+class ZipSink:
+    def __init__(self, f):
+        self.f = f
+        self.zip = zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED)
+    
+    def write(self, filename, text):
+        self.zip.writestr(filename, text)
+    
+    def close(self):
+        self.zip.close()
+        self.f.close()
+
+BUNDLE_SINKS = {
+    'jsonl' : JsonlSink,
+    'tar'   : TarSink,
+    'zip'   : ZipSink,
+}
+
+#Open a bundle sink on a file, or on stdout for '-'.
+def open_bundle(bundle, filename):
+    if bundle not in BUNDLE_SINKS:
+        raise Exception(f"Unknown bundle format '{bundle}' (should be one of {', '.join(BUNDLE_SINKS)})")
+    if filename == '-':
+        sys.stdout.flush()
+        f = open(sys.stdout.fileno(), 'wb', buffering=BUNDLE_BUFFER, closefd=False)
+    else:
+        f = open(filename, 'wb', buffering=BUNDLE_BUFFER)
+    return BUNDLE_SINKS[bundle](f)
+
+#Every page on one stream, each preceded by a "==> filename <==" line.
+class StdoutSink:
+    def __init__(self, out):
+        self.out = out
+    
+    def write(self, filename, text):
+        self.out.write(f'==> {filename} <==\n')
+        self.out.write(text)
+        self.out.write('\n')
+    
+    def close(self):
+        self.out.flush()
+
+#Upload every page to a wiki through the MediaWiki action API (api.php) instead of writing files.
+#The page title is the prefix plus the file name without .txt (MediaWiki reads _ as a space).
+#Pages are checked against the wiki in batches of up to WIKI_BATCH titles, one query for the
+#whole batch, and only the ones whose text differs from the current revision are edited.
+#Edits go out on a small pool of threads, each keeping its own connection open between requests.
+WIKI_BATCH = 50
+WIKI_RETRIES = 3
+WIKI_PASSWORD_ENV = 'NHTOHTML_WIKI_PASSWORD'
+
+class WikiSink:
+    def __init__(self, api_url, user=None, password=None, prefix='', summary='Update from nhtohtml', jobs=4):
+        url = urllib.parse.urlsplit(api_url)
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise Exception(f"Can't upload to {api_url}: needs an http:// or https:// URL of the wiki's api.php")
+        self.url = url
+        self.path = url.path or '/api.php'
+        self.prefix = prefix
+        self.summary = summary
+        self.cookies = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.connections = []
+        self.pending = []
+        self.futures = []
+        self.edited = []
+        self.unchanged = []
+        self.failed = []
+        if user:
+            self.login(user, password or '')
+        self.token = self.api(action='query', meta='tokens', type='csrf')['query']['tokens']['csrftoken']
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs))
+    
+    #This thread's connection to the wiki, opened on first use and kept alive after that.
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            if self.url.scheme == 'https':
+                conn = http.client.HTTPSConnection(self.url.hostname, self.url.port, timeout=60)
+            else:
+                conn = http.client.HTTPConnection(self.url.hostname, self.url.port, timeout=60)
+            self.local.conn = conn
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+    
+    #POST one API request and return the decoded reply. A dropped connection is reopened and
+    #the request tried again, unless retry is False (see edit); an error reported by the API raises.
+    def api(self, retry=True, **params):
+        params['format'] = 'json'
+        params['formatversion'] = '2'
+        body = urllib.parse.urlencode(params).encode('utf-8')
+        for attempt in range(WIKI_RETRIES):
+            with self.lock:
+                cookie = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+            headers = {
+                'Content-Type' : 'application/x-www-form-urlencoded',
+                'User-Agent'   : f'nhtohtml/{version}',
+            }
+            if cookie:
+                headers['Cookie'] = cookie
+            conn = self.connection()
+            try:
+                conn.request('POST', self.path, body, headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if not retry or attempt == WIKI_RETRIES - 1:
+                    raise
+                continue
+            if response.status != 200:
+                raise Exception(f"Wiki API request failed: HTTP {response.status} {response.reason}")
+            with self.lock:
+                for header in response.headers.get_all('Set-Cookie') or []:
+                    name, _, value = header.split(';', 1)[0].partition('=')
+                    self.cookies[name.strip()] = value.strip()
+            reply = json.loads(data)
+            if 'error' in reply:
+                raise Exception(f"Wiki API error {reply['error'].get('code')}: {reply['error'].get('info')}")
+            return reply
+    
+    #Log in with a bot password (Special:BotPasswords), so the edits aren't anonymous.
+    def login(self, user, password):
+        token = self.api(action='query', meta='tokens', type='login')['query']['tokens']['logintoken']
+        result = self.api(action='login', lgname=user, lgpassword=password, lgtoken=token)['login']
+        if result.get('result') != 'Success':
+            raise Exception(f"Couldn't log in to the wiki as {user}: {result.get('reason', result.get('result'))}")
+    
+    def write(self, filename, text):
+        title = self.prefix + (filename[:-4] if filename.endswith('.txt') else filename)
+        self.pending.append((title, text))
+        if len(self.pending) >= WIKI_BATCH:
+            self.flush()
+    
+    #Compare the pending pages with the wiki (one query, by SHA-1), and queue edits for the changed ones.
+    def flush(self):
+        pages, self.pending = self.pending, []
+        if not pages:
+            return
+        reply = self.api(action='query', prop='revisions', rvprop='sha1', titles='|'.join(t for t, _ in pages))['query']
+        normalized = {n['from']: n['to'] for n in reply.get('normalized', [])}
+        current = {}
+        for page in reply.get('pages', []):
+            if page.get('revisions'):
+                current[page['title']] = page['revisions'][0].get('sha1')
+        for title, text in pages:
+            if wiki_sha1_matches(current.get(normalized.get(title, title)), text):
+                self.unchanged.append(title)
+            else:
+                self.futures.append(self.pool.submit(self.edit, title, text))
+    
+    #The SHA-1 of a page's current revision, or None if there's no such page.
+    def current_sha1(self, title):
+        for page in self.api(action='query', prop='revisions', rvprop='sha1', titles=title)['query'].get('pages', []):
+            if page.get('revisions'):
+                return page['revisions'][0].get('sha1')
+        return None
+    
+    #Edits aren't simply sent again when the connection drops, since the wiki may have saved
+    #the first one already. The page is looked up first, and only edited again if it still differs.
+    def edit(self, title, text):
+        try:
+            for attempt in range(WIKI_RETRIES):
+                try:
+                    result = self.api(retry=False, action='edit', title=title, text=text, summary=self.summary, bot='1', token=self.token)['edit']
+                    break
+                except (http.client.HTTPException, OSError):
+                    if attempt == WIKI_RETRIES - 1:
+                        raise
+                    if wiki_sha1_matches(self.current_sha1(title), text):
+                        result = {'result': 'Success'}
+                        break
+            if result.get('result') != 'Success':
+                raise Exception(f"edit returned {result.get('result')}")
+        except Exception as e:
+            with self.lock:
+                self.failed.append((title, str(e)))
+            return
+        with self.lock:
+            (self.unchanged if result.get('nochange') else self.edited).append(title)
+    
+    def close(self):
+        try:
+            self.flush()
+            concurrent.futures.wait(self.futures)
+        finally:
+            self.pool.shutdown()
+            for conn in self.connections:
+                conn.close()
+        print(f"Wiki: {len(self.edited)} pages edited, {len(self.unchanged)} unchanged, {len(self.failed)} failed")
+        for title, error in self.failed:
+            print(f"\tCouldn't edit {title}: {error}")
+        if self.failed:
+            raise Exception(f"{len(self.failed)} pages couldn't be uploaded")
+
+#Whether a revision SHA-1 from the wiki is that of text.
+#MediaWiki drops trailing whitespace when it saves a page.
+def wiki_sha1_matches(sha1, text):
+    return sha1 in (hashlib.sha1(text.encode('utf-8')).hexdigest(), hashlib.sha1(text.rstrip().encode('utf-8')).hexdigest())
+
+#Which bundle format an --output name asks for, by its extension. None for a folder.
+def bundle_format(output_path):
+    ext = os.path.splitext(output_path)[1][1:].lower()
+    return ext if ext in BUNDLE_SINKS else None
+
+#Pick a sink for --output: a bundle, or a folder. (- is stdout; see convert.)
+def open_sink(ctx):
+    bundle = ctx.bundle or bundle_format(ctx.output_path)
+    if bundle is None:
+        return DirectorySink(ctx.output_path)
+    if ctx.incremental:
+        raise Exception("--incremental needs an output folder, not a bundle")
+    return open_bundle(bundle, ctx.output_path)
+
+#Send one generated file to the sink.
+#With --incremental, a file whose text hasn't changed since the last run (per the manifest) is left alone.
+def write_output(ctx, filename, text):
+    digest = hash_text(text)
+    ctx.file_hashes[filename] = digest
+    outfilename = os.path.join(ctx.output_path, filename)
+    if ctx.incremental and ctx.manifest['FILES'].get(filename) == digest and os.path.isfile(outfilename):
+        ctx.unchanged.append(filename)
+        if PROFILE is not None:
+            PROFILE.count('files unchanged')
+        return
+    ctx.sink.write(filename, text)
+    ctx.written.append(filename)
+    if PROFILE is not None:
+        PROFILE.count('files written')
+        PROFILE.count('bytes written', len(text.encode('utf-8')))
+
+#Files that went into this run. Stored in the manifest, so it says what produced the output.
+def input_files(ctx):
+    return {
+        'permonst.h' : os.path.join(ctx.nethome, 'include', 'permonst.h'),
+        'monflag.h'  : os.path.join(ctx.nethome, 'include', 'monflag.h'),
+        'monattk.h'  : os.path.join(ctx.nethome, 'include', 'monattk.h'),
+        'color.h'    : os.path.join(ctx.nethome, 'include', 'color.h'),
+        'monst'      : monst_filename(ctx),
+        'data.base'  : os.path.join(ctx.nethome, 'dat', 'data.base'),
+        'data.json'  : DATA_JSON,
+    }
+
+#Hashes of input_files, worked out once per run.
+def input_hashes(ctx):
+    if ctx.input_hashes is None:
+        #color.h is optional; it's None if it isn't there.
+        ctx.input_hashes = {k: hash_file(v) if os.path.isfile(v) else None for (k, v) in input_files(ctx).items()}
+    return ctx.input_hashes
+
+def load_manifest(ctx):
+    filename = os.path.join(ctx.output_path, MANIFEST_NAME)
+    if ctx.incremental and os.path.isfile(filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {'VERSION': None, 'INPUTS': {}, 'FILES': {}}
+
+#Update the manifest after a run, and deal with files left over from monsters that no longer exist.
+#With --only, only the one monster was regenerated, so everything else is kept as it was.
+def save_manifest(ctx):
+    files = dict(ctx.manifest['FILES']) if ctx.only_mon != '' else {}
+    files.update(ctx.file_hashes)
+    
+    stale = []
+    if ctx.only_mon == '':
+        stale = sorted(f for f in ctx.manifest['FILES'] if f not in ctx.file_hashes)
+    for f in stale:
+        outfilename = os.path.join(ctx.output_path, f)
+        if ctx.delete_stale:
+            if os.path.isfile(outfilename):
+                os.remove(outfilename)
+            print(f"Deleted stale file: {f}")
+        else:
+            print(f"Stale file (no longer generated): {f}")
+            files[f] = ctx.manifest['FILES'][f]
+    ctx.stale = stale
+    
+    manifest = {
+        'VERSION' : version,
+        'INPUTS'  : input_hashes(ctx),
+        'FILES'   : files,
+    }
+    changed = [k for (k, v) in manifest['INPUTS'].items() if ctx.manifest['INPUTS'].get(k) not in (None, v)]
+    if changed:
+        print(f"Inputs changed since the last run: {', '.join(changed)}")
+    with open(os.path.join(ctx.output_path, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    ctx.manifest = manifest
+
+#Used to determine if a monster leaves a glob instead of a corpse.
+#This is hardcoded into the code, with 4 entries in a switch statement (mon.c, line 413 in 3.6.1, function make_corpse)
+#There's also a #define for "is this object a pudding?" 
+def IsPudding(name):
+    return name in ['gray ooze', 'brown pudding', 'green slime', 'black pudding']
+
+#Everything comes from ctx.
+def output_monsters_by_exp(ctx):
+    header = '''{| class="prettytable sortable striped" style="border:none; margin:0; padding:0; width: 22em;"
+|-
+! Name !! Experience !! Difficulty
+'''
+    footer = '|}'
+    print('Writing: monsters_by_exp.txt')
+    sorted_mons = sorted(ctx.monsters, key=lambda x: (x.exp, x.diff), reverse=True)
+    
+    with io.StringIO() as HTML:
+        HTML.write(header)
+        for m in sorted_mons:
+            row = f"|-\n| [[{m.name}]] || {m.exp} || {m.diff}\n"
+            HTML.write(row)
+        HTML.write(footer)
+        write_output(ctx, 'monsters_by_exp.txt', HTML.getvalue())
+  
+
+    
+# Handy subs follow...
+
+
+# Calculate the chance of getting each resistance
+# Each individual chance uses the lookup table to get the chance;
+# the monster has a level-in-chance chance to grant the intrinsic,
+# (Killer bees and Scorpions add 25% to this value for poison)
+# this value is then divided by the total number of intrinsics.
+# There are a large number of special circumstances. They either completely
+# change which intrinsics are granted (e.g. lycanthopy; not a MR_ ) or
+# modify probabilities of existing intrinsics, (e.g. Mind flayers).
+#Returns a list of (conveyance, percent chance) pairs. The chance is None for
+#things that aren't a random chance, like curing stoning.
+def calc_conveyance(ctx, m):
+    level = m.level.lvl
+    resistances = {}
+    stoning = has_flag(ctx, m.mflags1, 'M1_ACID') or ('lizard' in m.name.lower()) or m.name == 'mandrake'
+    #mandrake is dNetHack. Which also adds many new types of lizards
+    
+    for mr in m.mr2:
+        if mr == 'MR_STONE':
+            #Interesting. MR_STONE actually seems to have no effect. Petrification curing is an acidic or lizard check and not MR_STONE check.
+            #Additionally, the chromatic dragon, which has MR_STONE, does NOT cure petrification!
+            continue
+        r = ctx.consts['flags'][mr]
+        #print(m)
+        resistances[r] = (level * 100) / 15
+        
+        if (m.name == 'killer bee' or m.name == 'scorpion') and mr == 'MR_POISON':
+            #These two monsters have a hardcoded "bonus" chance to grant poison resistance.
+            #25% of the time, they always grant it. 75% of the time, they follow regular rules.
+            #(I wrote a quick program to verify this gets added correctly. The expected values are 30% for killer bee and 50% for scorpion)
+            resistances[r] = (resistances[r] * 0.75) + 25;
+        
+        resistances[r] = min(int(resistances[r]), 100)
+        #Comment was "Round down", but pretty sure this was always using ints
+    
+    if has_flag(ctx, m.mflags1, 'M1_TPORT'):
+        chance = int(level * 100) / 10
+        chance = min(chance, 100)
+        resistances['causes [[teleportitis]]'] = chance
+    if has_flag(ctx, m.mflags1, 'M1_TPORT_CNTRL'):
+        chance = int(level * 100) / 12
+        chance = min(chance, 100)
+        resistances['[[teleport control]]'] = chance
+    
+    if ctx.dnethack and m.name == 'shimmering dragon':
+        resistances['displacement'] = 100
+    
+    #Level 0 monsters cannot give intrinsics (0% chance). There don't seem to be any that affect this though, and no other way to get 0%
+    
+    #Insert a bunch of special cases. Some will clear %resistances.
+    #50% chance of +1 intelligence
+    if ('mind flayer' in m.name):
+        resistances["+1 [[Intelligence]]"] = 100
+    if ('mind flayer' in m.name) or m.name == "floating eye":
+        resistances["[[Telepathy]]"] = 100
+    
+    #"Hey, eating Death will give me teleport control!"
+    if m.name == "Death" or m.name == "Famine" or m.name == "Pestilence":
+        resistances = {}
+    
+    count = len(resistances)
+    
+    #Strength from giants:
+    #in 3.6.0+, the +strength is considered a proper resistance, and thus reduces the chance of other resistances (storm, fire, ice)
+    #but at most 50%:   "if strength is the only candidate, give it 50% chance"
+    #in SLASH'EM, it's only 25%
+    
+    gives_str = False
+    gain_level = ('wraith' in m.name)
+    if ctx.slashthem and m.name == 'turbo chicken' or m.name == 'centaurtrice':
+        gain_level = True
+    
+    #avoid "giant ant". Giants always end with "giant"
+    #Might not hold true for variants...
+    if m.name.endswith('giant'):
+        gives_str = True
+    if m.name == 'Lord Surtur' or m.name == 'Cyclops':
+        gives_str = True
+    if ctx.dnethack and ('gug' in m.name):
+        gives_str = True
+    #Special case
+    if (ctx.slashthem or ctx.slashem_extended) and re.search(r'olog[_ -]hai[_ -]gorgon', m.name, re.I):
+        gives_str = True
+    
+    if gives_str and ctx.base_nhver >= '3.6.0':
+        #NetHack 3.4.3: 100% chance
+        #NetHack 3.6.0: 100% base, scales with other resistances, 50% maximum
+        resistances['Increase strength'] = 100
+        count += 1
+        if count == 1:
+            resistances['Increase strength'] = 50
+    
+    conveys = []
+    if ctx.dnethack:
+        raise Exception("Implement later.")
+        #lines 1265-1301 or so
+    else:
+        for key in sorted(resistances):
+            resistances[key] = int(resistances[key] / count)
+            conveys.append((key, resistances[key]))
+    
+    #NetHack 3.4.3 base - strength gain is guaranteed
+    if gives_str and ctx.base_nhver < '3.6.0':
+        chance = 100
+        if ctx.slashem or ctx.slashthem or ctx.slashem_extended:
+            chance = 25
+        #This is unconditional.
+        if (ctx.slashthem or ctx.slashem_extended) and re.search(r'olog[_ -]hai[_ -]gorgon', m.name, re.I):
+            chance = 100
+        
+        conveys.append(('Increase strength', chance))
+    
+    if (gain_level):
+        #SLASH'EM changes the mechanics (which slashthem inherits)
+        #But I don't think it's worth changing the description
+        #It's covered in the article.
+        conveys.append(('[[Gain level]]', None))
+    
+    #Add resistances that are not affected by chance, e.g. Lycanthopy. Actually, all of these do not allow normal intrinsic gaining.
+    if ('were' in m.name):
+        conveys = [('Lycanthropy', None)]
+    if m.name == 'stalker':
+        conveys = [('[[Invisibility]]', None), ('[[see invisible]] (if [[invisible]] when corpse is eaten)', None)]
+    
+    if stoning:
+        conveys.append(('Cures [[stoning]]', None))
+    
+    #UnNetHack
+    if ctx.unnethack and m.name == 'evil eye':
+        conveys.append(('Alters luck', None))      #BUC dependent.
+    
+    #SLASHTHEM adds charisma bonus
+    #nymph and gorgon are handled separately but appear to be identical.
+    #Hard coding in the 10%...
+    if ctx.slashthem and (m.name == 'gorgon' or m.symbol == 'NYMPH'):
+        conveys.append(('Increase charisma', 10))
+    
+    #Polymorph. Sandestins do not leave a corpse so I'm not mentioning it, although it does apply to digesters.
+    if m.name == 'chameleon' or m.name == 'doppelganger' or m.name == 'genetic engineer':
+        conveys.append(('Causes [[polymorph]]', None))
+    
+    return conveys
+
+#The conveyances as wikitext.
+def gen_conveyance(ctx, m):
+    conveys = calc_conveyance(ctx, m)
+    if not conveys:
+        return 'None'
+    return ', '.join(key if chance is None else f'{key} ({chance}%)' for (key, chance) in conveys)
+
+# Generate html filenames, and the monster's name.
+def gen_names(ctx, m):
+    htmlname = f"{m.name}.txt"
+    htmlname = re.sub(r'[:!\s\\\/]', '_', htmlname)
+    print_name = m.name
+    if ctx.mon_count[m.name] > 1:
+        symbol = m.symbol.lower()
+        htmlname = htmlname.replace('.txt', f"_{symbol}.txt")
+        print_name += f" ({symbol})"
+    
+    return (htmlname, print_name)
+
+# Lookup a monster's entry in the help database.
+def lookup_entry(ctx, name):
+    index = ctx.encyclopedia
+    #Earliest entry with a plain or wildcard tag matching the name.
+    found = index['LITERAL'].get(name.lower())
+    i = match_wildcards(index, name)
+    if i is not None and (found is None or i < found):
+        found = i
+    if found is None:
+        return None
+    if found not in index['EXCLUSIONS']:
+        return entry_text(index, found)
+    #The entry has ~ tags, so it might not count. Fall back to checking each
+    #entry in order, starting with this one. The first tag that matches decides.
+    for i in range(found, len(index['ENTRIES'])):
+        for (exclude, pat) in entry_tags(index, i):
+            if PROFILE is not None:
+                PROFILE.count('encyclopedia tags tested')
+            if pat.match(name):
+                if exclude:
+                    # Tags starting with ~ say "don't match this entry."
+                    break
+                return entry_text(index, i)
+    return None
+
+#May have changes in exper.c
+#experience(mtmp, nk)
+def calc_exp(ctx, m):
+    lvl = m.level.lvl
+    
+    #Attack types used in inequality comparisons
+    #The comparisons are the same between variants (that I've noticed),
+    #but the attack types/values differ.
+    AT_BUTT = ctx.atk_ints['AT_BUTT']
+    AD_BLND = ctx.dmg_ints['AD_BLND']
+    AD_PHYS = ctx.dmg_ints['AD_PHYS']
+    
+    tmp = lvl * lvl + 1
+    
+    #AC bonus
+    #Note - this uses find_mac, which takes armor into account
+    #and dNetHack does a ton of other stuff, e.g. fleeing giant turtles have -15 AC
+    #not all armor can be accounted for, but monsters should have a "target" AC
+    #e.g. Yendorian army has 10 base AC but gets assorted armor.
+    #Can I account for that?
+    ac = m.level.ac
+    if ac < 3:
+        tmp += (7 - ac)
+    if ac < 0:
+        tmp += (7 - ac)
+    mov = m.level.mov
+    
+    if mov > 12:
+        tmp += 5 if mov > 18 else 3
+    atks = 0
+    #Attack bonuses
+    if m.atk:
+        for a in m.atk:
+            atks += 1
+            
+            #For each "special" attack type give extra experience
+            atk_int = ctx.atk_ints[a.at]
+            dmg_int = ctx.dmg_ints[a.ad]
+            if atk_int > AT_BUTT:
+                if a.at == 'AT_MAGC':
+                    tmp += 10
+                elif ctx.dnethack and a.at == 'AT_MMGC':
+                    tmp += 10
+                elif a.at == 'AT_WEAP':
+                    tmp += 5
+                else:
+                    tmp += 3
+            #Attack damage types; 'temp2 > AD_PHYS and < AD_BLND' means MAGM, FIRE, COLD, SLEE, DISN, ELEC, DRST, ACID (i.e. the dragon types)
+            #Actually this probably doesn't change in variants. Oh well.
+            
+            if dmg_int > AD_PHYS and dmg_int < AD_BLND:
+                tmp += lvl * 2
+            elif a.ad in ['AD_STON', 'AD_SLIM', 'AD_DRLI']:
+                tmp += 50
+            elif ctx.base_nhver < '3.6.0' and tmp != 0:
+                #Bug in the original code; uses 'tmp' instead of 'tmp2'.
+                #I haven't noticed any variants fix this.
+                tmp += lvl
+            elif ctx.base_nhver >= '3.6.0' and a.ad != 'AD_PHYS':
+                #NetHack 3.6.0 fixes this bug.
+                tmp += lvl
+            
+            #Heavy damage bonus
+            if a.n * a.d > 23:
+                tmp += lvl
+                
+            #This is for base experience, so assume drownable.
+            if a.ad == 'AD_WRAP' and m.symbol == 'EEL':
+                tmp += 1000
+    #Additional correction for the bug; No attack is still treated as an attack.
+    #This was fixed in 3.6.0
+    if ctx.base_nhver < '3.6.0':
+        tmp += (6 - atks) * lvl
+        
+    #nasty
+    if has_flag(ctx, m.mflags2, 'M2_NASTY'):
+        tmp += 7 * lvl
+    if lvl > 8:
+        tmp += 50
+    
+    if m.name == "mail daemon":
+        tmp = 1
+    
+    #dNetHack, UnNetHack - Dungeon fern spores give no experience
+    if re.search(r'dungeon fern spore|swamp fern spore|burning fern spore', m.name):
+        tmp = 0
+    if re.search(r'tentacles?$', m.name) or m.name == 'dancing blade':
+        tmp = 0
+    
+    #Store in hash
+    m.exp = tmp
+    return tmp
+    
+#makedefs.c, mstrength(ptr)
+#No longer used as of 3.6.2, but still calculated.
+def calc_difficulty(ctx, m):
+    lvl = m.level.lvl
+    n = 0
+    
+    #This is done in parse_level, but not in dnethack, but is still needed for the calculation here.
+    if ctx.dnethack and lvl > 49:
+        lvl = (2*(lvl - 6) / 4)
+        
+    if (has_flag(ctx, m.geno, 'G_SGROUP')):
+        n += 1
+    if (has_flag(ctx, m.geno, 'G_LGROUP')):
+        n += 2
+    if (has_flag(ctx, m.geno, 'G_VLGROUP')):
+        n += 4      #SLASH'EM
+        
+    has_ranged_atk = False
+    
+    #For higher ac values
+    ac = m.level.ac
+    if ac < 4:
+        n += 1
+    if ac < 0:
+        n += 1
+    if ctx.dnethack:
+        #dnethack adds more ifs:
+        if ac < -5:
+            n += 1
+        if ac < -10:
+            n += 1
+        if ac < -20:
+            n += 1
+
+    #For very fast monsters
+    mov = m.level.mov
+    if mov >= 18:
+        n += 1
+    #for each attack and "Special" attack
+    #Combining the two sections, plus determine if it has a ranged attack.
+
+    if m.atk:
+        for a in m.atk:
+            #Add one for each: Not passive attack, magic attack, Weapon attack if strong
+            if a.at != 'AT_NONE':
+                n += 1
+            if a.at == 'AT_MAGC':
+                n += 1
+            if a.at == 'AT_WEAP' and has_flag(ctx, m.mflags2, 'M2_STRONG'):
+                n += 1
+            #dNetHack extends the "magc" if with the following:
+            if ctx.dnethack and a.at in ['AT_MMGC','AT_TUCH','AT_SHDW','AT_TNKR']:
+                n += 1
+            #Add: +2 for poisonous, were, stoning, drain life attacks
+            #    +1 for all other non-pure-physical attacks (except grid bugs)
+            #    +1 if the attack can potentially do at least 24 damage
+            if a.ad in ['AD_DRLI','AD_STON','AD_WERE','AD_DRST','AD_DRDX','AD_DRCO']:
+                n += 2
+            elif ctx.dnethack and a.ad in ['AD_SHDW','AD_STAR','AD_BLUD']:
+                #dnethack extends this '+= 2' block with these types.
+                n += 2
+            else:
+                if a.ad != 'AD_PHYS' and m.name != "grid bug":
+                    n += 1
+            if a.n * a.d > 23:
+                n += 1
+            
+            #Set ranged attack  (defined in ranged_attk)
+            #Automatically includes anything > AT_WEAP
+            if is_ranged_attk(ctx, a.at):
+                has_ranged_atk = True
+    #For ranged attacks
+    if has_ranged_atk:
+        n += 1
+        
+    #Exact string comparison (so, not leprechaun wizards)
+    if m.name == "leprechaun":
+        n -= 2
+        
+    #dNetHack: "Hooloovoo spawn many dangerous enemies."
+    if ctx.dnethack and m.name == "hooloovoo":
+        n += 10
+    
+    #"tom's nasties"
+    if has_flag(ctx, m.mflags2, 'M2_NASTY') and (ctx.slashem or ctx.slashthem or ctx.slashem_extended):
+        n += 5
+
+    if n == 0:
+        lvl -= 1
+    elif n >= 6:
+        lvl += n//2
+    else:
+        lvl += n//3 + 1
+    
+    final = int(lvl) if lvl >= 0 else 0
+    #Store in hash
+    m.diff = final
+    return final
+    
+#Experience and computed difficulty for a monster: what calc_table (or an earlier call) left
+#on it, otherwise worked out now with calc_exp and calc_difficulty.
+def exp_and_difficulty(ctx, m):
+    if m.exp is None or m.diff is None:
+        calc_exp(ctx, m)
+        calc_difficulty(ctx, m)
+    return (m.exp, m.diff)
+
+#I'm not seeing any differences between variants.
+#Actually, dNetHack uses a different version... in mondata.c
+#This governs behavior (monmove.c), but there's also a copy of mstrength that
+#uses this modified function, not the unmodified version in makedefs
+#I suspect that's not intentional...
+def is_ranged_attk(ctx, atk):
+    if atk in ['AT_BREA', 'AT_SPIT', 'AT_GAZE']:
+        return True
+    
+    if atk not in ctx.atk_ints:
+        raise Exception(f'Unknown atk type {atk}')
+    if 'AT_WEAP' not in ctx.atk_ints:
+        raise Exception(f'Unknown atk type AT_WEAP')
+    atk_int = ctx.atk_ints[atk]
+    wep_int = ctx.atk_ints['AT_WEAP']
+
+    return atk_int >= wep_int
+ 
+
+    
+#######
+#process_monster(ctx, parse_mon_declarations(tokenize_lines(enumerate('''
+#MON("hobbit", S_HUMANOID, LVL(1, 9, 10, 0, 6), (G_GENO | 2),        A(ATTK(AT_WEAP, AD_PHYS, 1, 6), NO_ATTK, NO_ATTK, NO_ATTK, NO_ATTK,          NO_ATTK),        SIZ(500, 200, MS_HUMANOID, MZ_SMALL), 0, 0, M1_HUMANOID | M1_OMNIVORE,        M2_COLLECT, M3_INFRAVISIBLE | M3_INFRAVISION, 2, CLR_GREEN),
+#'''.split('\n'))))).__next__())
+#print(ctx.monsters)
+
+#----TABLE
+
+#Whole-table versions of calc_exp and calc_difficulty.
+#monster_table loads every monster into NumPy arrays (one row per monster, one column
+#per attack slot), and table_exp/table_difficulty do the same sums as the per-monster
+#functions with array expressions. The special cases by name become masks.
+#Without NumPy, calc_table just runs calc_exp/calc_difficulty on each monster.
+
+def monster_table(ctx, monsters):
+    nmons = len(monsters)
+    width = max([len(m.atk or ()) for m in monsters] + [6])
+    t = {
+        'LVL':      numpy.array([m.level.lvl for m in monsters], dtype=numpy.int64),
+        'AC':       numpy.array([m.level.ac for m in monsters], dtype=numpy.int64),
+        'MOV':      numpy.array([m.level.mov for m in monsters], dtype=numpy.int64),
+        'MFLAGS2':  numpy.array([m.mflags2 for m in monsters], dtype=numpy.int64),
+        'GENO':     numpy.array([m.geno for m in monsters], dtype=numpy.int64),
+        #Attack slots; VALID is False for the empty ones.
+        'VALID':    numpy.zeros((nmons, width), dtype=bool),
+        'AT':       numpy.zeros((nmons, width), dtype=numpy.int64),
+        'AD':       numpy.zeros((nmons, width), dtype=numpy.int64),
+        'N':        numpy.zeros((nmons, width), dtype=numpy.int64),
+        'D':        numpy.zeros((nmons, width), dtype=numpy.int64),
+        'EEL':      numpy.array([m.symbol == 'EEL' for m in monsters]),
+        'MAIL_DAEMON': numpy.array([m.name == "mail daemon" for m in monsters]),
+        'NO_EXP':   numpy.array([re.search(r'dungeon fern spore|swamp fern spore|burning fern spore', m.name) is not None
+                                 or re.search(r'tentacles?$', m.name) is not None
+                                 or m.name == 'dancing blade' for m in monsters]),
+        'GRID_BUG': numpy.array([m.name == "grid bug" for m in monsters]),
+        'LEPRECHAUN': numpy.array([m.name == "leprechaun" for m in monsters]),
+        'HOOLOOVOO': numpy.array([m.name == "hooloovoo" for m in monsters]),
+    }
+    for (i, m) in enumerate(monsters):
+        for (j, a) in enumerate(m.atk or ()):
+            if a.at not in ctx.atk_ints:
+                raise Exception(f'Unknown atk type {a.at}')
+            t['VALID'][i, j] = True
+            t['AT'][i, j] = ctx.atk_ints[a.at]
+            t['AD'][i, j] = ctx.dmg_ints[a.ad]
+            t['N'][i, j] = a.n
+            t['D'][i, j] = a.d
+    return t
+
+#The header values for a list of AT_/AD_ names, for numpy.isin.
+#Names this variant doesn't have are left out, so they never match.
+def table_codes(ints, names):
+    return [ints[name] for name in names if name in ints]
+
+#has_flag over a column of bitmasks.
+def table_flag(ctx, bits, flag):
+    value = ctx.monflags.get(flag, 0)
+    if not value:
+        return numpy.zeros(bits.shape, dtype=bool)
+    return (bits & value) == value
+
+#calc_exp for every row of a monster_table.
+def table_exp(ctx, t):
+    lvl = t['LVL']
+    ac = t['AC']
+    mov = t['MOV']
+    AT_BUTT = ctx.atk_ints['AT_BUTT']
+    AD_BLND = ctx.dmg_ints['AD_BLND']
+    AD_PHYS = ctx.dmg_ints['AD_PHYS']
+    magc = table_codes(ctx.atk_ints, ['AT_MAGC', 'AT_MMGC'] if ctx.dnethack else ['AT_MAGC'])
+    weap = table_codes(ctx.atk_ints, ['AT_WEAP'])
+    deadly = table_codes(ctx.dmg_ints, ['AD_STON', 'AD_SLIM', 'AD_DRLI'])
+    wrap = table_codes(ctx.dmg_ints, ['AD_WRAP'])
+    
+    tmp = lvl * lvl + 1
+    tmp = tmp + numpy.where(ac < 3, 7 - ac, 0) + numpy.where(ac < 0, 7 - ac, 0)
+    tmp += numpy.where(mov > 18, 5, numpy.where(mov > 12, 3, 0))
+    
+    #One attack slot at a time, since the pre-3.6.0 bug looks at the running total.
+    for j in range(t['AT'].shape[1]):
+        valid = t['VALID'][:, j]
+        at = t['AT'][:, j]
+        ad = t['AD'][:, j]
+        tmp += numpy.where(valid & (at > AT_BUTT),
+                           numpy.where(numpy.isin(at, magc), 10, numpy.where(numpy.isin(at, weap), 5, 3)), 0)
+        dragon = valid & (ad > AD_PHYS) & (ad < AD_BLND)
+        poison = valid & ~dragon & numpy.isin(ad, deadly)
+        other = valid & ~dragon & ~poison
+        if ctx.base_nhver < '3.6.0':
+            other &= (tmp != 0)
+        else:
+            other &= (ad != AD_PHYS)
+        tmp += numpy.where(dragon, lvl * 2, 0) + numpy.where(poison, 50, 0) + numpy.where(other, lvl, 0)
+        tmp += numpy.where(valid & (t['N'][:, j] * t['D'][:, j] > 23), lvl, 0)
+        tmp += numpy.where(valid & numpy.isin(ad, wrap) & t['EEL'], 1000, 0)
+    
+    if ctx.base_nhver < '3.6.0':
+        tmp += (6 - t['VALID'].sum(axis=1)) * lvl
+    tmp += numpy.where(table_flag(ctx, t['MFLAGS2'], 'M2_NASTY'), 7 * lvl, 0)
+    tmp += numpy.where(lvl > 8, 50, 0)
+    tmp = numpy.where(t['MAIL_DAEMON'], 1, tmp)
+    tmp = numpy.where(t['NO_EXP'], 0, tmp)
+    return tmp
+
+#calc_difficulty for every row of a monster_table.
+def table_difficulty(ctx, t):
+    lvl = t['LVL']
+    if ctx.dnethack:
+        lvl = numpy.where(lvl > 49, 2*(lvl - 6) / 4, lvl)
+    ac = t['AC']
+    
+    n = numpy.zeros(lvl.shape, dtype=numpy.int64)
+    n += table_flag(ctx, t['GENO'], 'G_SGROUP')
+    n += 2 * table_flag(ctx, t['GENO'], 'G_LGROUP')
+    n += 4 * table_flag(ctx, t['GENO'], 'G_VLGROUP')
+    n += (ac < 4).astype(numpy.int64) + (ac < 0)
+    if ctx.dnethack:
+        n += (ac < -5).astype(numpy.int64) + (ac < -10) + (ac < -20)
+    n += t['MOV'] >= 18
+    
+    none = table_codes(ctx.atk_ints, ['AT_NONE'])
+    magc = table_codes(ctx.atk_ints, ['AT_MAGC'])
+    weap = table_codes(ctx.atk_ints, ['AT_WEAP'])
+    dn_magc = table_codes(ctx.atk_ints, ['AT_MMGC','AT_TUCH','AT_SHDW','AT_TNKR'])
+    ranged = table_codes(ctx.atk_ints, ['AT_BREA', 'AT_SPIT', 'AT_GAZE'])
+    strong = table_flag(ctx, t['MFLAGS2'], 'M2_STRONG')
+    bad = table_codes(ctx.dmg_ints, ['AD_DRLI','AD_STON','AD_WERE','AD_DRST','AD_DRDX','AD_DRCO'])
+    if ctx.dnethack:
+        bad += table_codes(ctx.dmg_ints, ['AD_SHDW','AD_STAR','AD_BLUD'])
+    AD_PHYS = ctx.dmg_ints['AD_PHYS']
+    AT_WEAP = ctx.atk_ints['AT_WEAP']
+    
+    has_ranged_atk = numpy.zeros(lvl.shape, dtype=bool)
+    for j in range(t['AT'].shape[1]):
+        valid = t['VALID'][:, j]
+        at = t['AT'][:, j]
+        ad = t['AD'][:, j]
+        n += valid & ~numpy.isin(at, none)
+        n += valid & numpy.isin(at, magc)
+        n += valid & numpy.isin(at, weap) & strong
+        if ctx.dnethack:
+            n += valid & numpy.isin(at, dn_magc)
+        two = valid & numpy.isin(ad, bad)
+        n += 2 * two
+        n += valid & ~two & (ad != AD_PHYS) & ~t['GRID_BUG']
+        n += valid & (t['N'][:, j] * t['D'][:, j] > 23)
+        has_ranged_atk |= valid & (numpy.isin(at, ranged) | (at >= AT_WEAP))
+    n += has_ranged_atk
+    n -= 2 * t['LEPRECHAUN']
+    if ctx.dnethack:
+        n += 10 * t['HOOLOOVOO']
+    if ctx.slashem or ctx.slashthem or ctx.slashem_extended:
+        n += 5 * table_flag(ctx, t['MFLAGS2'], 'M2_NASTY')
+    
+    lvl = numpy.where(n == 0, lvl - 1, numpy.where(n >= 6, lvl + n//2, lvl + n//3 + 1))
+    #int() truncates, which is the same as flooring here since lvl >= 0
+    return numpy.where(lvl >= 0, numpy.trunc(lvl), 0).astype(numpy.int64)
+
+#Experience and difficulty for a whole list of monsters, stored on each of them
+#like calc_exp/calc_difficulty do. Returns the two lists.
+def calc_table(ctx, monsters):
+    monsters = list(monsters)
+    if numpy is None or not monsters:
+        return ([calc_exp(ctx, m) for m in monsters], [calc_difficulty(ctx, m) for m in monsters])
+    t = monster_table(ctx, monsters)
+    exps = table_exp(ctx, t).tolist()
+    diffs = table_difficulty(ctx, t).tolist()
+    for (m, exp, diff) in zip(monsters, exps, diffs):
+        m.exp = exp
+        m.diff = diff
+    return (exps, diffs)
+
+#Rule sets for --sweep. Each one is the Conversion attributes that calc_exp and
+#calc_difficulty look at. Variant flags not listed are turned off.
+SWEEP_RULES = {
+    '3.4.3'    : {'base_nhver': '3.4.3'},
+    '3.6.0'    : {'base_nhver': '3.6.0'},
+    '3.6.2'    : {'base_nhver': '3.6.2'},
+    '3.7.0'    : {'base_nhver': '3.7.0'},
+    'slashem'  : {'base_nhver': '3.4.3', 'slashem': True},
+    'slashthem': {'base_nhver': '3.4.3', 'slashthem': True},
+    'dnethack' : {'base_nhver': '3.4.3', 'dnethack': True},
+}
+SWEEP_FLAGS = ('slashem', 'dnethack', 'unnethack', 'slashthem', 'slashem_extended')
+
+#A copy of ctx that follows another rule set. The parsed data is shared, not copied.
+def rule_context(ctx, rules):
+    if rules not in SWEEP_RULES:
+        raise Exception(f"Unknown rule set {rules} (use one of {', '.join(SWEEP_RULES)})")
+    rctx = copy.copy(ctx)
+    for flag in SWEEP_FLAGS:
+        setattr(rctx, flag, False)
+    for (k, v) in SWEEP_RULES[rules].items():
+        setattr(rctx, k, v)
+    return rctx
+
+#Experience, the difficulty shown on the page, and the computed difficulty, for each monster.
+#From 3.6.2 the page uses the difficulty stored in monst.c, if the source has one.
+def rule_results(ctx, monsters, table=None):
+    if table is not None:
+        exps = table_exp(ctx, table).tolist()
+        diffs = table_difficulty(ctx, table).tolist()
+    else:
+        #calc_exp/calc_difficulty store their results on the monster; put them back after.
+        saved = [(m.exp, m.diff) for m in monsters]
+        exps = [calc_exp(ctx, m) for m in monsters]
+        diffs = [calc_difficulty(ctx, m) for m in monsters]
+        for (m, (exp, diff)) in zip(monsters, saved):
+            (m.exp, m.diff) = (exp, diff)
+    shown = diffs
+    if ctx.base_nhver >= '3.6.2':
+        shown = [diff if m.mons_diff is None else m.mons_diff for (m, diff) in zip(monsters, diffs)]
+    return (exps, shown, diffs)
+
+#Evaluate each rule set against the same parsed monsters, and compare it to the tree's own rules.
+#Returns a row for each monster whose experience or difficulty changes under a rule set.
+def rule_sweep(ctx, monsters, rule_sets):
+    monsters = list(monsters)
+    table = monster_table(ctx, monsters) if numpy is not None and monsters else None
+    (base_exps, base_diffs, base_computed) = rule_results(ctx, monsters, table)
+    changes = []
+    for rules in rule_sets:
+        (exps, diffs, computed) = rule_results(rule_context(ctx, rules), monsters, table)
+        for (i, m) in enumerate(monsters):
+            if exps[i] == base_exps[i] and diffs[i] == base_diffs[i]:
+                continue
+            changes.append({
+                'RULES'              : rules,
+                'NAME'               : gen_names(ctx, m)[1],
+                'EXP'                : base_exps[i],
+                'NEW_EXP'            : exps[i],
+                'DIFFICULTY'         : base_diffs[i],
+                'NEW_DIFFICULTY'     : diffs[i],
+                'COMPUTED_DIFFICULTY': computed[i],
+            })
+    return changes
+
+def output_rule_sweep(ctx, rule_sets, changes):
+    header = '''{| class="prettytable sortable striped"
+|-
+! Rules !! Name !! Experience !! Difficulty
+'''
+    footer = '|}'
+    print('Writing: rule_sweep.txt')
+    
+    with io.StringIO() as HTML:
+        HTML.write(f"Compared to the rules for {ctx.base_nhver}")
+        for flag in SWEEP_FLAGS:
+            if getattr(ctx, flag):
+                HTML.write(f" ({flag})")
+        HTML.write(f", {len(ctx.monsters)} monsters:\n")
+        for rules in rule_sets:
+            count = len([c for c in changes if c['RULES'] == rules])
+            HTML.write(f"* {rules}: {count} changed\n")
+        HTML.write(header)
+        for c in changes:
+            exp = c['EXP'] if c['EXP'] == c['NEW_EXP'] else f"{c['EXP']} -> {c['NEW_EXP']}"
+            diff = c['DIFFICULTY'] if c['DIFFICULTY'] == c['NEW_DIFFICULTY'] else f"{c['DIFFICULTY']} -> {c['NEW_DIFFICULTY']}"
+            if c['COMPUTED_DIFFICULTY'] != c['NEW_DIFFICULTY']:
+                diff = f"{diff} (calculated {c['COMPUTED_DIFFICULTY']})"
+            HTML.write(f"|-\n| {c['RULES']} || [[{c['NAME']}]] || {exp} || {diff}\n")
+        HTML.write(footer)
+        write_output(ctx, 'rule_sweep.txt', HTML.getvalue())
+    write_output(ctx, 'rule_sweep.json', json.dumps(changes, indent=4))
+
+#----EXPORT
+
+#The computed data for one monster, as plain values, for --export.
+#Same numbers as the wiki page, without the wikitext.
+def monster_record(ctx, m):
+    (htmlname, print_name) = gen_names(ctx, m)
+    (exp, difficulty) = exp_and_difficulty(ctx, m)
+    if ctx.base_nhver >= '3.6.2':
+        difficulty = m.mons_diff
+    if (has_flag(ctx, m.geno, 'G_NOCORPSE')) and not IsPudding(print_name):
+        conveys = []
+    else:
+        conveys = calc_conveyance(ctx, m)
+    gen_flags = [g for g in m.gen if g.startswith('G_')]
+    
+    return {
+        'NAME'        : m.name,
+        'PRINT_NAME'  : print_name,
+        'PAGE'        : htmlname,
+        'MALE_NAME'   : m.male_name,
+        'FEMALE_NAME' : m.female_name,
+        'SYMBOL'      : m.symbol,
+        'LEVEL'       : m.level.lvl,
+        'BASE_LEVEL'  : m.level.base_lvl,
+        'SPEED'       : m.level.mov,
+        'AC'          : m.level.ac,
+        'TARGET_AC'   : m.target,
+        'MR'          : m.level.mr,
+        'ALIGNMENT'   : m.level.aln,
+        'FREQUENCY'   : 0 if has_flag(ctx, m.geno, 'G_NOGEN') else m.freq,
+        'GENOCIDABLE' : has_flag(ctx, m.geno, 'G_GENO'),
+        'UNIQUE'      : has_flag(ctx, m.geno, 'G_UNIQ'),
+        'EXPERIENCE'  : exp,
+        'DIFFICULTY'  : difficulty,
+        'WEIGHT'      : m.size.wt,
+        'NUTRITION'   : m.size.nut,
+        'SIZE'        : m.size.siz,
+        'SOUND'       : m.size.snd,
+        'COLOR'       : m.color,
+        'LINE'        : m.ref,
+        'MFLAGS1'     : m.mflags1,
+        'MFLAGS2'     : m.mflags2,
+        'MFLAGS3'     : m.mflags3,
+        'MRESISTS'    : m.mresists,
+        'MCONVEYS'    : m.mconveys,
+        'GENO'        : m.geno,
+        'GEN_FLAGS'   : gen_flags,
+        'FLAGS'       : list(m.flgs),
+        'RESISTANCES' : calc_resistances(ctx, m, print_name),
+        'ATTACKS'     : [{
+            'TYPE'   : a.at,
+            'DAMAGE' : a.ad,
+            'DICE'   : a.n,
+            'SIDES'  : a.d,
+        } for a in m.atk],
+        'CONVEYANCES' : [{
+            'NAME'   : re.sub(r'\[\[|\]\]', '', key),
+            'CHANCE' : chance,
+        } for (key, chance) in conveys],
+    }
+
+#The single-valued fields of monster_record. The lists get their own tables.
+EXPORT_COLUMNS = ('NAME', 'PRINT_NAME', 'PAGE', 'MALE_NAME', 'FEMALE_NAME', 'SYMBOL', 'LEVEL', 'BASE_LEVEL',
+                  'SPEED', 'AC', 'TARGET_AC', 'MR', 'ALIGNMENT', 'FREQUENCY', 'GENOCIDABLE', 'UNIQUE',
+                  'EXPERIENCE', 'DIFFICULTY', 'WEIGHT', 'NUTRITION', 'SIZE', 'SOUND', 'COLOR', 'LINE',
+                  'MFLAGS1', 'MFLAGS2', 'MFLAGS3', 'MRESISTS', 'MCONVEYS', 'GENO')
+
+#Exports work like sinks: add(record) is called for each monster as it's written, and
+#close() at the end of the run.
+
+#A JSON list of monster_record()s.
+class JsonExport:
+    def __init__(self, filename):
+        self.f = open(filename, 'w', encoding='utf-8')
+        self.f.write('[')
+        self.count = 0
+    
+    def add(self, record):
+        self.f.write(',\n' if self.count else '\n')
+        self.f.write(json.dumps(record))
+        self.count += 1
+    
+    def close(self):
+        self.f.write('\n]\n')
+        self.f.close()
+
+#monsters.csv has EXPORT_COLUMNS, plus the flags and resistances joined with |.
+#Attacks and conveyances go to monsters.attacks.csv and monsters.conveyances.csv,
+#one row each, joined on PAGE (which is unique, unlike NAME).
+class CsvExport:
+    def __init__(self, filename):
+        base = os.path.splitext(filename)[0]
+        self.files = [open(f, 'w', newline='', encoding='utf-8') for f in (filename, f'{base}.attacks.csv', f'{base}.conveyances.csv')]
+        (self.monsters, self.attacks, self.conveyances) = [csv.writer(f) for f in self.files]
+        self.monsters.writerow(EXPORT_COLUMNS + ('GEN_FLAGS', 'FLAGS', 'RESISTANCES'))
+        self.attacks.writerow(('PAGE', 'SLOT', 'TYPE', 'DAMAGE', 'DICE', 'SIDES'))
+        self.conveyances.writerow(('PAGE', 'NAME', 'CHANCE'))
+    
+    def add(self, record):
+        self.monsters.writerow([record[c] for c in EXPORT_COLUMNS] +
+                               ['|'.join(record[c]) for c in ('GEN_FLAGS', 'FLAGS', 'RESISTANCES')])
+        for (i, a) in enumerate(record['ATTACKS']):
+            self.attacks.writerow((record['PAGE'], i, a['TYPE'], a['DAMAGE'], a['DICE'], a['SIDES']))
+        for c in record['CONVEYANCES']:
+            self.conveyances.writerow((record['PAGE'], c['NAME'], c['CHANCE']))
+    
+    def close(self):
+        for f in self.files:
+            f.close()
+
+#An SQLite database with a monsters table and one table per list, keyed on monster_id.
+#Any existing file is replaced.
+class SqliteExport:
+    SCHEMA = f"""
+        CREATE TABLE monsters (id INTEGER PRIMARY KEY, {', '.join(f'"{c.lower()}"' for c in EXPORT_COLUMNS)});
+        CREATE TABLE attacks (monster_id INTEGER REFERENCES monsters(id), slot INTEGER, type TEXT, damage TEXT, dice INTEGER, sides INTEGER);
+        CREATE TABLE conveyances (monster_id INTEGER REFERENCES monsters(id), name TEXT, chance INTEGER);
+        CREATE TABLE resistances (monster_id INTEGER REFERENCES monsters(id), name TEXT);
+        CREATE TABLE flags (monster_id INTEGER REFERENCES monsters(id), flag TEXT);
+        CREATE INDEX monsters_name ON monsters(name);
+        CREATE INDEX attacks_monster ON attacks(monster_id);
+        CREATE INDEX attacks_damage ON attacks(damage);
+        CREATE INDEX conveyances_monster ON conveyances(monster_id);
+        CREATE INDEX conveyances_name ON conveyances(name, chance);
+        CREATE INDEX resistances_name ON resistances(name);
+        CREATE INDEX flags_flag ON flags(flag);
+    """
+    
+    def __init__(self, filename):
+        if os.path.isfile(filename):
+            os.remove(filename)
+        self.db = sqlite3.connect(filename)
+        self.db.executescript(self.SCHEMA)
+        self.insert = f"INSERT INTO monsters VALUES (NULL, {', '.join('?' for c in EXPORT_COLUMNS)})"
+    
+    def add(self, record):
+        cur = self.db.execute(self.insert, [record[c] for c in EXPORT_COLUMNS])
+        mid = cur.lastrowid
+        self.db.executemany("INSERT INTO attacks VALUES (?, ?, ?, ?, ?, ?)",
+                            [(mid, i, a['TYPE'], a['DAMAGE'], a['DICE'], a['SIDES']) for (i, a) in enumerate(record['ATTACKS'])])
+        self.db.executemany("INSERT INTO conveyances VALUES (?, ?, ?)",
+                            [(mid, c['NAME'], c['CHANCE']) for c in record['CONVEYANCES']])
+        self.db.executemany("INSERT INTO resistances VALUES (?, ?)", [(mid, r) for r in record['RESISTANCES']])
+        self.db.executemany("INSERT INTO flags VALUES (?, ?)", [(mid, f) for f in record['GEN_FLAGS'] + record['FLAGS']])
+    
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+EXPORTS = {
+    '.json'   : JsonExport,
+    '.csv'    : CsvExport,
+    '.sqlite' : SqliteExport,
+    '.db'     : SqliteExport,
+}
+
+#Open an export by its file extension.
+def open_export(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in EXPORTS:
+        raise Exception(f"Don't know how to export to {filename} (use one of {', '.join(EXPORTS)})")
+    return EXPORTS[ext](filename)
+
+#----DIFF
+
+#The fields --diff compares, and what the report calls them.
+#The lists are compared as a whole; the flag lists also say what was added and removed.
+DIFF_FIELDS = {
+    'SYMBOL'      : 'Symbol',
+    'LEVEL'       : 'Level',
+    'SPEED'       : 'Speed',
+    'AC'          : 'AC',
+    'MR'          : 'MR',
+    'ALIGNMENT'   : 'Alignment',
+    'FREQUENCY'   : 'Frequency',
+    'GENOCIDABLE' : 'Genocidable',
+    'UNIQUE'      : 'Unique',
+    'EXPERIENCE'  : 'Experience',
+    'DIFFICULTY'  : 'Difficulty',
+    'WEIGHT'      : 'Weight',
+    'NUTRITION'   : 'Nutrition',
+    'SIZE'        : 'Size',
+    'SOUND'       : 'Sound',
+    'COLOR'       : 'Color',
+    'ATTACKS'     : 'Attacks',
+    'CONVEYANCES' : 'Conveyances',
+    'RESISTANCES' : 'Resistances',
+    'GEN_FLAGS'   : 'Generation flags',
+    'FLAGS'       : 'Flags',
+}
+DIFF_SETS = ('RESISTANCES', 'GEN_FLAGS', 'FLAGS')
+
+#monster_record, cut down to DIFF_FIELDS, with the attacks and conveyances as plain strings.
+def diff_record(ctx, m):
+    record = monster_record(ctx, m)
+    record['ATTACKS'] = [f"{a['TYPE']} {a['DAMAGE']} {a['DICE']}d{a['SIDES']}" for a in record['ATTACKS']]
+    record['CONVEYANCES'] = [c['NAME'] if c['CHANCE'] is None else f"{c['NAME']} ({c['CHANCE']}%)" for c in record['CONVEYANCES']]
+    return {k: record[k] for k in DIFF_FIELDS}
+
+#What a monster is joined on. A name that's only used once on both sides is enough, so a
+#monster that moved to another class still matches; were-creatures and the like need the symbol.
+def diff_key(old, new, m):
+    if old.mon_count.get(m.name, 0) <= 1 and new.mon_count.get(m.name, 0) <= 1:
+        return (m.name, None)
+    return (m.name, m.symbol)
+
+#Join the monsters of two parsed trees and compare them field by field.
+#Returns a row for each monster that was added, removed or changed, in the order of the
+#new tree (removed ones last, in the old tree's order).
+def diff_monsters(old, old_monsters, new, new_monsters):
+    before = {}
+    for m in old_monsters:
+        before.setdefault(diff_key(old, new, m), []).append(m)
+    changes = []
+    for m in new_monsters:
+        matches = before.get(diff_key(old, new, m))
+        name = gen_names(new, m)[1]
+        if not matches:
+            changes.append({'NAME': name, 'CHANGE': 'added', 'FIELDS': {}})
+            continue
+        (a, b) = (diff_record(old, matches.pop(0)), diff_record(new, m))
+        fields = {}
+        for k in DIFF_FIELDS:
+            if a[k] == b[k]:
+                continue
+            fields[k] = {'OLD': a[k], 'NEW': b[k]}
+            if k in DIFF_SETS:
+                fields[k]['REMOVED'] = [f for f in a[k] if f not in b[k]]
+                fields[k]['ADDED'] = [f for f in b[k] if f not in a[k]]
+        if fields:
+            changes.append({'NAME': name, 'CHANGE': 'changed', 'FIELDS': fields})
+    removed = {id(m) for ms in before.values() for m in ms}
+    for m in old_monsters:
+        if id(m) in removed:
+            changes.append({'NAME': gen_names(old, m)[1], 'CHANGE': 'removed', 'FIELDS': {}})
+    return changes
+
+def diff_value(v):
+    return ', '.join(str(x) for x in v) if isinstance(v, list) else str(v)
+
+def output_monster_diff(old, new, changes):
+    header = '''{| class="prettytable sortable striped"
+|-
+! Name !! Change !! Old !! New
+'''
+    footer = '|}'
+    print('Writing: monster_diff.txt')
+    
+    with io.StringIO() as HTML:
+        HTML.write(f"Changes from {os.path.basename(os.path.normpath(old.nethome))} ({old.base_nhver}) to {os.path.basename(os.path.normpath(new.nethome))} ({new.base_nhver}):\n")
+        for change in ('added', 'removed', 'changed'):
+            HTML.write(f"* {len([c for c in changes if c['CHANGE'] == change])} {change}\n")
+        HTML.write(header)
+        for c in changes:
+            if c['CHANGE'] != 'changed':
+                HTML.write(f"|-\n| [[{c['NAME']}]] || {c['CHANGE']} || ||\n")
+                continue
+            for (k, f) in c['FIELDS'].items():
+                if k in DIFF_SETS:
+                    (before, after) = (' '.join(f'-{x}' for x in f['REMOVED']), ' '.join(f'+{x}' for x in f['ADDED']))
+                else:
+                    (before, after) = (diff_value(f['OLD']), diff_value(f['NEW']))
+                HTML.write(f"|-\n| [[{c['NAME']}]] || {DIFF_FIELDS[k]} || {before} || {after}\n")
+        HTML.write(footer)
+        write_output(new, 'monster_diff.txt', HTML.getvalue())
+    write_output(new, 'monster_diff.json', json.dumps(changes, indent=4))
+
+#----PROFILE
+
+#--profile: wall and CPU time for each stage of a run, and counters. While a profile is running,
+#PROFILE is the Profile and the functions in PROFILE_STAGES are replaced by timing wrappers.
+#When it isn't, PROFILE is None and the plain functions are called, so the only cost is
+#the `if PROFILE is not None` checks next to the counters.
+PROFILE = None
+
+PROFILE_STAGES = ('parse_headers', 'load_encyclopedia', 'index_encyclopedia', 'count_monster_names',
+                  'iter_monsters', 'read_monst_lines', 'do_define_substitutions', 'process_monster',
+                  'lookup_entry', 'entry_text', 'calc_exp', 'calc_difficulty', 'calc_conveyance', 'calc_table',
+                  'render_monster', 'write_output', 'output_monsters_by_exp', 'load_parse_cache',
+                  'save_parse_cache', 'save_manifest')
+
+#re functions counted as "regex calls". Patterns compiled ahead of time aren't counted.
+PROFILE_RE_CALLS = ('match', 'fullmatch', 'search', 'sub', 'subn', 'split', 'findall', 'finditer')
+
+#Stands in for the re module while profiling, counting the calls.
+class CountingRe:
+    def __init__(self, module, profile):
+        self.module = module
+        self.profile = profile
+    
+    def __getattr__(self, name):
+        attr = getattr(self.module, name)
+        if name not in PROFILE_RE_CALLS:
+            return attr
+        def counted(*args, **kwargs):
+            self.profile.count('regex calls')
+            return attr(*args, **kwargs)
+        return counted
+
+#Times are inclusive (a stage includes the stages it calls) except SELF, which leaves out
+#the time spent in other stages. A generator's time is only the time spent producing its
+#items, and its calls are the number of generators made. Single-threaded: the stages are
+#only called from the main thread.
+class Profile:
+    def __init__(self, cprofile=False):
+        self.stages = {}
+        self.counters = {}
+        self.folded = {}
+        self.stack = []
+        self.originals = {}
+        self.cprofile = cProfile.Profile() if cprofile else None
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+    
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+    
+    def stage(self, name):
+        if name not in self.stages:
+            self.stages[name] = {'CALLS': 0, 'WALL': 0.0, 'SELF': 0.0, 'CPU': 0.0}
+        return self.stages[name]
+    
+    def enter(self, name):
+        self.stack.append([name, time.perf_counter(), time.process_time(), 0.0])
+    
+    def leave(self):
+        (name, wall, cpu, children) = self.stack.pop()
+        wall = time.perf_counter() - wall
+        s = self.stage(name)
+        s['WALL'] += wall
+        s['SELF'] += wall - children
+        s['CPU'] += time.process_time() - cpu
+        if self.stack:
+            self.stack[-1][3] += wall
+        path = ';'.join([f[0] for f in self.stack] + [name])
+        self.folded[path] = self.folded.get(path, 0.0) + wall - children
+    
+    def wrap(self, name, f):
+        profile = self
+        if inspect.isgeneratorfunction(f):
+            @functools.wraps(f)
+            def timed_generator(*args, **kwargs):
+                profile.stage(name)['CALLS'] += 1
+                gen = f(*args, **kwargs)
+                try:
+                    while True:
+                        profile.enter(name)
+                        try:
+                            item = next(gen)
+                        except StopIteration:
+                            return
+                        finally:
+                            profile.leave()
+                        yield item
+                finally:
+                    gen.close()
+            return timed_generator
+        @functools.wraps(f)
+        def timed(*args, **kwargs):
+            profile.stage(name)['CALLS'] += 1
+            profile.enter(name)
+            try:
+                return f(*args, **kwargs)
+            finally:
+                profile.leave()
+        return timed
+
+#Start profiling: wrap the stages, count the regex calls, and start cProfile if asked.
+def start_profile(cprofile=False):
+    global PROFILE, re
+    profile = Profile(cprofile)
+    module = globals()
+    for name in PROFILE_STAGES:
+        profile.originals[name] = module[name]
+        module[name] = profile.wrap(name, module[name])
+    profile.originals['re'] = re
+    re = CountingRe(re, profile)
+    PROFILE = profile
+    if profile.cprofile is not None:
+        profile.cprofile.enable()
+    return profile
+
+#Put everything back, and note the total times.
+def stop_profile(profile):
+    global PROFILE
+    if profile.cprofile is not None:
+        profile.cprofile.disable()
+    globals().update(profile.originals)
+    PROFILE = None
+    profile.wall = time.perf_counter() - profile.wall
+    profile.cpu = time.process_time() - profile.cpu
+
+def profile_json(profile):
+    return {
+        'SCRIPT_VERSION' : version,
+        'WALL'           : profile.wall,
+        'CPU'            : profile.cpu,
+        'STAGES'         : profile.stages,
+        'COUNTERS'       : profile.counters,
+    }
+
+def profile_table(profile):
+    lines = [f"Total: {profile.wall:.4f}s wall, {profile.cpu:.4f}s CPU",
+             f"{'Stage':26} {'Calls':>9} {'Wall s':>10} {'Self s':>10} {'CPU s':>10}"]
+    for (name, s) in sorted(profile.stages.items(), key=lambda item: -item[1]['WALL']):
+        lines.append(f"{name:26} {s['CALLS']:9} {s['WALL']:10.4f} {s['SELF']:10.4f} {s['CPU']:10.4f}")
+    if profile.counters:
+        lines.append('')
+        lines.append(f"{'Counter':26} {'Count':>9}")
+        for (name, n) in sorted(profile.counters.items()):
+            lines.append(f"{name:26} {n:9}")
+    return '\n'.join(lines) + '\n'
+
+#Print the table, and write each file by its extension: .json (the table as JSON),
+#.folded (self time in microseconds per stack of stages, for flamegraph.pl or speedscope),
+#or .prof/.pstats (cProfile stats for the whole run, for pstats, snakeviz and the like).
+def write_profile(profile, filenames):
+    sys.stderr.write(profile_table(profile))
+    for filename in filenames:
+        ext = os.path.splitext(filename)[1].lower()
+        if ext == '.json':
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(profile_json(profile), f, indent=4)
+        elif ext == '.folded':
+            with open(filename, 'w', encoding='utf-8') as f:
+                for (path, t) in sorted(profile.folded.items()):
+                    f.write(f"{path} {round(t * 1000000)}\n")
+        elif ext in PROFILE_CPROFILE_EXTENSIONS:
+            profile.cprofile.dump_stats(filename)
+        else:
+            raise Exception(f"Don't know how to write a profile to {filename} (use .json, .folded, .prof or .pstats)")
+
+PROFILE_CPROFILE_EXTENSIONS = ('.prof', '.pstats')
+PROFILE_EXTENSIONS = ('.json', '.folded') + PROFILE_CPROFILE_EXTENSIONS
+
+#----CACHE
+
+#Parsed headers, encyclopedia and monsters are kept here between runs.
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'nhtowikihtml')
+
+#Parse everything in the source tree. The header constants, data.base and the monster names
+#are read straight away; the monsters themselves are returned as a generator (iter_monsters).
+def parse_sources(ctx):
+    parse_headers(ctx)
+    ctx.entries = load_encyclopedia(ctx)
+    ctx.mon_count = count_monster_names(ctx)
+    return iter_monsters(ctx)
+
+#The constants from the include files. If ctx.headers_from was parsed from the same
+#headers (--diff), its constants are used instead of reading them again.
+HEADER_FILES = ('permonst.h', 'monflag.h', 'monattk.h', 'color.h')
+
+def parse_headers(ctx):
+    other = ctx.headers_from
+    if other is not None and other.defines is not None and all(input_hashes(other)[h] == input_hashes(ctx)[h] for h in HEADER_FILES):
+        (ctx.defines, ctx.permonst_flags, ctx.monflags, ctx.atk_ints, ctx.dmg_ints, ctx.colors) = (
+            other.defines, other.permonst_flags, other.monflags, other.atk_ints, other.dmg_ints, other.colors)
+        return
+    defines = read_header_defines(ctx)
+    ctx.defines = defines
+    
+    #Weights and nutrition, as they'd appear in SIZ().
+    ctx.permonst_flags = {k: str(v) for (k, v) in defines.resolved(r'^(?:WT|CN)_').items()}
+    #Hack - Vanilla NetHack stores WT_HUMAN in permonst,
+    #but ELF and DRAGON are on monst.c. Just hardcode those two...
+    if 'WT_HUMAN' not in ctx.permonst_flags:
+        ctx.permonst_flags['WT_HUMAN'] = '1450'
+    if 'WT_ELF' not in ctx.permonst_flags:
+        ctx.permonst_flags['WT_ELF'] = '800'
+    if 'WT_DRAGON' not in ctx.permonst_flags:
+        ctx.permonst_flags['WT_DRAGON'] = '4500'
+    
+    #Flag bits, so each monster's flags can be kept as bitmasks like struct permonst.
+    ctx.monflags = defines.resolved(r'^(?:M[1-3]|MR|G)_')
+    #Attack and damage types. calc_exp and friends compare these on every attack.
+    ctx.atk_ints = defines.resolved(r'^AT_')
+    ctx.dmg_ints = defines.resolved(r'^AD_')
+    
+    colors = dict(DEFAULT_COLORS)
+    for name in defines.text:
+        target = defines.alias(name, 'CLR_')
+        if target is not None and target != name:
+            colors[name] = target
+    ctx.colors = colors
+
+#What parse_sources fills in. These are saved in the cache as-is.
+#Cache files from any other copy of the script are ignored (see script_hash), so CACHE_FORMAT
+#only needs bumping for a change made outside this file.
+CACHE_FORMAT = 6
+CACHED_FIELDS = ('defines', 'permonst_flags', 'monflags', 'atk_ints', 'dmg_ints', 'colors', 'entries', 'monsters', 'mon_count', 'unknowns')
+
+#A hash of this script's source, so a change to the parser makes old cache files stale
+#without anyone having to remember to bump version or CACHE_FORMAT.
+@functools.lru_cache(maxsize=None)
+def script_hash():
+    return hash_file(os.path.abspath(__file__))
+
+#Everything that changes what parse_sources produces: the script (its version and source),
+#the input files, and the options that pick the grammar or filter the monsters.
+def parse_cache_key(ctx):
+    key = {
+        'VERSION'  : version,
+        'FORMAT'   : CACHE_FORMAT,
+        'SCRIPT'   : script_hash(),
+        'NHVER'    : ctx.base_nhver,
+        'GRAMMAR'  : ctx.mon_grammar,
+        'VARIANTS' : [ctx.slashem, ctx.dnethack, ctx.unnethack, ctx.slashthem, ctx.slashem_extended],
+        'ONLY'     : ctx.only_mon,
+        'INPUTS'   : input_hashes(ctx),
+    }
+    return hash_text(json.dumps(key, sort_keys=True))
+
+#One cache file per source tree (and --only), replaced whenever the key changes.
+def parse_cache_filename(ctx):
+    tree = hash_text(json.dumps([os.path.abspath(ctx.nethome), ctx.only_mon]))
+    return os.path.join(ctx.cache_dir, f'{tree}.pickle')
+
+#Fill ctx from the cache. Returns False if there's nothing usable.
+def load_parse_cache(ctx, key):
+    filename = parse_cache_filename(ctx)
+    if not os.path.isfile(filename):
+        return False
+    try:
+        with open(filename, 'rb') as f:
+            cached = pickle.load(f)
+    except Exception as e:
+        print(f"Ignoring unreadable parse cache {filename}: {e}")
+        return False
+    if cached.get('KEY') != key:
+        return False
+    for field in CACHED_FIELDS:
+        setattr(ctx, field, cached[field])
+    return True
+
+def save_parse_cache(ctx, key):
+    filename = parse_cache_filename(ctx)
+    if not os.path.isdir(ctx.cache_dir):
+        os.makedirs(ctx.cache_dir)
+    cached = {field: getattr(ctx, field) for field in CACHED_FIELDS}
+    cached['KEY'] = key
+    #Write then rename, so a --batch run on the same tree can't read half a file.
+    tmpname = f'{filename}.{os.getpid()}.tmp'
+    with open(tmpname, 'wb') as f:
+        pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpname, filename)
+
+#Pass the monsters through, then save the cache once the last one has been parsed.
+def save_parse_cache_after(ctx, key, monsters):
+    yield from monsters
+    save_parse_cache(ctx, key)
+
+#parse_sources, unless the cache already has the result for these exact inputs.
+#Either way, returns an iterator over the monsters.
+def load_sources(ctx):
+    if not ctx.cache_dir:
+        return parse_sources(ctx)
+    key = parse_cache_key(ctx)
+    if load_parse_cache(ctx, key):
+        print(f"Using cached parse of {ctx.nethome}")
+        return iter(ctx.monsters)
+    return save_parse_cache_after(ctx, key, parse_sources(ctx))
+
+#Monsters are rendered this many at a time, so calc_table can work out experience and
+#difficulty for each batch at once while pages still go out as the file is parsed.
+CALC_BATCH = 256
+
+#Convert one source tree. This is everything the command line does, and can be
+#called any number of times from one process; nothing is kept between calls
+#except the compiled MON grammars.
+#Returns the Conversion, which has the parsed monsters, mon_count and unknowns.
+#With incremental, files whose text hasn't changed aren't rewritten, and files for
+#monsters that are gone are reported (or deleted, with delete_stale).
+#Parsing is cached in cache_dir, unless it's None.
+#Each monster's page is written as soon as the monster is parsed. Pages go to sink if
+#given (it's closed at the end), otherwise to the folder named by output, or a single
+#file with bundle ('jsonl', 'tar' or 'zip', also picked by output's extension).
+#An output of '-' writes them to stdout, and everything else that's printed to stderr.
+#export is a list of files (.json, .csv, .sqlite or .db) to write the computed monster data to.
+#template is a page template file to use instead of DEFAULT_TEMPLATE.
+def convert(source_path, version=None, output='html', only='', incremental=False, delete_stale=False, cache_dir=CACHE_DIR, sink=None, bundle=None, export=(), template=None):
+    if sink is None and output == '-':
+        sink = StdoutSink(sys.stdout) if bundle is None else open_bundle(bundle, '-')
+        with contextlib.redirect_stdout(sys.stderr):
+            return convert(source_path, version, output, only, incremental, delete_stale, cache_dir, sink, bundle, export, template)
+    
+    ctx = Conversion(source_path, version, output, only, incremental, delete_stale, cache_dir, bundle)
+    if template is not None:
+        ctx.template = load_template(template)
+    if sink is None:
+        sink = open_sink(ctx)
+    elif ctx.incremental and not isinstance(sink, DirectorySink):
+        raise Exception("--incremental needs an output folder")
+    ctx.sink = sink
+    exports = []
+    try:
+        for filename in export:
+            exports.append(open_export(filename))
+        monsters = load_sources(ctx)
+        ctx.encyclopedia = index_encyclopedia(ctx.entries, encyclopedia_filename(ctx))
+        ctx.manifest = load_manifest(ctx)
+        while True:
+            batch = list(itertools.islice(monsters, CALC_BATCH))
+            if not batch:
+                break
+            calc_table(ctx, batch)
+            for m in batch:
+                output_monster_html(ctx, m)
+                if exports:
+                    record = monster_record(ctx, m)
+                    for e in exports:
+                        e.add(record)
+        output_monsters_by_exp(ctx)
+    finally:
+        sink.close()
+        for e in exports:
+            e.close()
+    if ctx.incremental:
+        save_manifest(ctx)
+        print(f"{len(ctx.written)} files written, {len(ctx.unchanged)} unchanged")
+    
+    if ctx.unknowns:
+        print("Flags and other constants that couldn't be resolved:")
+        print(ctx.unknowns)
+    return ctx
+
+#Evaluate experience and difficulty under several rule sets (names from SWEEP_RULES), parsing
+#the tree once. Writes rule_sweep.txt and rule_sweep.json with the monsters that change,
+#the same way convert writes pages (so output, sink and bundle work the same).
+#Returns the Conversion, with the changes in sweep.
+def sweep(source_path, rule_sets, version=None, output='html', only='', cache_dir=CACHE_DIR, sink=None, bundle=None):
+    if sink is None and output == '-':
+        sink = StdoutSink(sys.stdout) if bundle is None else open_bundle(bundle, '-')
+        with contextlib.redirect_stdout(sys.stderr):
+            return sweep(source_path, rule_sets, version, output, only, cache_dir, sink, bundle)
+    
+    for rules in rule_sets:
+        if rules not in SWEEP_RULES:
+            raise Exception(f"Unknown rule set {rules} (use one of {', '.join(SWEEP_RULES)})")
+    ctx = Conversion(source_path, version, output, only, cache_dir=cache_dir, bundle=bundle)
+    ctx.sink = sink if sink is not None else open_sink(ctx)
+    try:
+        monsters = list(load_sources(ctx))
+        ctx.sweep = rule_sweep(ctx, monsters, rule_sets)
+        output_rule_sweep(ctx, rule_sets, ctx.sweep)
+    finally:
+        ctx.sink.close()
+    return ctx
+
+#Compare two source trees (--diff): parse both, join the monsters by name (and symbol, where
+#a name is used more than once), and write what changed to monster_diff.txt and monster_diff.json,
+#the same way convert writes pages. The header constants are parsed once if both trees have
+#the same headers. Returns the new tree's Conversion, with the changes in diff.
+def diff_trees(old_path, new_path, old_version=None, new_version=None, output='html', only='', cache_dir=CACHE_DIR, sink=None, bundle=None):
+    if sink is None and output == '-':
+        sink = StdoutSink(sys.stdout) if bundle is None else open_bundle(bundle, '-')
+        with contextlib.redirect_stdout(sys.stderr):
+            return diff_trees(old_path, new_path, old_version, new_version, output, only, cache_dir, sink, bundle)
+    
+    old = Conversion(old_path, old_version, output, only, cache_dir=cache_dir, bundle=bundle)
+    new = Conversion(new_path, new_version, output, only, cache_dir=cache_dir, bundle=bundle)
+    new.headers_from = old
+    new.sink = sink if sink is not None else open_sink(new)
+    try:
+        old_monsters = list(load_sources(old))
+        new_monsters = list(load_sources(new))
+        new.diff = diff_monsters(old, old_monsters, new, new_monsters)
+        output_monster_diff(old, new, new.diff)
+    finally:
+        new.sink.close()
+    return new
+
+#----BATCH
+
+#Read a batch manifest: a JSON list of source trees, e.g.
+#   [
+#       {"path": "/src/NetHack-3.4.3"},
+#       {"path": "/src/slashem-0.0.7E7F3", "version": "3.4.3", "name": "slashem"}
+#   ]
+#"version" is the same as --version. "name" is the output subfolder; defaults to the folder name.
+def load_batch_manifest(filename, output_root):
+    with open(filename, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if not isinstance(manifest, list):
+        raise Exception(f"Batch manifest should be a list of source trees: {filename}")
+    jobs = []
+    names = set()
+    for item in manifest:
+        if isinstance(item, str):
+            item = {'path': item}
+        if 'path' not in item:
+            raise Exception(f"Batch manifest entry has no path: {item}")
+        name = item.get('name') or os.path.basename(item['path'].replace('\\', '/').rstrip('/'))
+        if name in names:
+            raise Exception(f"Batch manifest has two trees named '{name}'. Give one a \"name\".")
+        names.add(name)
+        jobs.append({
+            'name'    : name,
+            'path'    : item['path'],
+            'version' : item.get('version'),
+            'output'  : os.path.join(output_root, name),
+            'log'     : os.path.join(output_root, f'{name}.log'),
+        })
+    return jobs
+
+#Convert one tree from the manifest. This runs in a worker process, and its output goes to
+#the job's log file. Errors are caught and returned, so one broken tree doesn't stop the others.
+def convert_batch_job(job):
+    summary = {
+        'NAME'     : job['name'],
+        'PATH'     : job['path'],
+        'VERSION'  : job['version'],
+        'OUTPUT'   : job['output'],
+        'MONSTERS' : 0,
+        'UNKNOWNS' : {},
+        'ERROR'    : None,
+    }
+    with open(job['log'], 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        try:
+            ctx = convert(job['path'], version=job['version'], output=job['output'],
+                          incremental=job['incremental'], delete_stale=job['delete_stale'], cache_dir=job['cache_dir'], bundle=job['bundle'],
+                          template=job['template'])
+            summary['OUTPUT'] = ctx.output_path
+            summary['MONSTERS'] = len(ctx.monsters)
+            summary['UNKNOWNS'] = ctx.unknowns
+        except Exception as e:
+            traceback.print_exc(file=log)
+            summary['ERROR'] = f'{type(e).__name__}: {e}'
+    return summary
+
+#Convert every tree in a manifest, in parallel. Each one goes to its own subfolder of output_root.
+#Writes batch_summary.json to output_root, and returns the summaries in manifest order.
+def convert_batch(manifest, output_root='html', jobs=None, incremental=False, delete_stale=False, cache_dir=CACHE_DIR, bundle=None, template=None):
+    if not os.path.isdir(output_root):
+        os.makedirs(output_root)
+    batch = load_batch_manifest(manifest, output_root)
+    for job in batch:
+        job['incremental'] = incremental
+        job['delete_stale'] = delete_stale
+        job['cache_dir'] = cache_dir
+        job['bundle'] = bundle
+        job['template'] = template
+    
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        summaries = list(pool.map(convert_batch_job, batch))
+    
+    for s in summaries:
+        if s['ERROR']:
+            print(f"FAILED: {s['NAME']} ({s['PATH']})")
+            print(f"\t{s['ERROR']}")
+            print(f"\tSee {os.path.join(output_root, s['NAME'])}.log")
+        else:
+            print(f"{s['NAME']}: {s['MONSTERS']} monsters")
+        if s['UNKNOWNS']:
+            print("\tFlags and other constants that couldn't be resolved:")
+            print(f"\t{s['UNKNOWNS']}")
+    
+    with open(os.path.join(output_root, 'batch_summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summaries, f, indent=4)
+    return summaries
+
+#----WATCH
+
+#Modification time and size of each input file, to notice when one changes.
+def input_stamps(ctx):
+    stamps = {}
+    for (k, filename) in input_files(ctx).items():
+        try:
+            st = os.stat(filename)
+            stamps[k] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamps[k] = None
+    return stamps
+
+#A monster as parsed, leaving out exp and diff (which are filled in when it's rendered).
+def monster_key(m):
+    m = copy.copy(m)
+    (m.exp, m.diff) = (None, None)
+    return repr(m)
+
+#The encyclopedia entry each monster's page uses.
+def page_entries(ctx):
+    return {m.name: lookup_entry(ctx, m.name) for m in ctx.monsters}
+
+#Bring the output folder up to date after some input files changed (changed has
+#input_files keys). Returns the Conversion to use from now on.
+# - Headers or data.json: everything may be different, so start over.
+# - monst.c/monsters.h: parse the monsters again, but only render the ones whose record
+#   (or page name) changed. The others keep their old record.
+# - data.base: load it again, and render the monsters whose entry text changed.
+#Either way, pages whose text didn't change aren't rewritten, and monsters_by_exp.txt
+#and the manifest are redone.
+def watch_update(ctx, changed):
+    ctx.manifest = {'VERSION': version, 'INPUTS': {}, 'FILES': dict(ctx.file_hashes)}
+    ctx.written = []
+    ctx.unchanged = []
+    ctx.input_hashes = None
+    
+    if set(changed) - {'monst', 'data.base'}:
+        new = Conversion(ctx.nethome, ctx.force_version, ctx.output_path, ctx.only_mon, True, ctx.delete_stale)
+        new.template = ctx.template
+        new.sink = ctx.sink
+        new.manifest = ctx.manifest
+        monsters = parse_sources(new)
+        new.encyclopedia = index_encyclopedia(new.entries, encyclopedia_filename(new))
+        for m in monsters:
+            output_monster_html(new, m)
+        output_monsters_by_exp(new)
+        save_manifest(new)
+        new.page_entries = page_entries(new)
+        return new
+    
+    #Parse into a copy first, so a half-finished edit that doesn't parse leaves ctx as it was.
+    new = copy.copy(ctx)
+    new.file_hashes = dict(ctx.file_hashes)
+    if 'monst' in changed:
+        new.monsters = []
+        new.mon_count = count_monster_names(new)
+        list(iter_monsters(new))
+    if 'data.base' in changed:
+        new.entries = load_encyclopedia(new)
+        new.encyclopedia = index_encyclopedia(new.entries, encyclopedia_filename(new))
+    
+    render = []
+    if 'monst' in changed:
+        old = {monster_key(m): m for m in ctx.monsters}
+        fresh = new.monsters
+        new.monsters = []
+        for m in fresh:
+            prev = old.get(monster_key(m))
+            if prev is not None and ctx.mon_count.get(m.name) == new.mon_count.get(m.name):
+                new.monsters.append(prev)
+            else:
+                new.monsters.append(m)
+                render.append(m)
+        #Pages that are no longer generated; save_manifest reports (or deletes) them.
+        for page in {gen_names(ctx, m)[0] for m in ctx.monsters} - {gen_names(new, m)[0] for m in new.monsters}:
+            new.file_hashes.pop(page, None)
+    ctx = new
+    
+    entries = page_entries(ctx)
+    for m in ctx.monsters:
+        if entries[m.name] != ctx.page_entries.get(m.name) and m not in render:
+            render.append(m)
+    for m in render:
+        output_monster_html(ctx, m)
+    output_monsters_by_exp(ctx)
+    save_manifest(ctx)
+    ctx.page_entries = entries
+    return ctx
+
+#Convert a source tree into an output folder, then keep watching the input files and
+#update the folder whenever one of them changes, until interrupted (Ctrl-C).
+#The parsed tree stays in memory between updates. Returns the last Conversion.
+def watch(source_path, version=None, output='html', only='', delete_stale=False, cache_dir=CACHE_DIR, interval=1.0, template=None):
+    ctx = convert(source_path, version, output, only, incremental=True, delete_stale=delete_stale, cache_dir=cache_dir, template=template)
+    ctx.page_entries = page_entries(ctx)
+    stamps = input_stamps(ctx)
+    print(f"Watching {ctx.nethome} for changes (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(interval)
+            new_stamps = input_stamps(ctx)
+            changed = [k for k in new_stamps if new_stamps[k] != stamps.get(k)]
+            if not changed:
+                continue
+            stamps = new_stamps
+            print()
+            print(f"Changed: {', '.join(changed)}")
+            start = time.time()
+            try:
+                ctx = watch_update(ctx, changed)
+            except Exception:
+                #Probably a half-finished edit. Keep what we have and wait for the next one.
+                traceback.print_exc(file=sys.stdout)
+                print("Output left as it was; waiting for the next change.")
+                continue
+            print(f"{len(ctx.written)} files written, {len(ctx.unchanged)} unchanged ({time.time() - start:.2f}s)")
+    except KeyboardInterrupt:
+        pass
+    return ctx
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument('path', nargs='?', help='Filepath of a NetHack source distribution.')
+    parser.add_argument('--version', required=False, help='Base version of vanilla NetHack to use')
+    parser.add_argument('--output', required=False, default='html', help='Output folder for the generated files. Will be created. A name ending in .jsonl, .tar or .zip writes a single bundle file instead (see --bundle), and - writes everything to stdout.')
+    parser.add_argument('--bundle', required=False, choices=sorted(BUNDLE_SINKS), help='Write every page into one file instead of a folder, keyed on the page\'s file name. The extension is added to --output if it isn\'t there already. With --batch, there is one bundle per tree.')
+    parser.add_argument('--only', required=False, default='', help='If specified, only process the given monster. Several can be given, separated by commas.')
+    parser.add_argument('--template', required=False, metavar='FILE', help='Page template to use instead of the built-in one, e.g. for another wiki. See DEFAULT_TEMPLATE in this script for the format.')
+    parser.add_argument('--incremental', action='store_true', help='Only rewrite files whose text changed since the last run, tracked in ' + MANIFEST_NAME + ' in the output folder.')
+    parser.add_argument('--delete-stale', action='store_true', help='With --incremental, delete files for monsters that are no longer generated instead of just listing them.')
+    parser.add_argument('--export', required=False, action='append', default=[], help='Also write the computed monster data (stats, attacks, conveyance chances, experience, difficulty, flags) to this file. The format is picked by the extension: .json, .csv or .sqlite/.db. Can be given more than once.')
+    parser.add_argument('--cache-dir', required=False, default=CACHE_DIR, help='Where to keep parsed source trees between runs (default: %(default)s).')
+    parser.add_argument('--no-cache', action='store_true', help='Always parse the source tree, and don\'t save the result.')
+    parser.add_argument('--sweep', required=False, help='Instead of writing pages, compare experience and difficulty under other rule sets (comma separated: ' + ', '.join(SWEEP_RULES) + ', or all) and write the monsters that change to rule_sweep.txt and rule_sweep.json.')
+    parser.add_argument('--watch', required=False, nargs='?', type=float, const=1.0, metavar='SECONDS', help='After converting, keep checking the source files (every SECONDS, default 1) and update the output folder when they change. Implies --incremental.')
+    parser.add_argument('--diff', required=False, metavar='NEW_PATH', help='Instead of writing pages, compare the monsters in path with the ones in this (newer) source tree, and write what was added, removed or changed to monster_diff.txt and monster_diff.json.')
+    parser.add_argument('--diff-version', required=False, help='Base version of vanilla NetHack for the --diff tree, like --version.')
+    parser.add_argument('--upload', required=False, metavar='API_URL', help='Upload the pages to a wiki instead of writing files, through its api.php (e.g. https://example.org/w/api.php). Only pages whose text changed are edited.')
+    parser.add_argument('--upload-prefix', required=False, default='', help='Put this in front of every page title for --upload (e.g. User:Me/).')
+    parser.add_argument('--upload-user', required=False, help='Log in to the wiki as this user for --upload (a bot password). The password is read from the ' + WIKI_PASSWORD_ENV + ' environment variable.')
+    parser.add_argument('--upload-jobs', required=False, type=int, default=4, help='Number of edits to have in flight at once for --upload (default: %(default)s).')
+    parser.add_argument('--profile', required=False, action='append', nargs='?', const='', metavar='FILE', help='Time each stage of the run and count regex calls, define substitutions, encyclopedia tags tested and bytes written, and print a table of them to stderr. Given a FILE, also write them to it as .json, as .folded stacks for flame graphs, or as cProfile stats (.prof or .pstats). Can be given more than once.')
+    parser.add_argument('--batch', required=False, help='JSON manifest of source trees to convert in parallel. Each one is written to a subfolder of --output.')
+    parser.add_argument('--jobs', required=False, type=int, help='Number of worker processes for --batch. Defaults to the number of CPUs.')
+    args = parser.parse_args(argv)
+    print(args, file=sys.stderr if args.output == '-' else sys.stdout)
+    
+    if args.profile is None:
+        run_command(parser, args)
+        return
+    if args.batch:
+        parser.error('--profile times a single run, not --batch')
+    filenames = [f for f in args.profile if f]
+    for filename in filenames:
+        if os.path.splitext(filename)[1].lower() not in PROFILE_EXTENSIONS:
+            parser.error(f"Don't know how to write a profile to {filename} (use .json, .folded, .prof or .pstats)")
+    profile = start_profile(cprofile=any(os.path.splitext(f)[1].lower() in PROFILE_CPROFILE_EXTENSIONS for f in filenames))
+    try:
+        run_command(parser, args)
+    finally:
+        stop_profile(profile)
+        write_profile(profile, filenames)
+
+#Everything main does once the arguments are parsed.
+def run_command(parser, args):
+    cache_dir = None if args.no_cache else args.cache_dir
+    
+    if args.batch:
+        if args.path or args.version or args.only:
+            parser.error('--batch takes the source paths and versions from the manifest')
+        if args.export:
+            parser.error('--export works on a single source tree, not --batch')
+        if args.sweep:
+            parser.error('--sweep works on a single source tree, not --batch')
+        if args.watch is not None:
+            parser.error('--watch works on a single source tree, not --batch')
+        if args.upload:
+            parser.error('--upload works on a single source tree, not --batch')
+        if args.diff:
+            parser.error('--diff compares two source trees, not --batch')
+        summaries = convert_batch(args.batch, output_root=args.output, jobs=args.jobs,
+                                  incremental=args.incremental, delete_stale=args.delete_stale, cache_dir=cache_dir, bundle=args.bundle, template=args.template)
+        if any(s['ERROR'] for s in summaries):
+            sys.exit(1)
+        return
+    if not args.path:
+        parser.error('a source path (or --batch) is required')
+    
+    sink = None
+    if args.upload:
+        if args.watch is not None or args.incremental or args.bundle:
+            parser.error('--upload only edits pages that changed already, so --watch, --incremental and --bundle don\'t apply')
+        sink = WikiSink(args.upload, user=args.upload_user, password=os.environ.get(WIKI_PASSWORD_ENV),
+                        prefix=args.upload_prefix, jobs=args.upload_jobs)
+    
+    if args.watch is not None:
+        if args.sweep or args.diff or args.export or args.bundle or args.output == '-' or bundle_format(args.output):
+            parser.error('--watch needs an output folder, and can\'t be used with --sweep, --diff or --export')
+        watch(args.path, version=args.version, output=args.output, only=args.only, delete_stale=args.delete_stale, cache_dir=cache_dir, interval=args.watch, template=args.template)
+        return
+    
+    if args.diff:
+        if args.sweep or args.incremental or args.export:
+            parser.error('--diff doesn\'t write pages, so --sweep, --incremental and --export don\'t apply')
+        diff_trees(args.path, args.diff, old_version=args.version, new_version=args.diff_version, output=args.output, only=args.only, cache_dir=cache_dir, sink=sink, bundle=args.bundle)
+        return
+    
+    if args.sweep:
+        if args.incremental or args.export:
+            parser.error('--sweep doesn\'t write pages, so --incremental and --export don\'t apply')
+        rule_sets = list(SWEEP_RULES) if args.sweep == 'all' else [r.strip() for r in args.sweep.split(',') if r.strip()]
+        for rules in rule_sets:
+            if rules not in SWEEP_RULES:
+                parser.error(f"unknown rule set {rules} for --sweep (use one of {', '.join(SWEEP_RULES)}, or all)")
+        sweep(args.path, rule_sets, version=args.version, output=args.output, only=args.only, cache_dir=cache_dir, bundle=args.bundle, sink=sink)
+        return
+    
+    convert(args.path, version=args.version, output=args.output, only=args.only, incremental=args.incremental, delete_stale=args.delete_stale, cache_dir=cache_dir, sink=sink, bundle=args.bundle, export=args.export, template=args.template)
+
+if __name__ == '__main__':
+    main()
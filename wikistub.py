@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+#A small stand-in for a MediaWiki action API (api.php), for trying out and benchmarking
+#nhtohtml.py --upload without a real wiki. Pages are kept in memory. It understands just
+#the requests the upload sink makes: login and CSRF tokens, login, revision SHA-1 queries
+#and edits.
+#
+#   python wikistub.py --port 8080 --user Bot --password secret
+#   NHTOHTML_WIKI_PASSWORD=secret python nhtohtml.py path/to/NetHack-3.6.6 \
+#       --upload http://localhost:8080/api.php --upload-user Bot
+
+import argparse
+import hashlib
+import http.server
+import json
+import os
+import secrets
+import socketserver
+import sys
+import threading
+import time
+import urllib.parse
+
+#MediaWiki titles: _ and spaces are the same, and the first letter is upper case.
+def normalize_title(title):
+    title = ' '.join(title.replace('_', ' ').split())
+    return title[:1].upper() + title[1:]
+
+class Wiki:
+    def __init__(self, user=None, password=None, delay=0.0):
+        self.user = user
+        self.password = password
+        self.delay = delay
+        self.pages = {}
+        self.sessions = {}
+        self.requests = 0
+        self.edits = 0
+        self.lock = threading.Lock()
+
+    #Answer one API request. Returns the reply and any cookie to set.
+    def handle(self, params, session):
+        with self.lock:
+            self.requests += 1
+        if self.delay:
+            time.sleep(self.delay)
+        action = params.get('action')
+        if action == 'query':
+            return self.query(params, session), None
+        if action == 'login':
+            return self.login(params, session)
+        if action == 'edit':
+            return self.edit(params, session), None
+        return error('badvalue', f"Unrecognized value for parameter \"action\": {action}."), None
+
+    def query(self, params, session):
+        reply = {'batchcomplete': True, 'query': {}}
+        if params.get('meta') == 'tokens':
+            kind = params.get('type', 'csrf')
+            if kind == 'login':
+                reply['query']['tokens'] = {'logintoken': secrets.token_hex(8) + '+\\'}
+            else:
+                user = self.sessions.get(session)
+                reply['query']['tokens'] = {'csrftoken': csrf_token(session) if user else '+\\'}
+        if params.get('prop') == 'revisions':
+            normalized = []
+            pages = []
+            for title in params.get('titles', '').split('|'):
+                if not title:
+                    continue
+                name = normalize_title(title)
+                if name != title:
+                    normalized.append({'fromencoded': False, 'from': title, 'to': name})
+                with self.lock:
+                    text = self.pages.get(name)
+                if text is None:
+                    pages.append({'ns': 0, 'title': name, 'missing': True})
+                else:
+                    pages.append({'ns': 0, 'title': name, 'revisions': [{'sha1': hashlib.sha1(text.encode('utf-8')).hexdigest()}]})
+            if normalized:
+                reply['query']['normalized'] = normalized
+            reply['query']['pages'] = pages
+        return reply
+
+    def login(self, params, session):
+        if self.user is None or params.get('lgname') != self.user or params.get('lgpassword') != self.password:
+            return {'login': {'result': 'Failed', 'reason': 'Incorrect username or password entered. Please try again.'}}, None
+        session = secrets.token_hex(16)
+        with self.lock:
+            self.sessions[session] = self.user
+        return {'login': {'result': 'Success', 'lguserid': 1, 'lgusername': self.user}}, session
+
+    def edit(self, params, session):
+        user = self.sessions.get(session)
+        if self.user is not None and user is None:
+            return error('permissiondenied', 'You do not have permission to edit this page.')
+        if params.get('token') != (csrf_token(session) if user else '+\\'):
+            return error('badtoken', 'Invalid CSRF token.')
+        if 'title' not in params or 'text' not in params:
+            return error('missingparam', 'The "title" and "text" parameters must be set.')
+        title = normalize_title(params['title'])
+        #Like MediaWiki, trailing whitespace isn't saved, and saving the same text makes no revision.
+        text = params['text'].rstrip()
+        result = {'result': 'Success', 'title': title, 'contentmodel': 'wikitext'}
+        with self.lock:
+            if self.pages.get(title) == text:
+                result['nochange'] = True
+            else:
+                if title not in self.pages:
+                    result['new'] = True
+                self.pages[title] = text
+                self.edits += 1
+        return {'edit': result}
+
+def csrf_token(session):
+    return hashlib.sha1(f'csrf:{session}'.encode('utf-8')).hexdigest() + '+\\'
+
+def error(code, info):
+    return {'error': {'code': code, 'info': info}}
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    #HTTP/1.1, so clients can keep their connection open between requests.
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.answer(urllib.parse.urlsplit(self.path).query)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+        query = urllib.parse.urlsplit(self.path).query
+        self.answer(query + '&' + body if query else body)
+
+    def answer(self, query):
+        if not urllib.parse.urlsplit(self.path).path.endswith('api.php'):
+            self.send_error(404)
+            return
+        params = dict(urllib.parse.parse_qsl(query, keep_blank_values=True))
+        session = None
+        for cookie in (self.headers.get('Cookie') or '').split(';'):
+            name, _, value = cookie.strip().partition('=')
+            if name == 'stubwiki_session':
+                session = value
+        reply, new_session = self.server.wiki.handle(params, session)
+        data = json.dumps(reply).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        if new_session:
+            self.send_header('Set-Cookie', f'stubwiki_session={new_session}; path=/; HttpOnly')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+#http.server.ThreadingHTTPServer, which is only in Python 3.7 and up.
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+#Start a stand-in wiki on a thread and return the server; its pages are in server.wiki.pages.
+#Port 0 picks a free port (see server.server_address). Stop it with server.shutdown().
+def serve(port=0, user=None, password=None, delay=0.0, verbose=False):
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.wiki = Wiki(user, password, delay)
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+#Write the pages to a folder, one .txt file each, named like nhtohtml.py names them.
+def save_pages(wiki, path):
+    if not os.path.isdir(path):
+        os.mkdir(path)
+    for (title, text) in wiki.pages.items():
+        with open(os.path.join(path, title.replace(' ', '_').replace('/', '%2F') + '.txt'), 'w', encoding='utf-8') as OUT:
+            OUT.write(text)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='A local stand-in for a MediaWiki api.php, for testing nhtohtml.py --upload.')
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on, on localhost (default: %(default)s).')
+    parser.add_argument('--user', help='Require logging in as this user before editing.')
+    parser.add_argument('--password', default='', help='Password for --user.')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before answering each request, to act like a remote wiki.')
+    parser.add_argument('--save', help='When stopped, write the pages to this folder.')
+    parser.add_argument('--verbose', action='store_true', help='Log every request.')
+    args = parser.parse_args(argv)
+
+    server = serve(args.port, args.user, args.password, args.delay, args.verbose)
+    print(f'Serving http://127.0.0.1:{server.server_address[1]}/api.php (Ctrl-C to stop)', file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    server.shutdown()
+    wiki = server.wiki
+    print(f'{wiki.requests} requests, {wiki.edits} edits, {len(wiki.pages)} pages', file=sys.stderr)
+    if args.save:
+        save_pages(wiki, args.save)
+
+if __name__ == '__main__':
+    main()